@@ -1,9 +1,11 @@
+from functools import lru_cache
 from pydantic import BaseModel, Field
 from typing import Optional, Type
 
 from pydantic import BaseModel, Field
 from typing import Optional, Type
 
+@lru_cache(maxsize=None)
 def make_StatementOfFinancialPosition_model(year: int) -> Type[BaseModel]:
     """
     Dynamically constructs and returns a Pydantic model class named
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from extraction_cache import schema_hash
+from extraction_engine import config_with, json_schema
+
+DEFAULT_AGENT_REGISTRY = "agent_registry.json"
+
+
+@dataclass(frozen=True)
+class BuiltSchema:
+    """A schema factory's model for one year, with its JSON schema and hash computed once."""
+    model: object
+    json_schema: dict
+    hash: str
+
+
+@lru_cache(maxsize=None)
+def build_schema(factory: Callable[[int], object], year: int) -> BuiltSchema:
+    """
+    Memoised factory(year). A reloaded schema module gives a new factory
+    object and so a fresh build; the hash is the schema version.
+    """
+    model = factory(year)
+    return BuiltSchema(model, json_schema(model), schema_hash(model))
+
+
+class AgentRegistry:
+    """
+    Finds or creates the LlamaExtract agent for a schema, keyed by the
+    schema's hash in a small local JSON file ({hash: {"id", "name"}}).
+
+    A schema seen before costs a single get_agent(id=...) and no save; the
+    agent object is then reused for the rest of the process. A new schema
+    goes to `agent_id` when given (the notebooks' existing agents, updated
+    and saved once), otherwise to an agent named "<name>-<hash[:12]>",
+    created on first use.
+    """
+
+    def __init__(self, extractor, path: str = DEFAULT_AGENT_REGISTRY):
+        self.extractor = extractor
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self._agents: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, name: str, data_schema, agent_id: Optional[str] = None, system_prompt: Optional[str] = None):
+        """
+        The agent for `data_schema`; with a `system_prompt` (see
+        schema_compiler) the prompt is part of the key and set on the agent's
+        config.
+        """
+        schema = data_schema.json_schema if isinstance(data_schema, BuiltSchema) else json_schema(data_schema)
+        digest = data_schema.hash if isinstance(data_schema, BuiltSchema) else schema_hash(schema)
+        key = digest if not system_prompt else schema_hash(schema, system_prompt)
+        with self._lock:
+            if key in self._agents:
+                return self._agents[key]
+            entry = self.entries.get(key)
+            if entry is not None:
+                agent = self._fetch(entry["id"])
+                if agent is not None:
+                    self._agents[key] = agent
+                    return agent
+            agent = self._fetch(agent_id) if agent_id else None
+            if agent is None:
+                agent = self._named(f"{name}-{key[:12]}", schema)
+            prompt_changed = system_prompt is not None and getattr(agent.config, "system_prompt", None) != system_prompt
+            if schema_hash(agent.data_schema) != digest or prompt_changed:
+                agent.data_schema = schema
+                if prompt_changed:
+                    agent.config = config_with(agent.config, system_prompt=system_prompt)
+                agent.save()
+            self._record(key, getattr(agent, "id", None) or agent_id, name)
+            self._agents[key] = agent
+            return agent
+
+    def _fetch(self, agent_id: Optional[str]):
+        if agent_id is None:
+            return None
+        try:
+            return self.extractor.get_agent(id=agent_id)
+        except Exception:
+            return None
+
+    def _named(self, agent_name: str, schema: dict):
+        try:
+            return self.extractor.get_agent(name=agent_name)
+        except Exception:
+            return self.extractor.create_agent(name=agent_name, data_schema=schema)
+
+    def _record(self, key: str, agent_id: Optional[str], name: str) -> None:
+        if agent_id is None:
+            return
+        # An agent holds one schema at a time, so older hashes pointing at it are stale
+        for stale in [k for k, e in self.entries.items() if e["id"] == agent_id]:
+            del self.entries[stale]
+        self.entries[key] = {"id": agent_id, "name": name}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
@@ -0,0 +1,244 @@
+"""
+Historical backfill over the full school x fiscal year x statement grid.
+
+    python backfill.py --years 2015-2024 --statement endowment --statement income_statement --route --prefilter
+
+Each issuer's filings are assigned to a fiscal year from the scraper's
+disclosure list, every (statement, year) gets its own agent with that year's
+schema, and all jobs of the grid share one bounded-concurrency run (with a
+shared rate limiter, cache and manifest). Results land in the Parquet panel,
+one partition per (statement, fiscal year). Re-running only extracts what is
+new or changed.
+"""
+import argparse
+import asyncio
+import os
+import re
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from agent_registry import AgentRegistry
+from derived_fields import apply_derived
+from document_classifier import DISCLOSURE_LIST, slugify
+from extraction_engine import EngineOptions, arun_jobs, discover_jobs, merge_by_school
+from extraction_manifest import ExtractionManifest
+from panel_store import DEFAULT_PANEL_ROOT, schools_frame, write_panel
+from schema_compiler import compile_schema
+from schema_sections import schema_sections, section_plan
+
+# University fiscal years end June 30: FY2024 runs July 2023 - June 2024
+FISCAL_YEAR_END_MONTH = 6
+DEFAULT_BACKFILL_ROOT = "output_backfill"
+_FY_IN_NAME = re.compile(r"\b(?:FY|fiscal\s+year(?:\s+ended)?)\s*(?:june\s+30,\s*)?'?(\d{4}|\d{2})\b", re.IGNORECASE)
+
+
+def _schema_factories() -> Dict[str, Callable[[int], object]]:
+    # cash_flow and enrollment have fixed 2024 / 2024-25 schemas (schemas.py), so they can't be backfilled
+    from BS_Schema import make_StatementOfFinancialPosition_model
+    from financial_schemas_endowment_final import generate_endowment_schema
+    from financial_schemas_incomestatement_final import generate_income_statement_schema
+
+    return {
+        "endowment": generate_endowment_schema,
+        "income_statement": generate_income_statement_schema,
+        "balance_sheet": make_StatementOfFinancialPosition_model,
+    }
+
+
+def parse_years(spec: str) -> List[int]:
+    """'2015-2024' or '2019,2021,2023'."""
+    if "-" in spec:
+        start, end = (int(y) for y in spec.split("-", 1))
+        return list(range(start, end + 1))
+    return [int(y) for y in spec.split(",")]
+
+
+def fiscal_year(row: pd.Series, end_month: int = FISCAL_YEAR_END_MONTH) -> Optional[int]:
+    """
+    Fiscal year a filing reports on: from its period date when EMMA has one,
+    else a year in the document name ("FY2023", "Fiscal Year 2023"), else the
+    fiscal year before the one it was posted in (annual reports are posted
+    after year end).
+    """
+    period = pd.to_datetime(row.get("period_date"), errors="coerce", format="mixed")
+    if not pd.isna(period):
+        return period.year + (1 if period.month > end_month else 0)
+    match = _FY_IN_NAME.search(str(row.get("document_name", "")))
+    if match:
+        year = int(match.group(1))
+        return year if year > 100 else 2000 + year
+    posted = pd.to_datetime(row.get("posted_date"), errors="coerce", format="mixed")
+    if not pd.isna(posted):
+        return posted.year - (0 if posted.month > end_month else 1)
+    return None
+
+
+def filing_years(csv_path: str = DISCLOSURE_LIST) -> Dict[Tuple[str, str], int]:
+    """{(school folder, file stem): fiscal year}, with names slugified the way the scraper saves them."""
+    df = pd.read_csv(csv_path).dropna(subset=["CREDIT", "document_name"])
+    years = {}
+    for _, row in df.iterrows():
+        year = fiscal_year(row)
+        if year is not None:
+            years[(slugify(row["CREDIT"]), slugify(row["document_name"]))] = year
+    return years
+
+
+def grid_key(statement: str, year: int) -> str:
+    return f"{statement}@{year}"
+
+
+def split_key(key: str) -> Tuple[str, int]:
+    statement, year = key.rsplit("@", 1)
+    return statement, int(year)
+
+
+def build_grid(
+    pdf_root: str,
+    statements: Iterable[str],
+    years: Iterable[int],
+    filings: Dict[Tuple[str, str], int],
+    router=None,
+):
+    """
+    One job per (school, pdf, statement) whose filing falls in `years`, with
+    the job's schema set to its grid key ("endowment@2023"). PDFs the
+    disclosure list has no fiscal year for are left out.
+    """
+    jobs = []
+    for year in years:
+        def in_year(school: str, files: List[str], year=year) -> List[str]:
+            return [f for f in files if filings.get((school, os.path.splitext(f)[0])) == year]
+
+        for job in discover_jobs(pdf_root, statements, in_year, router):
+            jobs.append(replace(job, schema=grid_key(job.schema, year)))
+    return jobs
+
+
+async def abackfill(
+    pdf_root: str,
+    statements: List[str],
+    years: List[int],
+    extractor,
+    filings: Dict[Tuple[str, str], int],
+    concurrency: int = 16,
+    agent_prefix: str = "backfill",
+    output_root: str = DEFAULT_BACKFILL_ROOT,
+    panel_root: str = DEFAULT_PANEL_ROOT,
+    router=None,
+    prefilter: Optional[Callable[[str, str], str]] = None,
+    sections: bool = False,
+    options: Optional[EngineOptions] = None,
+) -> Dict[str, Dict[str, Optional[dict]]]:
+    """
+    Extracts the whole grid in one run and writes every (statement, year)
+    to the panel. Returns {grid key: {school: combined}}. With `sections`
+    every schema large enough for section_plan is extracted section by
+    section through the stateless extractor. `options` (cache, limiter,
+    poller, journal) go to arun_jobs; the grid's prefilter, manifest and
+    sections are filled in. Raises ValueError for a
+    statement without a year-parametrized schema (cash_flow, enrollment).
+    """
+    factories = _schema_factories()
+    unsupported = [s for s in statements if s not in factories]
+    if unsupported:
+        raise ValueError(f"No year-parametrized schema for {', '.join(unsupported)}; backfill supports {', '.join(factories)}")
+    jobs = build_grid(pdf_root, statements, years, filings, router)
+    keys = sorted({job.schema for job in jobs})
+    registry = AgentRegistry(extractor)
+    agents = {}
+    for key in keys:
+        statement, year = split_key(key)
+        # Compiled like the notebooks' agents: the shared instructions go to the system prompt
+        compiled = compile_schema(factories[statement](year), statement)
+        agents[key] = registry.get(f"{agent_prefix}-{statement}-{year}", compiled.json_schema, system_prompt=compiled.system_prompt)
+    print(f"Backfill grid: {len(jobs)} job(s) over {len(keys)} (statement, year) cell(s)")
+
+    def prefilter_grid(path: str, key: str) -> str:
+        # page_locator keys its keywords on the plain statement name
+        return prefilter(path, split_key(key)[0])
+
+    os.makedirs(output_root, exist_ok=True)
+    manifest = ExtractionManifest(os.path.join(output_root, "extraction_manifest.json"))
+    options = replace(options or EngineOptions(), prefilter=prefilter_grid if prefilter is not None else None, manifest=manifest)
+    if sections:
+        options = replace(options, extractor=extractor, sections={
+            key: section_plan(schema_sections(factories[split_key(key)[0]], split_key(key)[1])) for key in keys
+        })
+    results = await arun_jobs(jobs, agents, concurrency, options)
+    manifest.prune(jobs, keys)
+    manifest.save()
+
+    merged = merge_by_school(jobs, results)
+    for key, schools in merged.items():
+        statement, year = split_key(key)
+        table = apply_derived(schools_frame(schools, agents[key].data_schema), statement)
+        write_panel(table, statement, year, panel_root)
+    return merged
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", required=True, help="e.g. 2015-2024 or 2021,2023")
+    parser.add_argument("--statement", action="append", required=True, choices=["endowment", "income_statement", "balance_sheet"],
+                        help="cash_flow and enrollment have fixed-year schemas and are not backfilled")
+    parser.add_argument("--pdf-root", default="private_universities/university_pdfs")
+    parser.add_argument("--disclosure-list", default=DISCLOSURE_LIST)
+    parser.add_argument("--output-root", default=DEFAULT_BACKFILL_ROOT)
+    parser.add_argument("--panel-root", default=DEFAULT_PANEL_ROOT)
+    parser.add_argument("--agent-prefix", default="backfill")
+    parser.add_argument("--project-id")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=5.0, help="request starts per second")
+    parser.add_argument("--route", action="store_true", help="send each statement only the PDFs the classifier picks")
+    parser.add_argument("--prefilter", action="store_true", help="trim PDFs to candidate pages")
+    parser.add_argument("--sections", action="store_true", help="extract each schema's sections concurrently, retrying them one by one")
+    parser.add_argument("--batch", action="store_true", help="queue every job up front and poll them together")
+    parser.add_argument("--replay", metavar="STORE", help="serve results from a replay store instead of LlamaExtract")
+    parser.add_argument("--dry-run", action="store_true", help="print the grid and exit")
+    args = parser.parse_args(argv)
+
+    years = parse_years(args.years)
+    filings = filing_years(args.disclosure_list)
+    router = None
+    if args.route:
+        from document_classifier import make_router
+        router = make_router(args.pdf_root, args.disclosure_list)
+
+    if args.dry_run:
+        jobs = build_grid(args.pdf_root, args.statement, years, filings, router)
+        grid = pd.DataFrame([split_key(j.schema) for j in jobs], columns=["statement", "fiscal_year"])
+        print(grid.value_counts().unstack(fill_value=0).to_string() if len(grid) else "No filings in range")
+        return
+
+    if args.replay:
+        from replay_extract import ReplayExtract, ReplayStore
+        extractor = ReplayExtract(ReplayStore(args.replay))
+    else:
+        from llama_cloud_services import LlamaExtract
+        extractor = LlamaExtract(project_id=args.project_id) if args.project_id else LlamaExtract()
+
+    from batch_poller import BatchPoller
+    from extraction_cache import ExtractionCache
+    from page_locator import prefilter_pdf, shared_prefilter
+    from rate_limiter import ExtractionLimiter
+
+    prefilter = None
+    if args.prefilter:
+        # Several statements: trim each PDF once for all of them so they share its upload
+        prefilter = shared_prefilter(args.statement) if len(set(args.statement)) > 1 else prefilter_pdf
+    limiter = ExtractionLimiter(rate=args.rate, concurrency=args.concurrency)
+    asyncio.run(abackfill(
+        args.pdf_root, args.statement, years, extractor, filings,
+        concurrency=args.concurrency, agent_prefix=args.agent_prefix,
+        output_root=args.output_root, panel_root=args.panel_root, router=router,
+        prefilter=prefilter, sections=args.sections,
+        options=EngineOptions(cache=ExtractionCache(), limiter=limiter, poller=BatchPoller(limiter=limiter) if args.batch else None),
+    ))
+    print(limiter.stats())
+
+
+if __name__ == "__main__":
+    main()
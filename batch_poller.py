@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Dict, Tuple
+
+from rate_limiter import THROTTLE_STATUS, error_status, is_retryable
+
+# Job states (llama_cloud StatusEnum values) that carry a usable extraction run
+FINISHED_STATUS = {"SUCCESS", "PARTIAL_SUCCESS"}
+PENDING_STATUS = "PENDING"
+
+
+def job_status(job) -> str:
+    status = getattr(job, "status", None)
+    return str(getattr(status, "value", status))
+
+
+class BatchPoller:
+    """
+    Submit-then-poll extraction: `submit` queues a file on the agent
+    (agent.queue_extraction) and immediately returns a future, and one shared
+    polling loop checks every outstanding job each `interval` seconds,
+    resolving the futures with the run data as jobs finish.
+
+    Nothing holds a blocking call open while the server works, so the whole
+    corpus is processed server-side in parallel. A job is failed after
+    `max_timeout` seconds, on an ERROR/CANCELLED status, or after
+    `max_poll_errors` consecutive transient errors while polling it.
+
+    With a rate_limiter.ExtractionLimiter the status calls take tokens from
+    its bucket, and a throttled poll backs its concurrency limit off, so
+    polling shares the request budget with the submissions.
+    """
+
+    def __init__(self, interval: float = 2.0, max_timeout: float = 2000.0, max_poll_errors: int = 5, limiter=None):
+        self.interval = interval
+        self.max_timeout = max_timeout
+        self.max_poll_errors = max_poll_errors
+        self.limiter = limiter
+        self._pending: Dict[str, Tuple[object, asyncio.Future, float]] = {}
+        self._poll_errors: Dict[str, int] = {}
+        self._task = None
+        self.submitted = 0
+        self.polls = 0
+
+    async def submit(self, agent, file_input) -> asyncio.Future:
+        """Queues one extraction and returns a future resolving to its data dict."""
+        job = await agent.queue_extraction(file_input)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[job.id] = (agent, future, time.monotonic())
+        self.submitted += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return future
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            self.polls += 1
+            await asyncio.gather(*(self._check(job_id) for job_id in list(self._pending)))
+
+    async def _check(self, job_id: str) -> None:
+        agent, future, started = self._pending[job_id]
+        try:
+            if self.limiter is not None:
+                await self.limiter.bucket.acquire()
+            job = await asyncio.to_thread(agent.get_extraction_job, job_id)
+            status = job_status(job)
+            if status != PENDING_STATUS:
+                if status not in FINISHED_STATUS:
+                    raise RuntimeError(f"Extraction job {job_id} {status}: {getattr(job, 'error', None)}")
+                run = await asyncio.to_thread(agent.get_extraction_run_for_job, job_id)
+        except Exception as err:
+            if self.limiter is not None and error_status(err) in THROTTLE_STATUS:
+                await self.limiter.aimd.throttle()
+            errors = self._poll_errors.get(job_id, 0) + 1
+            if is_retryable(err) and errors < self.max_poll_errors:
+                # Transient failure of the status call, not of the job: ask again next round
+                self._poll_errors[job_id] = errors
+                return
+            self._fail(job_id, future, err)
+            return
+        if status == PENDING_STATUS:
+            self._poll_errors.pop(job_id, None)
+            if time.monotonic() - started > self.max_timeout:
+                # Decided outside the retry path: a job that ran out of time is failed, not polled again
+                self._fail(job_id, future, TimeoutError(f"Timeout while extracting the file: {job_id}"))
+            return
+        self._finish(job_id)
+        if not future.done():
+            future.set_result(run.data or {})
+
+    def _fail(self, job_id: str, future: asyncio.Future, err: BaseException) -> None:
+        self._finish(job_id)
+        if not future.done():
+            future.set_exception(err)
+
+    def _finish(self, job_id: str) -> None:
+        self._pending.pop(job_id, None)
+        self._poll_errors.pop(job_id, None)
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "pending": len(self._pending), "polls": self.polls}
@@ -0,0 +1,139 @@
+"""
+End-to-end throughput benchmark of the notebook pipelines against recorded
+(or fake) LlamaExtract results, so no credentials are needed.
+
+    python benchmark.py --pdf-root university_pdfs_test --store replay_store.json --latency 2 --jitter 3
+
+Every (pipeline, mode) runs in a fresh process and reports documents/sec,
+wall time and peak RSS. Record a store first by wrapping the live extractor
+in a notebook: `extractor = RecordingExtract(LlamaExtract(...), ReplayStore())`.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Each notebook's schema, built the way the notebook builds it
+PIPELINES = {
+    "cash_flow": ("schemas", "StatementOfCashFlows2024", None),
+    "enrollment": ("schemas", "Enrollment2024_25", None),
+    "endowment": ("financial_schemas_endowment_final", "generate_endowment_schema", 2024),
+    "income_statement": ("financial_schemas_incomestatement_final", "generate_income_statement_schema", 2024),
+    "balance_sheet": ("BS_Schema", "make_StatementOfFinancialPosition_model", 2024),
+}
+
+MODES = ["sequential", "concurrent", "batch"]
+
+
+def load_model(pipeline: str):
+    module, name, fiscal_year = PIPELINES[pipeline]
+    obj = getattr(__import__(module), name)
+    return obj(fiscal_year) if fiscal_year is not None else obj
+
+
+def load_schema(pipeline: str):
+    """The pipeline's schema compiled the way the notebooks send it (see schema_compiler)."""
+    from schema_compiler import compile_schema
+
+    return compile_schema(load_model(pipeline), pipeline)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_pipeline(pipeline: str, mode: str, args) -> dict:
+    """One pipeline end to end: discover, route, prefilter, extract, merge, write all_schools.xlsx."""
+    import asyncio
+    import contextlib
+    import io
+
+    from batch_poller import BatchPoller
+    from document_classifier import make_router
+    from extraction_engine import EngineOptions, aextract_all, write_all_schools
+    from page_locator import prefilter_pdf
+    from replay_extract import RemoteStore, ReplayExtract, ReplayStore
+
+    store = RemoteStore(args.server) if args.server else ReplayStore(args.store)
+    extractor = ReplayExtract(store, latency=args.latency, jitter=args.jitter)
+    agent = extractor.get_agent(id=pipeline)
+    compiled = load_schema(pipeline)
+    agent.data_schema = compiled.json_schema
+    agent.config = compiled.config(agent.config)
+    concurrency = 1 if mode == "sequential" else args.concurrency
+    poller = BatchPoller(interval=args.poll_interval) if mode == "batch" else None
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as out:
+        router = make_router(args.pdf_root) if args.route else None
+        prefilter = prefilter_pdf if args.prefilter else None
+        results = asyncio.run(aextract_all(
+            args.pdf_root, {pipeline: agent}, concurrency=concurrency,
+            options=EngineOptions(prefilter=prefilter, poller=poller), router=router,
+        ))
+        write_all_schools(results.get(pipeline, {}), os.path.join(out, "all_schools.xlsx"), "2024-25")
+    wall = time.perf_counter() - start
+    return {
+        "pipeline": pipeline,
+        "mode": mode,
+        "documents": agent.calls,
+        "wall_s": round(wall, 2),
+        "docs_per_s": round(agent.calls / wall, 2) if wall else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "replayed": agent.replayed,
+        "faked": agent.missing,
+    }
+
+
+def _child(pipeline, mode, args, queue):
+    queue.put(run_pipeline(pipeline, mode, args))
+
+
+def run_isolated(pipeline: str, mode: str, args) -> dict:
+    """Runs in a fresh process so peak RSS belongs to this (pipeline, mode) alone."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(pipeline, mode, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main(argv=None) -> pd.DataFrame:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-root", default="university_pdfs_test")
+    parser.add_argument("--store", default="replay_store.json")
+    parser.add_argument("--server", help="replay server URL (python replay_extract.py) to use instead of --store")
+    parser.add_argument("--pipeline", action="append", choices=list(PIPELINES), help="default: all")
+    parser.add_argument("--mode", action="append", choices=MODES, help="default: all")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per replayed extraction")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--route", action="store_true", help="apply the document classifier")
+    parser.add_argument("--prefilter", action="store_true", help="trim PDFs to candidate pages")
+    parser.add_argument("--output", help="also write the table to this CSV")
+    args = parser.parse_args(argv)
+
+    rows = [
+        run_isolated(pipeline, mode, args)
+        for pipeline in args.pipeline or list(PIPELINES)
+        for mode in args.mode or MODES
+    ]
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
+    return table
+
+
+if __name__ == "__main__":
+    main()
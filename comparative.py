@@ -0,0 +1,119 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from extraction_engine import EMPTY_VALUES, json_schema
+from panel_store import DEFAULT_PANEL_ROOT, load_panel, schools_frame, write_panel
+
+# Prior-year (comparative column) fields are the current-year field names with this suffix
+PRIOR_SUFFIX = "__prior_year"
+PRIOR_NOTE = "Comparative (prior-year) column of the same statement: "
+
+
+def comparative_schema(factory: Callable[[int], object], fiscal_year: int) -> dict:
+    """
+    One flat JSON schema asking for both columns audited statements show side
+    by side: the factory's fields for `fiscal_year`, then the same fields for
+    `fiscal_year - 1` (built by the factory, so every description names the
+    prior year) with PRIOR_SUFFIX appended. Only the current year's fields
+    keep their `required` status.
+
+    Works with any single-year factory: generate_endowment_schema,
+    generate_income_statement_schema, make_StatementOfFinancialPosition_model.
+    """
+    current = json_schema(factory(fiscal_year))
+    prior = json_schema(factory(fiscal_year - 1))
+    properties = dict(current.get("properties", {}))
+    for name, prop in prior.get("properties", {}).items():
+        prop = dict(prop)
+        prop["description"] = PRIOR_NOTE + prop.get("description", "")
+        properties[name + PRIOR_SUFFIX] = prop
+    schema = {**current, "properties": properties}
+    schema["title"] = f"{current.get('title', 'Schema')}_Comparative_{fiscal_year - 1}_{fiscal_year}"
+    return schema
+
+
+def comparative_sections(sections: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """schema_sections for a comparative_schema: each section also asks for its prior-year column."""
+    return {name: fields + [f + PRIOR_SUFFIX for f in fields] for name, fields in sections.items()}
+
+
+def split_periods(combined: Optional[dict], fiscal_year: int) -> Dict[int, Optional[dict]]:
+    """{fiscal_year: current fields, fiscal_year - 1: prior fields (suffix removed)} for one school."""
+    if combined is None:
+        return {fiscal_year: None, fiscal_year - 1: None}
+    current = {k: v for k, v in combined.items() if not k.endswith(PRIOR_SUFFIX)}
+    prior = {k[:-len(PRIOR_SUFFIX)]: v for k, v in combined.items() if k.endswith(PRIOR_SUFFIX)}
+    has_prior = any(v not in EMPTY_VALUES for v in prior.values())
+    return {fiscal_year: current, fiscal_year - 1: prior if has_prior else None}
+
+
+def split_schools(
+    schools: Dict[str, Optional[dict]], fiscal_year: int
+) -> Tuple[Dict[str, Optional[dict]], Dict[str, Optional[dict]]]:
+    """Splits aextract_all's {school: combined} into (current-year, prior-year) dicts."""
+    current, prior = {}, {}
+    for school, combined in schools.items():
+        periods = split_periods(combined, fiscal_year)
+        current[school] = periods[fiscal_year]
+        prior[school] = periods[fiscal_year - 1]
+    return current, prior
+
+
+def cross_check(
+    statement: str,
+    prior: pd.DataFrame,
+    prior_year: int,
+    root: str = DEFAULT_PANEL_ROOT,
+    tolerance: float = 0.005,
+) -> pd.DataFrame:
+    """
+    Compares the prior-year column just extracted (a schools_frame) with the
+    values the panel already holds for that year, usually last year's run.
+    Returns one row per numeric value that differs by more than `tolerance`
+    (relative): restatements, or an extraction error on either side.
+    """
+    stored = load_panel(statement, years=[prior_year], schools=list(prior.index), root=root)
+    stored = stored.reset_index(level="fiscal_year", drop=True)
+    metrics = [c for c in prior.columns if c in stored.columns]
+    rows = []
+    for school in prior.index.intersection(stored.index):
+        for metric in metrics:
+            new, old = prior.at[school, metric], stored.at[school, metric]
+            if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or pd.isna(new) or pd.isna(old):
+                continue
+            if abs(new - old) > tolerance * max(abs(old), 1):
+                rows.append({"school": school, "metric": metric, "stored": old, "restated": new})
+    return pd.DataFrame(rows, columns=["school", "metric", "stored", "restated"])
+
+
+def write_prior_year(prior: pd.DataFrame, statement: str, prior_year: int, root: str = DEFAULT_PANEL_ROOT) -> str:
+    """
+    Writes the prior-year column into the panel without overwriting what is
+    already there: values extracted as a report's current year win, the prior
+    column only fills schools and metrics the panel doesn't have yet.
+    """
+    stored = load_panel(statement, years=[prior_year], schools=list(prior.index), root=root)
+    stored = stored.reset_index(level="fiscal_year", drop=True)
+    return write_panel(stored.combine_first(prior).reindex(columns=list(prior.columns) + [
+        c for c in stored.columns if c not in prior.columns
+    ]), statement, prior_year, root)
+
+
+def write_comparative(
+    schools: Dict[str, Optional[dict]],
+    statement: str,
+    fiscal_year: int,
+    data_schema=None,
+    root: str = DEFAULT_PANEL_ROOT,
+) -> Tuple[Dict[str, Optional[dict]], pd.DataFrame]:
+    """
+    Handles a comparative run's results in one step: splits them, cross-checks
+    the prior column against the panel, fills the prior year into the panel
+    and returns (current-year {school: combined}, cross-check mismatches).
+    """
+    current, prior = split_schools(schools, fiscal_year)
+    prior_table = schools_frame(prior, data_schema)
+    mismatches = cross_check(statement, prior_table, fiscal_year - 1, root)
+    write_prior_year(prior_table, statement, fiscal_year - 1, root)
+    return current, mismatches
@@ -0,0 +1,266 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple, Union
+
+import pandas as pd
+
+# How a Residual treats components that weren't extracted
+ANY = "any"    # missing components count as 0; needs the total and at least one component
+ZERO = "zero"  # missing components count as 0; needs only the total
+ALL = "all"    # every component must be there, else the residual is missing
+
+
+@dataclass(frozen=True)
+class Residual:
+    """target = total - sign * sum(components): what the extracted line items leave of a reported total."""
+    target: str
+    total: str
+    components: Tuple[str, ...]
+    missing: str = ANY
+    sign: int = 1
+
+
+@dataclass(frozen=True)
+class Fill:
+    """
+    target = sign * sum(components) where the target wasn't extracted (or is 0
+    when zero_is_missing) and at least one component was; missing components
+    count as 0. Reported values are left alone.
+    """
+    target: str
+    components: Tuple[str, ...]
+    zero_is_missing: bool = True
+    sign: int = 1
+
+
+@dataclass(frozen=True)
+class Identity:
+    """
+    total == sum(components) - sum(subtract), within `tolerance` x |total|.
+    `missing` works as for Residual; with ZERO a missing total counts as 0
+    too. Checked, never written.
+    """
+    total: str
+    components: Tuple[str, ...]
+    subtract: Tuple[str, ...] = ()
+    missing: str = ZERO
+    tolerance: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.total} = " + " + ".join(self.components) + "".join(f" - {f}" for f in self.subtract)
+
+    def fields(self, statement: str) -> Tuple[str, ...]:
+        return (self.total,) + self.components + self.subtract
+
+
+@dataclass(frozen=True)
+class Bound:
+    """
+    A Residual kept within [low, high] x |total|: a negative plug, or one
+    that swallows a large share of the total, means a line item was missed
+    or misread. The residual's total and components are the fields implicated.
+    """
+    target: str
+    low: float = -0.005
+    high: float = 0.5
+
+    @property
+    def name(self) -> str:
+        return f"{self.low:g} <= {self.target} / total <= {self.high:g}"
+
+    def fields(self, statement: str) -> Tuple[str, ...]:
+        rule = _rule(statement, self.target)
+        return (rule.total,) + rule.components
+
+
+Rule = Union[Residual, Fill]
+Check = Union[Identity, Bound]
+
+# Applied in order, so a rule may use a field an earlier rule filled
+DERIVED: Dict[str, List[Rule]] = {
+    "income_statement": [
+        Residual("other_investment_income", "investment_income_total", ("investment_income_operations",)),
+        Residual("other_operating_revenue", "total_operating_revenue", (
+            "gross_tuition_revenue", "net_tuition_revenue", "federal_grants_contracts",
+            "state_local_grants_contracts", "government_grants_contracts_total",
+            "state_appropriations", "private_gifts_grants_contracts",
+            "total_gifts_contracts_other_support", "private_gifts_with_donor_restrictions",
+            "investment_income_total", "auxiliary_enterprise_revenue",
+            "healthcare_clinical_revenue", "net_assets_released_from_restrictions",
+        )),
+        Residual("other_operating_expense", "total_operating_expense", (
+            "instructional_expense", "research_expense", "instructional_research_expense",
+            "auxiliary_enterprise_expense", "healthcare_clinical_expense", "academic_support",
+            "student_services", "institutional_support", "public_service_expense",
+            "student_aid_expense",
+        )),
+        Residual("other_non_op_revenue", "non_operating_revenue", ("non_op_realized_gains",)),
+        Residual("other_non_op_expense", "non_operating_expense", ("non_op_realized_losses",)),
+        Residual("other_adj_net_assets_without_restrictions", "change_net_assets_without_donor_restrictions", (
+            "net_assets_released_for_capital",
+        )),
+        Residual("other_adj_to_net_assets", "total_change_in_net_assets", (
+            "change_net_assets_without_donor_restrictions", "change_net_assets_with_donor_restrictions",
+            "change_temp_restricted_net_assets", "change_perm_restricted_net_assets",
+        )),
+    ],
+    "balance_sheet": [
+        Residual("other_assets_plug", "total_assets", (
+            "cash_and_short_term_investments_unrestricted_and_restricted",
+            "net_receivables",
+            "net_fixed_assets",
+            "long_term_investments_unrestricted_and_restricted",
+            "rou_assets_finance_lease",
+            "rou_assets_operating_lease",
+        ), missing=ZERO),
+        Residual("other_liabilities_plug", "total_liabilities", (
+            "short_term_debt",
+            "current_portion_finance_lease",
+            "current_portion_long_term_debt",
+            "current_portion_operating_lease",
+            "accounts_payable",
+            "deferred_revenue",
+            "long_term_debt",
+            "long_term_finance_lease",
+            "long_term_operating_lease",
+            "swap_obligation_fmv",
+            "pension_and_opeb_liability",
+            "pension_liability",
+            "opeb_liability",
+        ), missing=ZERO),
+        Residual("expendable_net_assets_with_donor_restrictions_calculated", "net_assets_with_donor_restrictions", (
+            "perpetual_net_assets_with_donor_restrictions",
+        ), missing=ALL),
+    ],
+    "cash_flow": [
+        Fill("net_cash_from_financing_activities", (
+            "cash_flows_from_capital_and_related_financing_activities",
+            "cash_flows_from_noncapital_financing_activities",
+        )),
+    ],
+}
+
+# Totals extracted in thousands often differ from the sum of their rounded lines by a unit or two
+TOLERANCE = 0.001
+
+CHECKS: Dict[str, List[Check]] = {
+    "cash_flow": [
+        Identity("change_in_cash_and_equivalents", (
+            "net_cash_from_operating_activities",
+            "net_cash_from_investment_activities",
+            "net_cash_from_financing_activities",
+        )),
+    ],
+    "balance_sheet": [
+        Identity("total_net_assets", (
+            "net_assets_without_donor_restrictions", "net_assets_with_donor_restrictions",
+        ), missing=ALL, tolerance=TOLERANCE),
+        Identity("total_liabilities_and_net_assets", ("total_liabilities", "total_net_assets"), missing=ALL, tolerance=TOLERANCE),
+        Identity("total_assets", ("total_liabilities_and_net_assets",), missing=ALL, tolerance=TOLERANCE),
+        Bound("other_assets_plug"),
+        Bound("other_liabilities_plug"),
+    ],
+    "income_statement": [
+        Identity("net_operating_income", ("total_operating_revenue",), subtract=("total_operating_expense",),
+                 missing=ALL, tolerance=TOLERANCE),
+        Identity("total_change_in_net_assets", (
+            "change_net_assets_without_donor_restrictions", "change_net_assets_with_donor_restrictions",
+        ), missing=ALL, tolerance=TOLERANCE),
+    ],
+    "endowment": [
+        Identity("endowment_net_assets_eoy_total", (
+            "endowment_net_assets_eoy_without_donor_restrictions", "endowment_net_assets_eoy_with_donor_restrictions",
+        ), missing=ALL, tolerance=TOLERANCE),
+        Identity("appropriation_of_endowment_for_expenditure_total", (
+            "appropriation_of_endowment_for_expenditure_without_donor_restrictions",
+            "appropriation_of_endowment_for_expenditure_with_donor_restrictions",
+        ), missing=ALL, tolerance=TOLERANCE),
+        Identity("investments_total_fair_value", (
+            "investment_level_1", "investment_level_2", "investment_level_3", "investments_measured_at_nav",
+        ), missing=ANY, tolerance=TOLERANCE),
+    ],
+}
+
+
+def _rule(statement: str, target: str) -> Rule:
+    return next(rule for rule in DERIVED[statement] if rule.target == target)
+
+
+def _numbers(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    # Fields the table doesn't have count as not extracted; text answers as missing
+    block = df.reindex(columns=list(columns))
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        block = block.apply(pd.to_numeric, errors="coerce")
+    return block.astype("float64")
+
+
+def _residual(df: pd.DataFrame, rule: Residual) -> pd.Series:
+    total = _numbers(df, [rule.total]).iloc[:, 0]
+    parts = _numbers(df, rule.components)
+    value = total - rule.sign * parts.sum(axis=1, skipna=rule.missing != ALL)
+    if rule.missing == ANY:
+        value = value.where(parts.notna().any(axis=1))
+    return value
+
+
+def _fill(df: pd.DataFrame, rule: Fill) -> pd.Series:
+    current = _numbers(df, [rule.target]).iloc[:, 0]
+    parts = _numbers(df, rule.components)
+    empty = current.isna() | (current == 0) if rule.zero_is_missing else current.isna()
+    return current.mask(empty & parts.notna().any(axis=1), rule.sign * parts.sum(axis=1))
+
+
+def apply_derived(df: pd.DataFrame, statement: str, rules: Dict[str, List[Rule]] = DERIVED) -> pd.DataFrame:
+    """
+    Adds (or refreshes) the statement's derived fields on a copy of `df`,
+    one column operation per rule over every row at once. Works on a
+    schools_frame table and on a load_panel school x year panel alike.
+    """
+    out = df.copy()
+    for rule in rules.get(statement, []):
+        out[rule.target] = _residual(out, rule) if isinstance(rule, Residual) else _fill(out, rule)
+    return out
+
+
+def _failed(df: pd.DataFrame, statement: str, check: Check) -> pd.Series:
+    if isinstance(check, Bound):
+        rule = _rule(statement, check.target)
+        total = _numbers(df, [rule.total]).iloc[:, 0].abs()
+        share = _numbers(df, [check.target]).iloc[:, 0] / total.where(total > 0)
+        return (share < check.low) | (share > check.high)
+    total = _numbers(df, [check.total]).iloc[:, 0]
+    parts = _numbers(df, check.components)
+    minus = _numbers(df, check.subtract)
+    both = pd.concat([parts, minus], axis=1)
+    expected = parts.fillna(0).sum(axis=1) - minus.fillna(0).sum(axis=1)
+    if check.missing == ZERO:
+        total = total.fillna(0)
+        checked = pd.Series(True, index=df.index)
+    elif check.missing == ANY:
+        checked = total.notna() & both.notna().any(axis=1)
+    else:
+        checked = total.notna() & both.notna().all(axis=1)
+    off = (total - expected).abs() > check.tolerance * total.abs()
+    return checked & off
+
+
+def check_failures(df: pd.DataFrame, statement: str, checks: Dict[str, List[Check]] = CHECKS) -> pd.DataFrame:
+    """
+    One row per (row of `df`, failed check), indexed like `df`, with the
+    check's name and the fields it implicates. Run it on a table that went
+    through apply_derived, so plugs and filled totals are there.
+    """
+    failed = []
+    for check in checks.get(statement, []):
+        mask = _failed(df, statement, check)
+        rows = df.index[mask.to_numpy()]
+        failed.append(pd.DataFrame({"check": check.name, "fields": [check.fields(statement)] * len(rows)}, index=rows))
+    if not failed:
+        return pd.DataFrame(columns=["check", "fields"], index=df.index[:0])
+    return pd.concat(failed)
+
+
+def failing_rows(df: pd.DataFrame, statement: str, checks: Dict[str, List[Check]] = CHECKS) -> pd.Index:
+    """Index of the rows where one of the statement's checks fails, in table order."""
+    failed = check_failures(df, statement, checks).index
+    return df.index[df.index.isin(failed)]
@@ -0,0 +1,185 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from page_locator import PAGE_KEYWORDS, page_texts
+
+DISCLOSURE_LIST = "private_universities/disclosure_document_list_filtered.csv"
+STATEMENT_TYPES = ["balance_sheet", "cash_flow", "income_statement", "endowment", "enrollment"]
+
+# How many leading pages are scanned (cover, table of contents, first statements)
+TEXT_PAGES = 5
+# Documents scoring at or above this are dispatched to the statement's extractor
+ROUTE_THRESHOLD = 0.35
+
+WEIGHTS = {"filename": 0.35, "subgroup": 0.25, "text": 0.40}
+
+_FINANCIAL = {"balance_sheet": 1.0, "cash_flow": 1.0, "income_statement": 1.0, "endowment": 1.0, "enrollment": 0.1}
+_OPERATING = {"balance_sheet": 0.1, "cash_flow": 0.0, "income_statement": 0.2, "endowment": 0.2, "enrollment": 1.0}
+_MIXED     = {"balance_sheet": 0.6, "cash_flow": 0.5, "income_statement": 0.6, "endowment": 0.6, "enrollment": 0.8}
+
+# Filename fragments (lower-case, as written by links_scraper's slugify) -> per-statement score.
+# A fragment matches whole words of the name, so "rating" doesn't match "operating"
+FILENAME_SIGNALS: List[Tuple[str, Dict[str, float]]] = [
+    ("audited", _FINANCIAL),
+    ("financial_statement", _FINANCIAL),
+    ("acfr", _FINANCIAL),
+    ("financial_stmts", _FINANCIAL),
+    ("financial_report", _FINANCIAL),
+    ("unaudited", _FINANCIAL),
+    ("financials_and_operating", _MIXED),
+    ("financial_information_and_operating", _MIXED),
+    ("financial_and_operating", _MIXED),
+    ("financial_operating", _MIXED),
+    ("annual_report", _MIXED),
+    ("continuing_disclosure", _MIXED),
+    ("continued_disclosure", _MIXED),
+    ("operating_data", _OPERATING),
+    ("operating_information", _OPERATING),
+    ("enrollment", _OPERATING),
+    ("applications", _OPERATING),
+]
+
+# Filings that never carry the statements we extract, whatever else they mention;
+# their score is scaled by NEGATIVE_PENALTY
+NEGATIVE_PENALTY = 0.3
+NEGATIVE_FILENAME_SIGNALS = [
+    "compliance_certificate",
+    "certificate_of_compliance",
+    "amendment",
+    "undertaking",
+    "quarterly",
+    "bondholder",
+    "rating",
+    "notice",
+]
+
+# EMMA subgroup (disclosure_document_list_*.csv) -> per-statement score
+SUBGROUP_SIGNALS: Dict[str, Dict[str, float]] = {
+    "Audited Financial Statements or ACFR": _FINANCIAL,
+    "Annual Financial Information and Operating Data": _MIXED,
+    "Other Financial / Operating Data": _OPERATING,
+    "Quarterly / Monthly Financial Information": {s: 0.1 for s in STATEMENT_TYPES},
+    "Amendment to Continuing Disclosure Undertaking": {s: 0.0 for s in STATEMENT_TYPES},
+}
+
+
+def slugify(text):
+    # Same as links_scraper.ipynb, so CSV rows map onto downloaded folder and file names
+    return re.sub(r"[^\w\-. ]", "_", text).strip().replace(" ", "_")
+
+
+def load_subgroups(csv_path: str = DISCLOSURE_LIST) -> Dict[Tuple[str, str], str]:
+    """{(school folder, file stem): EMMA subgroup} from the scraper's disclosure list."""
+    if not os.path.exists(csv_path):
+        return {}
+    df = pd.read_csv(csv_path).dropna(subset=["CREDIT", "document_name", "subgroup"])
+    return {
+        (slugify(credit), slugify(name)): subgroup
+        for credit, name, subgroup in zip(df["CREDIT"], df["document_name"], df["subgroup"])
+    }
+
+
+def _words(fname: str) -> List[str]:
+    return [w for w in re.split(r"[_\-. ]+", os.path.splitext(fname)[0].lower()) if w]
+
+
+def has_fragment(fname: str, fragment: str) -> bool:
+    """Whether the fragment's words appear in a row in the name (a plural "s" allowed on each)."""
+    words, wanted = _words(fname), fragment.split("_")
+    for i in range(len(words) - len(wanted) + 1):
+        if all(w in (f, f + "s") for w, f in zip(words[i:i + len(wanted)], wanted)):
+            return True
+    return False
+
+
+def filename_scores(fname: str) -> Dict[str, float]:
+    scores = {s: 0.0 for s in STATEMENT_TYPES}
+    for fragment, signal in FILENAME_SIGNALS:
+        if has_fragment(fname, fragment):
+            for s in STATEMENT_TYPES:
+                scores[s] = max(scores[s], signal.get(s, 0.0))
+    return scores
+
+
+def is_excluded_filing(fname: str) -> bool:
+    return any(has_fragment(fname, fragment) for fragment in NEGATIVE_FILENAME_SIGNALS)
+
+
+def text_scores(path: str, pages: int = TEXT_PAGES) -> Optional[Dict[str, float]]:
+    """Keyword hits in the first pages; None when the text layer can't be read."""
+    try:
+        text = " ".join(page_texts(path)[:pages])
+    except Exception:
+        return None
+    return {
+        s: min(1.0, sum(k in text for k in PAGE_KEYWORDS[s]) / 2)
+        for s in STATEMENT_TYPES
+    }
+
+
+def classify_document(path: str, subgroup: Optional[str] = None) -> Dict[str, float]:
+    """
+    Scores one PDF for every statement type in [0, 1] from its filename,
+    its EMMA subgroup and its first pages' text. Signals that are missing
+    (no CSV row, no text layer) are left out and the weights renormalised.
+    """
+    signals = {"filename": filename_scores(os.path.basename(path))}
+    if subgroup in SUBGROUP_SIGNALS:
+        signals["subgroup"] = SUBGROUP_SIGNALS[subgroup]
+    text = text_scores(path)
+    if text is not None:
+        signals["text"] = text
+
+    total_weight = sum(WEIGHTS[name] for name in signals)
+    penalty = NEGATIVE_PENALTY if is_excluded_filing(os.path.basename(path)) else 1.0
+    return {
+        s: round(penalty * sum(WEIGHTS[name] * scores.get(s, 0.0) for name, scores in signals.items()) / total_weight, 3)
+        for s in STATEMENT_TYPES
+    }
+
+
+def classify_corpus(pdf_root: str, csv_path: str = DISCLOSURE_LIST) -> pd.DataFrame:
+    """One row per (school, pdf) with a score column per statement type."""
+    subgroups = load_subgroups(csv_path)
+    rows = []
+    for school in sorted(os.listdir(pdf_root)):
+        school_dir = os.path.join(pdf_root, school)
+        if not os.path.isdir(school_dir):
+            continue
+        for fname in sorted(os.listdir(school_dir)):
+            if not fname.lower().endswith(".pdf"):
+                continue
+            subgroup = subgroups.get((school, os.path.splitext(fname)[0]))
+            scores = classify_document(os.path.join(school_dir, fname), subgroup)
+            rows.append({"school": school, "pdf": fname, "subgroup": subgroup, **scores})
+    return pd.DataFrame(rows, columns=["school", "pdf", "subgroup", *STATEMENT_TYPES])
+
+
+def make_router(
+    pdf_root: str,
+    csv_path: str = DISCLOSURE_LIST,
+    threshold: float = ROUTE_THRESHOLD,
+) -> Callable[[str, List[str], str], List[str]]:
+    """
+    Builds a router(school, pdf_files, schema) for the extraction engine that
+    keeps only the documents scoring >= threshold for the schema. If none of a
+    school's documents pass, its best-scoring document is still sent so a
+    statement is never dropped for a school outright.
+    """
+    scores = classify_corpus(pdf_root, csv_path).set_index(["school", "pdf"])
+
+    def router(school: str, pdf_files: List[str], schema: str) -> List[str]:
+        if schema not in STATEMENT_TYPES:
+            return pdf_files
+        known = [f for f in pdf_files if (school, f) in scores.index]
+        if not known:
+            return pdf_files
+        picked = [f for f in known if scores.at[(school, f), schema] >= threshold]
+        if not picked:
+            picked = [max(known, key=lambda f: scores.at[(school, f), schema])]
+        return [f for f in pdf_files if f in picked]
+
+    return router
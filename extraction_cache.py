@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from extraction_engine import json_schema
+
+DEFAULT_CACHE_DIR = ".extraction_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Writes between re-reads of the directory, which pick up entries other processes added or removed
+RESCAN_EVERY = 1000
+
+# (path, size, mtime_ns) -> sha256, so unchanged PDFs are only hashed once per session
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of the PDF bytes (memoized on path, size and mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _file_hashes[memo_key] = h.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def schema_hash(schema, system_prompt: Optional[str] = None) -> str:
+    """
+    Stable hash of a schema: the Pydantic model produced by generate_endowment_schema,
+    generate_income_statement_schema, make_StatementOfFinancialPosition_model or the
+    schemas.py classes, or the JSON schema dict an agent already holds.
+
+    With a `system_prompt` (the instructions schema_compiler moves out of the
+    field descriptions) the prompt is part of the hash, so editing it
+    invalidates results like editing the descriptions would.
+    """
+    canonical = json.dumps(json_schema(schema), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    if not system_prompt:
+        return digest
+    return hashlib.sha256(f"{digest}\n{system_prompt}".encode("utf-8")).hexdigest()
+
+
+def _referenced_defs(node, defs: dict, found: Optional[dict] = None) -> dict:
+    """The $defs entries a schema fragment refers to, followed transitively."""
+    found = {} if found is None else found
+    if isinstance(node, dict):
+        ref = node.get("$ref", "")
+        name = ref.rsplit("/", 1)[-1] if ref.startswith("#/$defs/") else None
+        if name in defs and name not in found:
+            found[name] = defs[name]
+            _referenced_defs(defs[name], defs, found)
+        for value in node.values():
+            _referenced_defs(value, defs, found)
+    elif isinstance(node, list):
+        for value in node:
+            _referenced_defs(value, defs, found)
+    return found
+
+
+def field_hashes(schema, system_prompt: Optional[str] = None) -> Dict[str, str]:
+    """
+    {field: hash} over each property's own definition (description, type, the
+    $defs it uses) plus the schema-level title and description and the
+    system prompt, so editing one field's description only invalidates that
+    field and editing the prompt invalidates them all.
+    """
+    schema = json_schema(schema)
+    properties = schema.get("properties", {})
+    defs = schema.get("$defs", {})
+    context = {k: v for k, v in schema.items() if k not in ("properties", "required", "$defs")}
+    if system_prompt:
+        context["system_prompt"] = system_prompt
+    required = set(schema.get("required", []))
+    hashes = {}
+    for name, prop in properties.items():
+        canonical = json.dumps(
+            {"context": context, "name": name, "field": prop,
+             "defs": _referenced_defs(prop, defs), "required": name in required},
+            sort_keys=True, separators=(",", ":"),
+        )
+        hashes[name] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return hashes
+
+
+def sub_schema(schema, fields: List[str]) -> dict:
+    """The JSON schema restricted to `fields` (with only the $defs they need)."""
+    schema = json_schema(schema)
+    properties = {f: schema["properties"][f] for f in fields}
+    sub = {k: v for k, v in schema.items() if k not in ("properties", "required", "$defs")}
+    sub["properties"] = properties
+    sub["required"] = [f for f in schema.get("required", []) if f in properties]
+    defs = _referenced_defs(properties, schema.get("$defs", {}))
+    if defs:
+        sub["$defs"] = defs
+    return sub
+
+
+class ExtractionCache:
+    """
+    On-disk cache of extraction results keyed on (PDF content hash, schema hash).
+
+    Each entry is a small JSON file under `root`. When the cache grows past
+    `max_bytes` the least recently used entries are evicted (a hit refreshes
+    the entry's mtime).
+
+    Every value is also kept per PDF under its field hash, so after a schema
+    edit `get_fields` can return the fields that did not change and name the
+    ones that must be extracted again.
+
+    Sizes and recency are tallied in an in-memory LRU index, read from disk
+    once and then every `rescan_every` writes, so a put costs no directory
+    walk; the rescans keep several processes sharing one cache directory
+    close to the same total.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, rescan_every: int = RESCAN_EVERY):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.rescan_every = rescan_every
+        self._index: Optional["OrderedDict[str, int]"] = None  # entry -> size, least recently used first
+        self._bytes = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.partial_hits = 0
+        self.field_hits = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _entries(self):
+        for dirpath, _, files in os.walk(self.root):
+            for f in files:
+                if f.endswith(".json"):
+                    yield os.path.join(dirpath, f)
+
+    def _entry_path(self, pdf_hash: str, schema_digest: str) -> str:
+        return os.path.join(self.root, pdf_hash[:2], f"{pdf_hash}-{schema_digest[:16]}.json")
+
+    def key_path(self, path: str, schema, system_prompt: Optional[str] = None) -> str:
+        return self._entry_path(file_sha256(path), schema_hash(schema, system_prompt))
+
+    def get(self, path: str, schema, system_prompt: Optional[str] = None) -> Optional[dict]:
+        """Cached result for this (document, schema, system prompt), or None on a miss."""
+        entry = self.key_path(path, schema, system_prompt)
+        try:
+            with open(entry, encoding="utf-8") as f:
+                data = json.load(f)["data"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        os.utime(entry)
+        with self._lock:
+            if self._index is not None and entry in self._index:
+                self._index.move_to_end(entry)
+        self.hits += 1
+        return data
+
+    def _fields_path(self, pdf_hash: str) -> str:
+        return os.path.join(self.root, pdf_hash[:2], f"{pdf_hash}.fields.json")
+
+    def _read_fields(self, entry: str) -> Dict[str, object]:
+        try:
+            with open(entry, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entry: str, payload) -> None:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        body = json.dumps(payload).encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, entry)
+        size = len(body)
+        with self._lock:
+            self._load_index()
+            self._bytes += size - self._index.pop(entry, 0)
+            self._index[entry] = size
+            self._writes += 1
+
+    def _sizes(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry on disk."""
+        sizes = []
+        for entry in self._entries():
+            try:
+                st = os.stat(entry)
+            except OSError:
+                # Removed by another process meanwhile
+                continue
+            sizes.append((st.st_mtime, st.st_size, entry))
+        return sizes
+
+    def _load_index(self, force: bool = False) -> None:
+        """Builds the LRU index from disk on first use and when `force`d (caller holds the lock)."""
+        if self._index is not None and not force:
+            return
+        sizes = sorted(self._sizes())
+        self._index = OrderedDict((entry, size) for _, size, entry in sizes)
+        self._bytes = sum(size for _, size, _ in sizes)
+        self._writes = 0
+
+    def get_fields(self, path: str, schema, system_prompt: Optional[str] = None) -> Tuple[Dict[str, object], Optional[dict]]:
+        """
+        ({field: cached value}, sub-schema of the fields to extract) for this
+        document under `schema`, matching fields by their field hash. The
+        sub-schema is None when nothing or everything is cached per field;
+        with everything cached `known` is the full result (a hit), e.g. after
+        an edit was reverted or a sectioned extraction completed piecewise.
+        """
+        stored = self._read_fields(self._fields_path(file_sha256(path)))
+        known, missing = {}, []
+        for name, digest in field_hashes(schema, system_prompt).items():
+            if digest in stored:
+                known[name] = stored[digest]
+            else:
+                missing.append(name)
+        if known and not missing:
+            self.field_hits += 1
+        if not (known and missing):
+            return known, None
+        self.partial_hits += 1
+        return known, sub_schema(schema, missing)
+
+    def put(self, path: str, schema, data: dict, system_prompt: Optional[str] = None) -> None:
+        pdf_hash = file_sha256(path)
+        self._write(self._entry_path(pdf_hash, schema_hash(schema, system_prompt)), {"pdf": os.path.basename(path), "data": data})
+        fields = {name: data.get(name) for name in json_schema(schema).get("properties", {})}
+        self.put_fields(path, schema, fields, system_prompt)
+
+    def put_fields(self, path: str, schema, data: dict, system_prompt: Optional[str] = None) -> None:
+        """
+        Keeps only the per-field values of `data` (the fields of `schema` it
+        has), e.g. the sections of a partly failed extraction, so the next
+        get_fields asks for the rest alone.
+        """
+        fields_entry = self._fields_path(file_sha256(path))
+        stored = self._read_fields(fields_entry)
+        stored.update({digest: data[name] for name, digest in field_hashes(schema, system_prompt).items() if name in data})
+        self._write(fields_entry, stored)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            self._load_index(force=self._writes >= self.rescan_every)
+            while self._bytes > self.max_bytes and self._index:
+                entry, size = self._index.popitem(last=False)
+                self._bytes -= size
+                try:
+                    os.remove(entry)
+                except OSError:
+                    # Already removed by another process
+                    continue
+                self.evictions += 1
+
+    def _size(self) -> int:
+        with self._lock:
+            self._load_index()
+            return self._bytes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "field_hits": self.field_hits,
+            "partial_hits": self.partial_hits,
+            "hit_rate": (self.hits + self.field_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._size(),
+        }
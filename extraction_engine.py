@@ -0,0 +1,601 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import pandas as pd
+from pydantic import BaseModel
+
+from tracing import span
+from workbook_stream import StreamingSchoolsWriter
+
+# Values that never overwrite an earlier PDF's result when merging a school
+EMPTY_VALUES = (None, "", [])
+
+
+@dataclass(frozen=True)
+class ExtractionJob:
+    """One remote extraction: a single PDF of a school run against a single schema."""
+    school: str
+    pdf: str
+    schema: str
+    path: str
+
+
+def json_schema(schema: Union[dict, Type[BaseModel]]) -> dict:
+    """Return the JSON schema for either a Pydantic model class or an already-built dict."""
+    if isinstance(schema, dict):
+        return schema
+    return schema.model_json_schema()
+
+
+def list_school_pdfs(pdf_root: str) -> Dict[str, List[str]]:
+    """
+    Walks PDF_ROOT the same way the notebooks do: one folder per school,
+    schools and files both in sorted order, only *.pdf files kept.
+    """
+    schools = {}
+    for school in sorted(os.listdir(pdf_root)):
+        school_dir = os.path.join(pdf_root, school)
+        if not os.path.isdir(school_dir):
+            continue
+        schools[school] = [
+            f for f in sorted(os.listdir(school_dir))
+            if f.lower().endswith(".pdf")
+        ]
+    return schools
+
+
+def discover_jobs(
+    pdf_root: str,
+    schemas: Iterable[str],
+    select_files: Optional[Callable[[str, List[str]], List[str]]] = None,
+    router: Optional[Callable[[str, List[str], str], List[str]]] = None,
+) -> List[ExtractionJob]:
+    """
+    Builds the full (school, pdf, schema) job list for PDF_ROOT.
+
+    `select_files(school, pdf_files)` may narrow the files read for a school
+    (e.g. the balance-sheet notebook only reads files with "financial" in the name).
+    `router(school, pdf_files, schema)` narrows them per schema, e.g.
+    document_classifier.make_router.
+    """
+    schemas = list(schemas)
+    jobs = []
+    for school, pdf_files in list_school_pdfs(pdf_root).items():
+        to_read = select_files(school, pdf_files) if select_files else pdf_files
+        routed = {
+            schema: set(router(school, to_read, schema)) if router else set(to_read)
+            for schema in schemas
+        }
+        for fname in to_read:
+            path = os.path.join(pdf_root, school, fname)
+            for schema in schemas:
+                if fname in routed[schema]:
+                    jobs.append(ExtractionJob(school, fname, schema, path))
+    return jobs
+
+
+def merge_results(results: Iterable[Optional[dict]]) -> Optional[dict]:
+    """
+    Merges the per-PDF results of one school in file order, exactly like the
+    notebook loops: the first successful extraction fixes the key order and
+    later files only overwrite a key with a non-empty value. Failed
+    extractions are passed as None and skipped.
+
+    Returns None when no PDF produced any keys ("No data for <school>").
+    """
+    combined   = {}
+    first_keys = None
+    for data in results:
+        if data is None:
+            continue
+        if first_keys is None:
+            first_keys = list(data.keys())
+            combined  = {k: None for k in first_keys}
+        for k, v in data.items():
+            if v not in EMPTY_VALUES:
+                combined[k] = v
+    return combined if first_keys else None
+
+
+async def extract_with_agent(agent, file_input) -> dict:
+    """Runs one extraction on a LlamaExtract agent (or anything with the same surface)."""
+    if hasattr(agent, "aextract"):
+        run = await agent.aextract(file_input)
+    else:
+        run = await asyncio.to_thread(agent.extract, file_input)
+    return run.data or {}
+
+
+def _file_size(path) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+async def extract_fields(extractor, agent, file_input, known: dict, schema: dict) -> dict:
+    """
+    Extracts only the properties of `schema` (a sub-schema of the agent's)
+    with the stateless extractor and the agent's config, then lays them over
+    the `known` values in the agent schema's field order.
+    """
+    run = await extractor.aextract(schema, agent.config, file_input)
+    fresh = run.data or {}
+    return {
+        name: fresh.get(name) if name in schema["properties"] else known.get(name)
+        for name in json_schema(agent.data_schema).get("properties", {})
+    }
+
+
+class SectionsFailed(Exception):
+    """Sections of a sectioned extraction that still failed; `data` holds what the others returned."""
+
+    def __init__(self, failed: List[str], data: dict, error: BaseException):
+        super().__init__(f"section(s) {', '.join(failed)} failed: {error}")
+        self.failed = failed
+        self.data = data
+
+
+async def extract_sections(
+    extractor,
+    agent,
+    file_input,
+    sections: Dict[str, List[str]],
+    known: Optional[dict] = None,
+    schema: Optional[dict] = None,
+    run: Optional[Callable[[Callable[[], Awaitable[dict]]], Awaitable[dict]]] = None,
+) -> dict:
+    """
+    Extracts the agent's schema as one sub-schema per section ({section:
+    fields}, e.g. from schema_sections), all sections concurrently, with the
+    stateless extractor and the agent's config, and merges them over `known`
+    in the agent schema's field order. With `schema` (a sub-schema) only its
+    fields are extracted; fields no section lists form an "OTHER" section.
+
+    `run(call)` wraps each section's call on its own (e.g.
+    ExtractionLimiter.run), so a failed section is retried without the
+    others. Sections that still fail raise SectionsFailed with the rest.
+    """
+    from extraction_cache import sub_schema
+
+    full = json_schema(agent.data_schema)
+    order = list(full.get("properties", {}))
+    wanted = set(json_schema(schema)["properties"] if schema is not None else order)
+    groups: Dict[str, List[str]] = {}
+    for name, fields in sections.items():
+        group = [f for f in fields if f in wanted]
+        if group:
+            groups[name] = group
+            wanted -= set(group)
+    if wanted:
+        groups.setdefault("OTHER", []).extend(f for f in order if f in wanted)
+
+    async def one(name: str, fields: List[str]) -> dict:
+        section = sub_schema(full, fields)
+
+        async def call() -> dict:
+            result = await extractor.aextract(section, agent.config, file_input)
+            return result.data or {}
+
+        with span("section", section=name, fields=len(fields)):
+            return await (run(call) if run is not None else call())
+
+    done = await asyncio.gather(*(one(n, f) for n, f in groups.items()), return_exceptions=True)
+    data = dict(known or {})
+    failed = []
+    for (name, fields), result in zip(groups.items(), done):
+        if isinstance(result, BaseException):
+            failed.append((name, result))
+            continue
+        data.update({f: result.get(f) for f in fields})
+    data = {name: data[name] for name in order if name in data}
+    if failed:
+        raise SectionsFailed([name for name, _ in failed], data, failed[0][1])
+    return {name: data.get(name) for name in order}
+
+
+def config_with(config, **update):
+    """A copy of an agent's ExtractConfig (a new one when it has none) with `update` applied."""
+    if config is None:
+        try:
+            from llama_cloud import ExtractConfig
+        except ImportError:
+            return update
+        return ExtractConfig(**update)
+    if isinstance(config, dict):
+        return {**config, **update}
+    return type(config)(**{**config.dict(), **update})
+
+
+def config_prompt(config) -> Optional[str]:
+    """The system prompt set on an agent's ExtractConfig (or config dict), if any."""
+    if isinstance(config, dict):
+        return config.get("system_prompt") or None
+    return getattr(config, "system_prompt", None) or None
+
+
+class UploadRegistry:
+    """
+    Uploads each document at most once per run and hands the same file
+    reference to every call that sends it: the sections of a sectioned
+    schema, limiter retries, and the jobs of several schemas reading the same
+    file (untrimmed, or trimmed once for all of them by
+    page_locator.shared_prefilter; prefilter_pdf sends each schema its own copy).
+
+    Agents without an `upload_file` method (e.g. local fakes) get the path back.
+    """
+
+    def __init__(self):
+        self._uploads: Dict[str, asyncio.Task] = {}
+        self.uploaded = 0
+
+    async def _upload(self, path: str, agent):
+        with span("upload", file=os.path.basename(str(path)), file_size=_file_size(path)):
+            file_ref = await agent.upload_file(path)
+        self.uploaded += 1
+        return file_ref
+
+    async def get(self, path: str, agent):
+        if not hasattr(agent, "upload_file"):
+            return path
+        if path not in self._uploads:
+            self._uploads[path] = asyncio.ensure_future(self._upload(path, agent))
+        try:
+            return await asyncio.shield(self._uploads[path])
+        except Exception:
+            # Let the next job for this file retry the upload
+            self._uploads.pop(path, None)
+            raise
+
+
+async def aextract_document(
+    path: str,
+    agents: Dict[str, object],
+    uploads: Optional[UploadRegistry] = None,
+    prefilter: Optional[Callable[[str, str], str]] = None,
+) -> Dict[str, dict]:
+    """
+    Multi-schema extraction of one document: every agent reads it
+    concurrently and calls that send the same document share one upload.
+    With page_locator.shared_prefilter the PDF is trimmed once for all the
+    schemas, so it is uploaded once; a per-schema prefilter such as
+    prefilter_pdf sends each schema its own copy. Returns {schema: data}.
+    """
+    uploads = uploads or UploadRegistry()
+
+    async def one(schema: str, agent) -> dict:
+        sent = await asyncio.to_thread(prefilter, path, schema) if prefilter is not None else path
+        return await extract_with_agent(agent, await uploads.get(sent, agent))
+
+    results = await asyncio.gather(*(one(schema, agent) for schema, agent in agents.items()))
+    return dict(zip(agents.keys(), results))
+
+
+@dataclass
+class EngineOptions:
+    """
+    The optional stages of a run, all off by default; one object shared by
+    arun_jobs, aextract_all, the worker and the backfill.
+
+    `cache` (ExtractionCache): (document, schema) pairs seen before are
+    served locally and only misses are sent for extraction. The cache is
+    keyed on the document actually sent.
+
+    `uploads` (UploadRegistry): calls that send the same document (after
+    prefiltering) share one upload; a run makes its own when not given.
+
+    `prefilter(path, schema)` may swap in a smaller document to send, e.g.
+    page_locator.prefilter_pdf, which keeps only the pages the schema needs,
+    or page_locator.shared_prefilter, which trims once for several schemas so
+    they share the upload.
+
+    `journal` (JobJournal): jobs finished by an earlier (interrupted) run
+    are taken from the journal and every newly finished job is committed to
+    it; rows are keyed on the PDF's and schema's hashes, so they are read on
+    every resume, with or without a manifest.
+
+    `limiter` (rate_limiter.ExtractionLimiter) paces the remote calls (token
+    bucket + AIMD concurrency) and retries throttling/5xx errors with
+    backoff; only permanent failures or exhausted retries mark a document as
+    skipped.
+
+    `poller` (batch_poller.BatchPoller): every job is queued up front and the
+    `concurrency` slots only bound submissions; one poller collects all the
+    results as the server finishes them.
+
+    `manifest` (ExtractionManifest): jobs whose PDF and schema are unchanged
+    since the last run are answered from the manifest and only new or
+    changed ones are extracted; `on_school_done` then only fires for the
+    affected schools. The manifest is saved as each affected school finishes.
+
+    `extractor` (LlamaExtract): with a cache, a document seen before under an
+    older version of the schema only has the fields whose definition changed
+    re-extracted (stateless extractor.aextract on a sub-schema); the other
+    fields come from the cache.
+
+    `sections` ({schema name: {section: fields}}, see schema_sections) splits
+    those schemas into section sub-schemas extracted concurrently through
+    the `extractor` and merged per document (a schema mapped to None is
+    extracted in one call; see section_plan). Every section is billed for
+    the pages sent, so splitting multiplies a document's cost. The limiter
+    retries each section on its own; with a cache, the sections that
+    succeeded are kept when another fails, so the next run only extracts the
+    failed one. Sectioned schemas don't go through the poller.
+    """
+    cache: object = None
+    uploads: Optional[UploadRegistry] = None
+    prefilter: Optional[Callable[[str, str], str]] = None
+    journal: object = None
+    limiter: object = None
+    poller: object = None
+    manifest: object = None
+    extractor: object = None
+    sections: Optional[Dict[str, Optional[Dict[str, List[str]]]]] = None
+
+
+async def arun_jobs(
+    jobs: List[ExtractionJob],
+    agents: Dict[str, object],
+    concurrency: int = 8,
+    options: Optional[EngineOptions] = None,
+    on_school_done: Optional[Callable[[str, str, Optional[dict]], None]] = None,
+) -> Dict[ExtractionJob, Optional[dict]]:
+    """
+    Runs every job through one bounded-concurrency scheduler, with the
+    stages `options` turns on (see EngineOptions).
+
+    At most `concurrency` extractions are in flight at any time, so wall-clock
+    time scales with len(jobs) / concurrency instead of len(jobs). Failures are
+    logged and recorded as None, the same way the notebooks skip a file.
+
+    `on_school_done(schema, school, combined)` is called as soon as the last
+    job of a school finishes, so completed schools can be flushed to disk
+    without waiting for the whole run.
+    """
+    from extraction_cache import file_sha256, schema_hash
+
+    options = options or EngineOptions()
+    cache, prefilter, journal, manifest = options.cache, options.prefilter, options.journal, options.manifest
+    limiter, poller, extractor, sections = options.limiter, options.poller, options.extractor, options.sections
+    if sections and any(sections.values()) and extractor is None:
+        raise ValueError("sections need the stateless `extractor`")
+    semaphore = asyncio.Semaphore(concurrency)
+    uploads = options.uploads or UploadRegistry()
+    results: Dict[ExtractionJob, Optional[dict]] = {}
+
+    school_jobs: Dict[Tuple[str, str], List[ExtractionJob]] = {}
+    for job in jobs:
+        school_jobs.setdefault((job.schema, job.school), []).append(job)
+    remaining = {key: len(group) for key, group in school_jobs.items()}
+
+    touched = set()
+
+    async def fetch(job: ExtractionJob) -> Optional[dict]:
+        agent = agents[job.schema]
+        if manifest is not None:
+            data = await asyncio.to_thread(manifest.lookup, job, agent.data_schema, config_prompt(getattr(agent, "config", None)))
+            if data is not None:
+                return data
+        touched.add((job.schema, job.school))
+        data = await fetch_new(job, agent)
+        if manifest is not None and data is not None:
+            manifest.record(job, agent.data_schema, data, config_prompt(getattr(agent, "config", None)))
+        return data
+
+    async def fetch_new(job: ExtractionJob, agent) -> Optional[dict]:
+        with span("extract", school=job.school, pdf=job.pdf, schema=job.schema,
+                  file_size=_file_size(job.path)) as stage:
+            return await fetch_remote(job, agent, stage)
+
+    async def fetch_remote(job: ExtractionJob, agent, stage) -> Optional[dict]:
+        prompt = config_prompt(getattr(agent, "config", None))
+        path = job.path
+        if prefilter is not None:
+            path = await asyncio.to_thread(prefilter, job.path, job.schema)
+        key = None
+        if journal is not None:
+            # Keyed on the bytes sent and the schema version, so a replaced PDF or
+            # edited schema is never answered from an earlier run's row
+            key = (await asyncio.to_thread(file_sha256, path), schema_hash(agent.data_schema, prompt))
+            data = journal.result(key)
+            if data is not None:
+                stage.set(source="journal")
+                return data
+        if cache is not None:
+            data = await asyncio.to_thread(cache.get, path, agent.data_schema, prompt)
+            if data is not None:
+                stage.set(source="cache")
+                if journal is not None:
+                    journal.record(job, key, data)
+                return data
+
+        known, changed = {}, None
+        if cache is not None:
+            known, changed = await asyncio.to_thread(cache.get_fields, path, agent.data_schema, prompt)
+            if known and changed is None:
+                # Every field is cached under its field hash: a hit, stored under the full key for next time
+                stage.set(source="fields_cache")
+                await asyncio.to_thread(cache.put, path, agent.data_schema, known, prompt)
+                if journal is not None:
+                    journal.record(job, key, known)
+                return known
+            if extractor is None:
+                # Extracting only the changed fields needs the stateless extractor
+                known, changed = {}, None
+        parts = sections.get(job.schema) if sections else None
+
+        def limited(call):
+            # A backoff hands the job's slot back while it sleeps
+            return limiter.run(call, slot=semaphore) if limiter is not None else call()
+
+        async def call():
+            if parts is not None:
+                # The upload and every section go through the limiter on their own; the sections
+                # share the job's slot, so only the upload hands it back during a backoff
+                file_ref = await limited(lambda: uploads.get(path, agent))
+                return await extract_sections(extractor, agent, file_ref, parts, known, changed,
+                                              run=limiter.run if limiter is not None else None)
+            file_ref = await uploads.get(path, agent)
+            if changed is not None:
+                return await extract_fields(extractor, agent, file_ref, known, changed)
+            if poller is not None:
+                return await poller.submit(agent, file_ref)
+            return await extract_with_agent(agent, file_ref)
+
+        try:
+            async with semaphore:
+                if changed is not None:
+                    print(f"Extracting {len(changed['properties'])} changed field(s) from {job.school}/{job.pdf}")
+                elif parts is not None:
+                    print(f"Extracting {len(parts)} section(s) from {job.school}/{job.pdf}")
+                else:
+                    print(f"Extracting data from {job.school}/{job.pdf}")
+                data = await (call() if parts is not None else limited(call))
+            if poller is not None and changed is None and parts is None:
+                # Only the submission holds a slot; the shared poller delivers the result
+                data = await data
+        except Exception as err:
+            print(f"Skipped {job.pdf}: {err}")
+            stage.status, stage.error = "error", str(err)
+            if isinstance(err, SectionsFailed) and cache is not None:
+                cache.put_fields(path, agent.data_schema, err.data, prompt)
+            if journal is not None:
+                journal.record(job, key, None, str(err))
+            return None
+        stage.set(source="fields" if changed is not None else "sections" if parts is not None else "remote",
+                  sent_size=_file_size(path))
+        if cache is not None:
+            cache.put(path, agent.data_schema, data, prompt)
+        if journal is not None:
+            journal.record(job, key, data)
+        return data
+
+    async def run_one(job: ExtractionJob) -> None:
+        results[job] = await fetch(job)
+        key = (job.schema, job.school)
+        remaining[key] -= 1
+        if remaining[key] == 0 and manifest is not None and key in touched:
+            # Saved per school (atomically), so a crash only loses the schools still in flight;
+            # on the event loop thread, so no other job mutates the entries mid-dump
+            manifest.save()
+        if remaining[key] == 0 and on_school_done is not None and (manifest is None or key in touched):
+            with span("merge", school=job.school, schema=job.schema, pdfs=len(school_jobs[key])):
+                combined = merge_results(results[j] for j in school_jobs[key])
+            on_school_done(job.schema, job.school, combined)
+
+    await asyncio.gather(*(run_one(job) for job in jobs))
+    return results
+
+
+def merge_by_school(
+    jobs: List[ExtractionJob],
+    results: Dict[ExtractionJob, Optional[dict]],
+) -> Dict[str, Dict[str, Optional[dict]]]:
+    """Groups job results into {schema: {school: combined}} preserving the sorted job order."""
+    grouped: Dict[str, Dict[str, List[Optional[dict]]]] = {}
+    for job in jobs:
+        grouped.setdefault(job.schema, {}).setdefault(job.school, []).append(results.get(job))
+    with span("merge", jobs=len(jobs)):
+        return {
+            schema: {school: merge_results(per_pdf) for school, per_pdf in schools.items()}
+            for schema, schools in grouped.items()
+        }
+
+
+async def aextract_all(
+    pdf_root: str,
+    agents: Dict[str, object],
+    concurrency: int = 8,
+    options: Optional[EngineOptions] = None,
+    on_school_done: Optional[Callable[[str, str, Optional[dict]], None]] = None,
+    select_files: Optional[Callable[[str, List[str]], List[str]]] = None,
+    router: Optional[Callable[[str, List[str], str], List[str]]] = None,
+) -> Dict[str, Dict[str, Optional[dict]]]:
+    """
+    Extracts every PDF under `pdf_root` with every agent in `agents`
+    ({schema name: agent}) and returns {schema: {school: combined}}.
+
+    Use `await aextract_all(...)` inside a notebook, `extract_all(...)` from a script.
+
+    With a manifest the result still covers every school, and
+    `manifest.changed` lists the schools whose rows need rewriting
+    (see patch_all_schools).
+    """
+    jobs = discover_jobs(pdf_root, agents.keys(), select_files, router)
+    results = await arun_jobs(jobs, agents, concurrency, options, on_school_done)
+    manifest = options.manifest if options is not None else None
+    if manifest is not None:
+        manifest.prune(jobs, agents.keys())
+        manifest.save()
+    return merge_by_school(jobs, results)
+
+
+def extract_all(*args, **kwargs) -> Dict[str, Dict[str, Optional[dict]]]:
+    return asyncio.run(aextract_all(*args, **kwargs))
+
+
+def school_frame(combined: dict, column: str) -> pd.DataFrame:
+    """One school's combined dict as the single-column 'Metric' sheet the notebooks write."""
+    df = pd.DataFrame.from_dict(combined, orient="index", columns=[column])
+    df.index.name = "Metric"
+    return df
+
+
+def write_school_workbook(school: str, combined: Optional[dict], output_root: str, column: str) -> None:
+    """Writes <OUTPUT_ROOT>/<school>.xlsx (atomically, so a crash never leaves half a file)."""
+    if combined is None:
+        print(f"No PDF data found for {school}")
+        return
+    outfile = os.path.join(output_root, f"{school}.xlsx")
+    tmp = os.path.join(output_root, f".{school}.tmp.xlsx")
+    with span("excel_write", school=school, file=outfile, rows=len(combined)):
+        school_frame(combined, column).to_excel(tmp, engine="openpyxl")
+        os.replace(tmp, outfile)
+    print(f"Saved output to {outfile}")
+
+
+def write_school_workbooks(schools: Dict[str, Optional[dict]], output_root: str, column: str) -> None:
+    """Writes <OUTPUT_ROOT>/<school>.xlsx for every school with data."""
+    for school, combined in schools.items():
+        write_school_workbook(school, combined, output_root, column)
+
+
+def write_all_schools(schools: Dict[str, Optional[dict]], output_file: str, column: str) -> None:
+    """
+    Writes all_schools.xlsx with one sheet per school (sheet names limited to
+    31 characters), streamed school by school in constant memory.
+    """
+    with StreamingSchoolsWriter(output_file, column) as writer:
+        for school, combined in schools.items():
+            writer.add(school, combined)
+
+
+def stage_all_schools(output_file: str, column: str) -> Callable[[str, str, Optional[dict]], None]:
+    """
+    An `on_school_done` callback that stages each finished school for
+    all_schools.xlsx (fsynced to <output>.parts.jsonl), so a crash mid-run
+    loses none of them: the next patch_all_schools or write_all_schools on
+    the same file picks them up.
+    """
+    writer = StreamingSchoolsWriter(output_file, column, patch=True)
+
+    def stage(schema: str, school: str, combined: Optional[dict]) -> None:
+        writer.add(school, combined)
+
+    return stage
+
+
+def patch_all_schools(schools: Dict[str, Optional[dict]], output_file: str, column: str) -> None:
+    """
+    Replaces the given schools' sheets of all_schools.xlsx (dropping the sheet
+    of a school mapped to None) and keeps every other sheet, streamed sheet by
+    sheet through StreamingSchoolsWriter instead of loading the workbook.
+    The file is left as is when none of the given schools changed, so callers
+    can pass every school's final row; schools staged by stage_all_schools
+    are written too (the given rows win).
+    """
+    with StreamingSchoolsWriter(output_file, column, patch=True) as writer:
+        for school, combined in schools.items():
+            writer.add(school, combined)
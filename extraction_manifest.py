@@ -0,0 +1,79 @@
+import json
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from extraction_cache import file_sha256, schema_hash
+from extraction_engine import ExtractionJob
+
+DEFAULT_MANIFEST = "extraction_manifest.json"
+
+
+class ExtractionManifest:
+    """
+    Record of every (school, pdf, schema) processed so far: the file's size,
+    mtime and content hash, the schema version (hash of the JSON schema) it
+    was extracted with (hash of the JSON schema and the agent's system
+    prompt), and the result.
+
+    A job is current when its PDF and schema are unchanged since it was
+    recorded; only stale jobs are extracted again on the next run. Size and
+    mtime are compared first so unchanged files are never re-hashed, and a file
+    that was only touched (same hash) stays current.
+
+    `changed` collects {schema: {school}} for the schools whose merged row
+    must be recomputed (a PDF added, changed or removed) since the last save.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST):
+        self.path = path
+        self.entries: Dict[str, Dict[str, dict]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self.changed: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _key(job: ExtractionJob) -> str:
+        return f"{job.school}/{job.pdf}"
+
+    def lookup(self, job: ExtractionJob, data_schema, system_prompt: Optional[str] = None) -> Optional[dict]:
+        """The recorded result when the job is current (same PDF, schema and system prompt), otherwise None."""
+        entry = self.entries.get(job.schema, {}).get(self._key(job))
+        if entry is None or entry["schema_version"] != schema_hash(data_schema, system_prompt):
+            return None
+        stat = os.stat(job.path)
+        if (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            if entry["sha256"] != file_sha256(job.path):
+                return None
+            entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        return entry["data"]
+
+    def record(self, job: ExtractionJob, data_schema, data: dict, system_prompt: Optional[str] = None) -> None:
+        stat = os.stat(job.path)
+        self.entries.setdefault(job.schema, {})[self._key(job)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_sha256(job.path),
+            "schema_version": schema_hash(data_schema, system_prompt),
+            "data": data,
+        }
+        self.changed.setdefault(job.schema, set()).add(job.school)
+
+    def prune(self, jobs: Iterable[ExtractionJob], schemas: Iterable[str]) -> None:
+        """Drops `schemas` entries whose PDF is no longer part of the run and marks their schools changed."""
+        live = {(job.schema, self._key(job)) for job in jobs}
+        for schema in schemas:
+            files = self.entries.get(schema, {})
+            for key in [k for k in files if (schema, k) not in live]:
+                del files[key]
+                self.changed.setdefault(schema, set()).add(key.split("/", 1)[0])
+
+    def save(self) -> None:
+        """Writes the manifest atomically: a crash leaves either the old file or the new one, never half of it."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,215 @@
+"""
+Headless extraction worker draining a shared work_queue.WorkQueue.
+
+    python extraction_worker.py enqueue --queue q.db --pdf-root private_universities/university_pdfs --schema cash_flow --route
+    python extraction_worker.py work    --queue q.db --agent cash_flow=<AGENT_ID>      # start as many as you like
+    python extraction_worker.py collect --queue q.db --schema cash_flow --output-root output_cash_flow --column 2023-24 --year 2024
+
+`collect` adds the derived fields and writes the same panel partition, per-school
+workbooks and all_schools.xlsx as the notebooks.
+"""
+import argparse
+import asyncio
+import os
+from dataclasses import replace
+from typing import Dict, Optional, Tuple
+
+from extraction_engine import (
+    EngineOptions,
+    UploadRegistry,
+    arun_jobs,
+    discover_jobs,
+    merge_by_school,
+    patch_all_schools,
+    write_school_workbooks,
+)
+from schema_sections import schema_sections, section_plan
+from work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE, QueueJournal, WorkQueue, default_worker_id
+
+
+async def run_worker(
+    queue: WorkQueue,
+    agents: Dict[str, object],
+    worker_id: Optional[str] = None,
+    concurrency: int = 8,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    heartbeat_every: float = 60.0,
+    idle_poll: float = 5.0,
+    options: Optional[EngineOptions] = None,
+) -> int:
+    """
+    Leases tasks as slots free up, keeps at most `concurrency` in flight and
+    reports each result back to the queue. Exits once nothing is pending or
+    leased for the schemas in `agents`. A task that raises is failed back to
+    the queue rather than left leased. `options` (cache, prefilter, limiter, poller, extractor,
+    sections) go to arun_jobs. Returns the number of tasks processed.
+    """
+    worker_id = worker_id or default_worker_id()
+    options = replace(options or EngineOptions(), journal=QueueJournal(queue), uploads=UploadRegistry())
+    inflight = {}
+    schemas = list(agents)
+    processed = 0
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(heartbeat_every)
+            await asyncio.to_thread(queue.heartbeat, worker_id, lease_seconds)
+
+    beat = asyncio.ensure_future(heartbeat())
+    try:
+        while True:
+            free = concurrency - len(inflight)
+            leased = await asyncio.to_thread(queue.lease, worker_id, free, lease_seconds, schemas) if free else []
+            for job in leased:
+                inflight[asyncio.ensure_future(arun_jobs([job], agents, 1, options))] = job
+            if not inflight:
+                if await asyncio.to_thread(queue.outstanding, schemas) == 0:
+                    break
+                # Other workers hold the remaining leases; pick them up if they expire
+                await asyncio.sleep(idle_poll)
+                continue
+            done, _ = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                job = inflight.pop(future)
+                if future.exception() is not None:
+                    await asyncio.to_thread(queue.fail, job, repr(future.exception()))
+            processed += len(done)
+    finally:
+        beat.cancel()
+    return processed
+
+
+def collect(queue: WorkQueue, schema: str, output_root: str, column: str, year: int = 2024) -> Dict[str, Optional[dict]]:
+    """
+    Merges the finished tasks per school and finishes them the way the
+    notebooks do: derived fields (derived_fields.DERIVED) are added, the
+    table is upserted into the panel's `year` partition, and the per-school
+    workbooks and all_schools.xlsx are written from it.
+    """
+    from derived_fields import apply_derived
+    from panel_store import frame_schools, schools_frame, write_panel
+
+    jobs = queue.jobs(schema)
+    merged = merge_by_school(jobs, queue.results()).get(schema, {})
+    table = apply_derived(schools_frame(merged, _data_schema(schema, year)), schema)
+    write_panel(table, schema, year)
+    schools = frame_schools(table, merged)
+    os.makedirs(output_root, exist_ok=True)
+    write_school_workbooks(schools, output_root, column)
+    patch_all_schools(schools, os.path.join(output_root, "all_schools.xlsx"), column)
+    return schools
+
+
+def _schema_sources() -> Dict[str, Tuple[str, object]]:
+    """{queue schema: (agent name, model class or year -> model factory)}, as the notebooks build them."""
+    from BS_Schema import make_StatementOfFinancialPosition_model
+    from financial_schemas_endowment_final import generate_endowment_schema
+    from financial_schemas_incomestatement_final import generate_income_statement_schema
+    from schemas import Enrollment2024_25, StatementOfCashFlows2024
+
+    return {
+        "cash_flow": ("statement_of_cash_flows", StatementOfCashFlows2024),
+        "enrollment": ("enrollment-parser", Enrollment2024_25),
+        "endowment": ("endowment-parser", generate_endowment_schema),
+        "income_statement": ("income-statement-parser", generate_income_statement_schema),
+        "balance_sheet": ("balance-sheet-parser", make_StatementOfFinancialPosition_model),
+    }
+
+
+def _data_schema(schema: str, year: int) -> Optional[dict]:
+    """The compiled JSON schema the agents of `schema` use, for the table's column order (None if unknown)."""
+    from schema_compiler import compile_schema
+
+    if schema not in _schema_sources():
+        return None
+    _, source = _schema_sources()[schema]
+    return compile_schema(source if isinstance(source, type) else source(year), schema).json_schema
+
+
+def build_agents(specs, extractor, year: int, sectioned: bool = False):
+    """
+    The agent of every SCHEMA[=AGENT_ID] spec, found or created through the
+    AgentRegistry with the schema compiled to a system prompt (see
+    schema_compiler), plus the section plan of each schema when `sectioned`.
+    Returns (agents, sections) for arun_jobs.
+    """
+    from agent_registry import AgentRegistry
+    from schema_compiler import compile_schema
+
+    registry = AgentRegistry(extractor)
+    sources = _schema_sources()
+    agents, sections = {}, {}
+    for spec in specs:
+        schema, _, agent_id = spec.partition("=")
+        if schema not in sources:
+            raise ValueError(f"No schema for {schema!r}; known: {', '.join(sources)}")
+        name, source = sources[schema]
+        args = () if isinstance(source, type) else (year,)
+        compiled = compile_schema(source(*args) if args else source, schema)
+        agents[schema] = registry.get(name, compiled.json_schema, agent_id=agent_id or None, system_prompt=compiled.system_prompt)
+        if sectioned:
+            sections[schema] = section_plan(schema_sections(source, *args))
+    return agents, sections
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = sub.add_parser("enqueue", help="queue every (school, pdf, schema) task under a PDF root")
+    enqueue.add_argument("--queue", default=DEFAULT_QUEUE)
+    enqueue.add_argument("--pdf-root", required=True)
+    enqueue.add_argument("--schema", action="append", required=True)
+    enqueue.add_argument("--route", action="store_true", help="send each schema only the PDFs the classifier picks")
+
+    work = sub.add_parser("work", help="drain the queue")
+    work.add_argument("--queue", default=DEFAULT_QUEUE)
+    work.add_argument("--agent", action="append", required=True, metavar="SCHEMA[=AGENT_ID]",
+                      help="without an id the agent is looked up (or created) by schema hash in agent_registry.json")
+    work.add_argument("--project-id")
+    work.add_argument("--year", type=int, default=2024, help="fiscal year of the year-dependent schemas")
+    work.add_argument("--sections", action="store_true", help="extract large schemas section by section (see schema_sections.section_plan)")
+    work.add_argument("--concurrency", type=int, default=8)
+    work.add_argument("--rate", type=float, default=5.0, help="request starts per second for this worker")
+    work.add_argument("--no-cache", action="store_true")
+
+    gather = sub.add_parser("collect", help="write the merged workbooks")
+    gather.add_argument("--queue", default=DEFAULT_QUEUE)
+    gather.add_argument("--schema", required=True)
+    gather.add_argument("--output-root", required=True)
+    gather.add_argument("--column", required=True)
+    gather.add_argument("--year", type=int, default=2024, help="fiscal year of the panel partition and the year-dependent schemas")
+
+    args = parser.parse_args(argv)
+    queue = WorkQueue(args.queue)
+
+    if args.command == "enqueue":
+        router = None
+        if args.route:
+            from document_classifier import make_router
+            router = make_router(args.pdf_root)
+        added = queue.enqueue(discover_jobs(args.pdf_root, args.schema, router=router))
+        print(f"Queued {added} new or changed task(s): {queue.summary()}")
+    elif args.command == "work":
+        from llama_cloud_services import LlamaExtract
+        from extraction_cache import ExtractionCache
+        from page_locator import prefilter_pdf, shared_prefilter
+        from rate_limiter import ExtractionLimiter
+
+        extractor = LlamaExtract(project_id=args.project_id) if args.project_id else LlamaExtract()
+        agents, sections = build_agents(args.agent, extractor, args.year, args.sections)
+        # Several schemas: trim each PDF once for all of them so they share its upload
+        prefilter = shared_prefilter(agents) if len(agents) > 1 else prefilter_pdf
+        processed = asyncio.run(run_worker(
+            queue, agents, concurrency=args.concurrency, options=EngineOptions(
+                cache=None if args.no_cache else ExtractionCache(), prefilter=prefilter,
+                limiter=ExtractionLimiter(rate=args.rate, concurrency=args.concurrency), extractor=extractor, sections=sections,
+            ),
+        ))
+        print(f"Worker done after {processed} task(s): {queue.summary()}")
+    else:
+        collect(queue, args.schema, args.output_root, args.column, args.year)
+
+
+if __name__ == "__main__":
+    main()
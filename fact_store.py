@@ -0,0 +1,219 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from comparative import PRIOR_SUFFIX
+from derived_fields import DERIVED
+from document_classifier import DISCLOSURE_LIST, slugify
+from extraction_engine import EMPTY_VALUES
+from extraction_manifest import ExtractionManifest
+
+DEFAULT_FACTS = "facts.db"
+
+
+def load_identities(csv_path: str = DISCLOSURE_LIST) -> Dict[str, Tuple[str, str]]:
+    """{school folder: (CREDIT, CUSIP)} from the scraper's disclosure list (first CUSIP per credit)."""
+    try:
+        df = pd.read_csv(csv_path).dropna(subset=["CREDIT", "CUSIP"])
+    except FileNotFoundError:
+        return {}
+    first = df.groupby("CREDIT")["CUSIP"].first()
+    return {slugify(credit): (credit, cusip) for credit, cusip in first.items()}
+
+
+def merge_with_sources(per_pdf: Iterable[Tuple[str, str, Optional[dict]]]) -> Dict[str, Tuple[object, Optional[str], Optional[str]]]:
+    """
+    Same rule as merge_results over (pdf, sha256, data) in file order, but
+    keeps for every metric the PDF its value came from:
+    {metric: (value, pdf, sha256)}. Metrics nobody filled have no source.
+    """
+    merged: Dict[str, Tuple[object, Optional[str], Optional[str]]] = {}
+    for pdf, sha256, data in per_pdf:
+        if data is None:
+            continue
+        if not merged:
+            merged = {k: (None, None, None) for k in data}
+        for k, v in data.items():
+            if v not in EMPTY_VALUES:
+                merged[k] = (v, pdf, sha256)
+    return merged
+
+
+def _same_value(extracted, value) -> bool:
+    # The table holds numbers as floats and lists as their text
+    return extracted == value or (extracted is not None and str(extracted) == str(value))
+
+
+def _sql_value(value):
+    # Numbers and text are stored as is; lists/objects (e.g. multi-valued answers) as JSON
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value)
+
+
+class FactStore:
+    """
+    Every extracted value as one row of a long-format SQLite table:
+    school, CREDIT, CUSIP, statement, metric, fiscal_year, value, the PDF (and
+    its content hash) the value came from, and the extraction run that wrote it.
+    `comparative` marks values taken from a report's prior-year column; those
+    never replace a value extracted as some report's current year.
+
+    Indexed on (school, metric, fiscal_year) and (metric, fiscal_year), so
+    "net_tuition_revenue for all schools in 2024" or "which file did Cornell's
+    investment_level_3 come from" are index lookups.
+    """
+
+    def __init__(self, path: str = DEFAULT_FACTS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS facts (
+                school      TEXT NOT NULL,
+                credit      TEXT,
+                cusip       TEXT,
+                statement   TEXT NOT NULL,
+                metric      TEXT NOT NULL,
+                fiscal_year INTEGER NOT NULL,
+                value,
+                source_pdf  TEXT,
+                source_sha256 TEXT,
+                run_id      TEXT NOT NULL,
+                updated_at  REAL NOT NULL,
+                comparative INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (school, statement, metric, fiscal_year)
+            );
+            CREATE INDEX IF NOT EXISTS facts_school_metric_year ON facts (school, metric, fiscal_year);
+            CREATE INDEX IF NOT EXISTS facts_metric_year ON facts (metric, fiscal_year);
+            """
+        )
+        self._conn.commit()
+
+    def write_school(
+        self,
+        school: str,
+        statement: str,
+        fiscal_year: int,
+        merged: Dict[str, Tuple[object, Optional[str], Optional[str]]],
+        run_id: str,
+        identity: Tuple[Optional[str], Optional[str]] = (None, None),
+        comparative: bool = False,
+    ) -> int:
+        """
+        Replaces the school's rows for (statement, fiscal_year) with `merged`
+        from merge_with_sources. Comparative (prior-year column) rows are only
+        upserted over other comparative rows.
+        """
+        credit, cusip = identity
+        now = time.time()
+        rows = [
+            (school, credit, cusip, statement, metric, fiscal_year, _sql_value(value), pdf, sha256, run_id, now, int(comparative))
+            for metric, (value, pdf, sha256) in merged.items()
+            if not comparative or value is not None
+        ]
+        insert = "INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        with self._lock, self._conn:
+            if comparative:
+                self._conn.executemany(
+                    insert + " ON CONFLICT (school, statement, metric, fiscal_year) DO UPDATE SET "
+                    "value = excluded.value, source_pdf = excluded.source_pdf, source_sha256 = excluded.source_sha256, "
+                    "run_id = excluded.run_id, updated_at = excluded.updated_at WHERE facts.comparative = 1",
+                    rows,
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM facts WHERE school = ? AND statement = ? AND fiscal_year = ?",
+                    (school, statement, fiscal_year),
+                )
+                self._conn.executemany(insert, rows)
+        return len(rows)
+
+    def load_table(
+        self,
+        table: pd.DataFrame,
+        statement: str,
+        fiscal_year: int,
+        manifest: Optional[ExtractionManifest] = None,
+        schools: Optional[Iterable[str]] = None,
+        run_id: Optional[str] = None,
+        identities: Optional[Dict[str, Tuple[str, str]]] = None,
+    ) -> int:
+        """
+        Rebuilds the facts of `schools` (default: every school in the table
+        and, with a manifest, every school it recorded for `statement`) from
+        `table`, the same schools_frame / apply_derived rows the panel and
+        the Excel files get, so retried and derived values are facts too.
+        Schools without a row lose theirs.
+
+        With the manifest each value keeps the PDF it came from (when the
+        merged per-PDF results hold that value); values a derived rule
+        filled are sourced as "derived". Prior-year fields of a comparative
+        schema (see comparative.py) go to `fiscal_year - 1`.
+        """
+        run_id = run_id or uuid.uuid4().hex[:16]
+        identities = load_identities() if identities is None else identities
+        per_school: Dict[str, List[Tuple[str, str, Optional[dict]]]] = {}
+        if manifest is not None:
+            for key in sorted(manifest.entries.get(statement, {})):
+                school, pdf = key.split("/", 1)
+                entry = manifest.entries[statement][key]
+                per_school.setdefault(school, []).append((pdf, entry["sha256"], entry["data"]))
+        derived = {rule.target for rule in DERIVED.get(statement, [])}
+        rows = table.astype(object).where(table.notna(), None)
+        if schools is None:
+            schools = sorted(set(rows.index) | set(per_school))
+        written = 0
+        for school in schools:
+            sources = merge_with_sources(per_school.get(school, []))
+            identity = identities.get(school, (None, None))
+            current, prior = {}, {}
+            if school in rows.index:
+                for metric, value in rows.loc[school].items():
+                    extracted, pdf, sha256 = sources.get(metric, (None, None, None))
+                    if value is None or not _same_value(extracted, value):
+                        pdf, sha256 = ("derived", None) if value is not None and metric in derived else (None, None)
+                    if metric.endswith(PRIOR_SUFFIX):
+                        prior[metric[:-len(PRIOR_SUFFIX)]] = (value, pdf, sha256)
+                    else:
+                        current[metric] = (value, pdf, sha256)
+            written += self.write_school(school, statement, fiscal_year, current, run_id, identity)
+            if not prior:
+                # write_comparative already split the prior-year column off the table
+                prior = {k[:-len(PRIOR_SUFFIX)]: v for k, v in sources.items() if k.endswith(PRIOR_SUFFIX)}
+            if prior:
+                written += self.write_school(school, statement, fiscal_year - 1, prior, run_id, identity, comparative=True)
+        return written
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def metric(self, metric: str, fiscal_year: int, statement: Optional[str] = None) -> pd.DataFrame:
+        """One metric for all schools in a year, e.g. metric("net_tuition_revenue", 2024)."""
+        sql = "SELECT school, credit, cusip, statement, value FROM facts WHERE metric = ? AND fiscal_year = ?"
+        params: tuple = (metric, fiscal_year)
+        if statement is not None:
+            sql += " AND statement = ?"
+            params += (statement,)
+        return self.query(sql + " ORDER BY school", params)
+
+    def provenance(self, school: str, metric: str, fiscal_year: Optional[int] = None) -> pd.DataFrame:
+        """Which file (and run) a school's value came from, e.g. provenance("CORNELL_UNIVERSITY", "investment_level_3")."""
+        sql = ("SELECT fiscal_year, statement, value, source_pdf, source_sha256, run_id, updated_at "
+               "FROM facts WHERE school = ? AND metric = ?")
+        params: tuple = (school, metric)
+        if fiscal_year is not None:
+            sql += " AND fiscal_year = ?"
+            params += (fiscal_year,)
+        return self.query(sql + " ORDER BY fiscal_year", params)
+
+    def close(self) -> None:
+        self._conn.close()
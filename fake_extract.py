@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from extraction_engine import json_schema
+
+
+class FakeRun:
+    """Stand-in for llama_cloud's ExtractRun: only `.data` is used by the pipeline."""
+
+    def __init__(self, data: Optional[dict]):
+        self.data = data
+
+
+def fake_value(path: str, field: str) -> Optional[int]:
+    """Deterministic per-(file, field) value; roughly a third of the fields come back empty."""
+    digest = hashlib.sha256(f"{os.path.basename(path)}|{field}".encode()).digest()
+    if digest[0] % 3 == 0:
+        return None
+    return int.from_bytes(digest[1:5], "big") % 1_000_000
+
+
+class FakeApiError(Exception):
+    """Stand-in for llama_cloud's ApiError (the limiter only looks at `status_code`)."""
+
+    def __init__(self, status_code: int, body: str = ""):
+        super().__init__(f"status_code: {status_code}, body: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class FakeJob:
+    """Stand-in for llama_cloud's ExtractJob."""
+
+    def __init__(self, job_id: str, status: str = "PENDING", error: Optional[str] = None):
+        self.id = job_id
+        self.status = status
+        self.error = error
+
+
+class FakeFile:
+    """Stand-in for an uploaded llama_cloud File."""
+
+    def __init__(self, name: str):
+        self.id = hashlib.sha256(name.encode()).hexdigest()[:16]
+        self.name = name
+
+
+class FakeAgent:
+    """
+    Local extraction agent with the same extract/aextract surface as
+    LlamaExtract's ExtractionAgent (including queue_extraction and the job
+    polling calls), so the engine can be exercised offline.
+
+    Every call sleeps `latency` seconds (plus up to `jitter`) to mimic the
+    remote job, then returns one value per property in `data_schema`.
+
+    To behave like a service under load it can also inject failures: calls
+    beyond `max_inflight` concurrent ones get a 429, and `error_rate` of the
+    remaining calls get a 503.
+    """
+
+    def __init__(
+        self,
+        data_schema,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        value_fn: Callable[[str, str], object] = fake_value,
+        max_inflight: Optional[int] = None,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.data_schema = json_schema(data_schema)
+        self.config = None
+        self.latency = latency
+        self.jitter = jitter
+        self.value_fn = value_fn
+        self.max_inflight = max_inflight
+        self.error_rate = error_rate
+        self.calls = 0
+        self.uploads = 0
+        self.rejected = 0
+        self.inflight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Tuple[object, float]] = {}
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.max_inflight is not None and self.inflight >= self.max_inflight:
+                self.rejected += 1
+                raise FakeApiError(429, "Too Many Requests")
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.rejected += 1
+                raise FakeApiError(503, "Service Unavailable")
+            self.inflight += 1
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def _delay(self, file_input) -> float:
+        spread = hashlib.sha256(str(file_input).encode()).digest()[0] / 255
+        return self.latency + self.jitter * spread
+
+    def _run(self, file_input) -> FakeRun:
+        self.calls += 1
+        path = str(getattr(file_input, "name", file_input))
+        fields = self.data_schema.get("properties", {})
+        return FakeRun({field: self.value_fn(path, field) for field in fields})
+
+    async def upload_file(self, file_input) -> FakeFile:
+        self.uploads += 1
+        return FakeFile(str(file_input))
+
+    async def aextract(self, file_input) -> FakeRun:
+        self._admit()
+        try:
+            await asyncio.sleep(self._delay(file_input))
+        finally:
+            self._leave()
+        return self._run(file_input)
+
+    def extract(self, file_input) -> FakeRun:
+        self._admit()
+        try:
+            time.sleep(self._delay(file_input))
+        finally:
+            self._leave()
+        return self._run(file_input)
+
+    async def queue_extraction(self, file_input) -> FakeJob:
+        self._admit()
+        self._leave()
+        job_id = f"job-{len(self._jobs)}"
+        self._jobs[job_id] = (file_input, time.monotonic() + self._delay(file_input))
+        return FakeJob(job_id)
+
+    def get_extraction_job(self, job_id: str) -> FakeJob:
+        _, ready_at = self._jobs[job_id]
+        return FakeJob(job_id, "SUCCESS" if time.monotonic() >= ready_at else "PENDING")
+
+    def get_extraction_run_for_job(self, job_id: str) -> FakeRun:
+        file_input, _ = self._jobs[job_id]
+        return self._run(file_input)
+
+
+class FakeExtractor:
+    """
+    Stand-in for LlamaExtract's stateless `aextract(data_schema, config, files)`,
+    answering with the same per-(file, field) values as FakeAgent.
+    """
+
+    def __init__(self, latency: float = 0.0, value_fn: Callable[[str, str], object] = fake_value):
+        self.latency = latency
+        self.value_fn = value_fn
+        self.calls = 0
+        self.fields_extracted = 0
+
+    async def aextract(self, data_schema, config, files) -> FakeRun:
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        fields = json_schema(data_schema).get("properties", {})
+        self.fields_extracted += len(fields)
+        path = str(getattr(files, "name", files))
+        return FakeRun({field: self.value_fn(path, field) for field in fields})
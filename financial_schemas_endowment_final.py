@@ -1,6 +1,8 @@
+from functools import lru_cache
 from typing import Optional
 from pydantic import BaseModel, Field
 
+@lru_cache(maxsize=None)
 def generate_endowment_schema(fiscal_year: int):
     fy_label = str(fiscal_year)
     fy_label_short = f"FY{fy_label}"
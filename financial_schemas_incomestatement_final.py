@@ -1,6 +1,8 @@
+from functools import lru_cache
 from typing import Optional
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field
 
+@lru_cache(maxsize=None)
 def generate_income_statement_schema(fiscal_year: int):
     fy_label = str(fiscal_year)
 
@@ -237,55 +239,8 @@ def generate_income_statement_schema(fiscal_year: int):
                         "Only extract if explicitly stated. Do not derive."
         )
 
-        #---Deterministic fields that are computed after all other fields are set
-        @model_validator(mode="after")
-        def compute_other_fields(self):
-            def compute_other(total_field, *component_fields):
-                total = getattr(self, total_field)
-                comps = [getattr(self, f) for f in component_fields if getattr(self, f) is not None]
-                return total - sum(comps) if total is not None and comps else None
-
-            self.other_investment_income = compute_other(
-                "investment_income_total", "investment_income_operations"
-            )
-
-            self.other_operating_revenue = compute_other(
-                "total_operating_revenue",
-                "gross_tuition_revenue", "net_tuition_revenue", "federal_grants_contracts",
-                "state_local_grants_contracts", "government_grants_contracts_total",
-                "state_appropriations", "private_gifts_grants_contracts",
-                "total_gifts_contracts_other_support", "private_gifts_with_donor_restrictions",
-                "investment_income_total", "auxiliary_enterprise_revenue",
-                "healthcare_clinical_revenue", "net_assets_released_from_restrictions"
-            )
-
-            self.other_operating_expense = compute_other(
-                "total_operating_expense",
-                "instructional_expense", "research_expense", "instructional_research_expense",
-                "auxiliary_enterprise_expense", "healthcare_clinical_expense", "academic_support",
-                "student_services", "institutional_support", "public_service_expense",
-                "student_aid_expense"
-            )
-
-            self.other_non_op_revenue = compute_other(
-                "non_operating_revenue", "non_op_realized_gains"
-            )
-
-            self.other_non_op_expense = compute_other(
-                "non_operating_expense", "non_op_realized_losses"
-            )
-
-            self.other_adj_net_assets_without_restrictions = compute_other(
-                "change_net_assets_without_donor_restrictions", "net_assets_released_for_capital"
-            )
-
-            self.other_adj_to_net_assets = compute_other(
-                "total_change_in_net_assets",
-                "change_net_assets_without_donor_restrictions", "change_net_assets_with_donor_restrictions",
-                "change_temp_restricted_net_assets", "change_perm_restricted_net_assets"
-            )
-
-            return self
+        # "other_*" residuals (total minus the extracted line items) are derived
+        # after extraction from derived_fields.DERIVED["income_statement"]
 
         
     return IncomeStatement
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from extraction_engine import ExtractionJob
+
+DEFAULT_JOURNAL = "extraction_journal.db"
+
+DONE = "done"
+FAILED = "failed"
+
+
+# (sha256 of the PDF sent, schema_hash including the system prompt)
+JournalKey = Tuple[str, str]
+
+
+class JobJournal:
+    """
+    Durable record of every extraction in SQLite, keyed on the content sent:
+    (sha256 of the PDF, hash of the schema and system prompt).
+
+    Each finished job is committed with its status and result as soon as it
+    completes, so a restarted run skips everything already done and only
+    re-sends failed or never-started jobs. A PDF replaced under the same name
+    or an edited schema has a different key, so its stale row is never
+    served; the school, pdf and schema names are kept for reporting.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if columns and "pdf_sha256" not in columns:
+            # Rows from before content keys can't tell a changed PDF from an unchanged one
+            self._conn.execute("DROP TABLE jobs")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                pdf_sha256  TEXT NOT NULL,
+                schema_hash TEXT NOT NULL,
+                school      TEXT NOT NULL,
+                pdf         TEXT NOT NULL,
+                schema      TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                result      TEXT,
+                error       TEXT,
+                updated_at  REAL NOT NULL,
+                PRIMARY KEY (pdf_sha256, schema_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def record(self, job: ExtractionJob, key: JournalKey, data: Optional[dict], error: Optional[str] = None) -> None:
+        """Commits one finished job; `data` None means the extraction failed."""
+        status = DONE if data is not None else FAILED
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, job.school, job.pdf, job.schema, status,
+                 json.dumps(data) if data is not None else None, error, time.time()),
+            )
+            self._conn.commit()
+
+    def completed(self) -> Dict[JournalKey, dict]:
+        """{(pdf_sha256, schema_hash): result} for every successfully finished job."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pdf_sha256, schema_hash, result FROM jobs WHERE status = ?", (DONE,)
+            ).fetchall()
+        return {(pdf, schema): json.loads(result) for pdf, schema, result in rows}
+
+    def result(self, key: JournalKey) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE pdf_sha256 = ? AND schema_hash = ? AND status = ?",
+                (*key, DONE),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from extraction_cache import file_sha256
+from tracing import span
+
+TRIMMED_DIR = ".trimmed_pdfs"
+
+# Text that marks the pages each schema actually reads, taken from the schema descriptions
+PAGE_KEYWORDS: Dict[str, List[str]] = {
+    "balance_sheet": [
+        "statement of financial position",
+        "statements of financial position",
+        "statement of net position",
+        "statements of net position",
+        "balance sheet",
+    ],
+    "cash_flow": [
+        "statement of cash flows",
+        "statements of cash flows",
+        "cash flows from operating activities",
+        "cash flows from financing activities",
+        "net change in cash",
+    ],
+    "income_statement": [
+        "statement of activities",
+        "statements of activities",
+        "statement of revenues, expenses",
+        "statements of revenues, expenses",
+        "statement of operations",
+        "total operating revenue",
+        "total operating expenses",
+    ],
+    "endowment": [
+        "changes in endowment net assets",
+        "endowment net assets",
+        "endowment net asset composition",
+        "composition of endowment",
+        "fair value hierarchy",
+        "measured at net asset value",
+    ],
+    "enrollment": [
+        "fall enrollment",
+        "total enrollment",
+        "student enrollment",
+        "enrollment summary",
+        "headcount",
+        "full-time equivalent",
+        "applications received",
+        "freshman applications",
+        "acceptance rate",
+        "matriculants",
+        "retention rate",
+        "room and board",
+    ],
+}
+
+# Primary statements start with their title, so a heading match is the strong signal there
+HEADING_SCHEMAS = {"balance_sheet", "cash_flow", "income_statement"}
+HEADING_CHARS = 400
+
+# Prefilters run on worker threads; jobs of several schemas can ask for the same trimmed copy at once
+_TRIM_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def _page_texts(path: str, mtime_ns: int) -> Tuple[str, ...]:
+    reader = PdfReader(path)
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append((page.extract_text() or "").lower())
+        except Exception:
+            texts.append("")
+    return tuple(texts)
+
+
+def page_texts(path: str) -> Tuple[str, ...]:
+    """Lower-cased text layer of every page (memoized, all schemas scan the same document)."""
+    return _page_texts(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def locate_pages(
+    path: str,
+    keywords: List[str],
+    context: int = 1,
+    heading_chars: int = 0,
+) -> List[int]:
+    """
+    Returns the 0-based pages whose text contains one of the keywords, plus
+    `context` following pages so statements that run over a page break stay
+    whole. Empty when nothing matches or there is no text layer.
+
+    With `heading_chars`, pages whose first `heading_chars` characters (the
+    statement title) match are preferred over pages that only mention the
+    keyword in passing, e.g. notes referring back to the statement.
+    """
+    texts = page_texts(path)
+    hits = []
+    if heading_chars:
+        hits = [i for i, text in enumerate(texts) if any(k in text[:heading_chars] for k in keywords)]
+    if not hits:
+        hits = [i for i, text in enumerate(texts) if any(k in text for k in keywords)]
+    pages = set()
+    for i in hits:
+        pages.update(range(i, min(i + context + 1, len(texts))))
+    return sorted(pages)
+
+
+def trim_pdf(path: str, pages: List[int], out_path: str) -> str:
+    """Writes a new PDF containing only `pages` of `path`."""
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def _trim_once(path: str, pages: List[int], out_path: str) -> str:
+    with _TRIM_LOCK:
+        if not os.path.exists(out_path):
+            trim_pdf(path, pages, out_path)
+    return out_path
+
+
+def schema_pages(path: str, schema: str) -> List[int]:
+    """The pages prefilter_pdf looks for `schema` on (empty when none match)."""
+    heading_chars = HEADING_CHARS if schema in HEADING_SCHEMAS else 0
+    return locate_pages(path, PAGE_KEYWORDS[schema], heading_chars=heading_chars)
+
+
+def keywords_digest(schema: str) -> str:
+    """Short hash of what picks the schema's pages, so trimmed copies go stale when the keywords change."""
+    rule = {"keywords": PAGE_KEYWORDS.get(schema, []), "heading_chars": HEADING_CHARS if schema in HEADING_SCHEMAS else 0}
+    return hashlib.sha256(json.dumps(rule, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+
+def prefilter_pdf(path: str, schema: str, out_dir: str = TRIMMED_DIR) -> str:
+    """
+    Path of the document to send for `schema`: a trimmed PDF with only the
+    candidate pages, or the original file when nothing was found, when the
+    schema has no keywords, or when the text layer can't be read.
+    """
+    if not PAGE_KEYWORDS.get(schema):
+        return path
+    with span("prefilter", pdf=os.path.basename(path), schema=schema) as stage:
+        try:
+            pages = schema_pages(path, schema)
+            total = len(page_texts(path))
+        except Exception as err:
+            print(f"Page scan failed for {path}, sending full document: {err}")
+            stage.status, stage.error = "error", str(err)
+            return path
+        stage.set(pages=len(pages), total_pages=total)
+        if not pages or len(pages) == total:
+            return path
+
+        out_path = _trim_once(path, pages, os.path.join(out_dir, f"{file_sha256(path)[:16]}-{schema}-{keywords_digest(schema)}.pdf"))
+    print(f"Trimmed {os.path.basename(path)} to {len(pages)} of {total} pages for {schema}")
+    return out_path
+
+
+def shared_prefilter(schemas: Iterable[str], out_dir: str = TRIMMED_DIR) -> Callable[[str, str], str]:
+    """
+    A prefilter for runs that send every PDF to several `schemas`: each PDF
+    is trimmed once, to the union of the pages all of them read, so every
+    schema sends the same document and the run uploads it once. The full
+    PDF is sent when one of the schemas has no keywords or no matching page
+    (it needs the whole document anyway). Schemas outside `schemas` fall back
+    to prefilter_pdf.
+    """
+    schemas = tuple(sorted(set(schemas)))
+    digest = hashlib.sha256("".join(keywords_digest(s) for s in schemas).encode("utf-8")).hexdigest()[:8]
+
+    @lru_cache(maxsize=None)
+    def union_path(path: str, mtime_ns: int) -> str:
+        if not all(PAGE_KEYWORDS.get(s) for s in schemas):
+            return path
+        with span("prefilter", pdf=os.path.basename(path), schema="+".join(schemas)) as stage:
+            try:
+                found = [schema_pages(path, s) for s in schemas]
+                total = len(page_texts(path))
+            except Exception as err:
+                print(f"Page scan failed for {path}, sending full document: {err}")
+                stage.status, stage.error = "error", str(err)
+                return path
+            pages = sorted(set().union(*found))
+            stage.set(pages=len(pages), total_pages=total)
+            if not all(found) or len(pages) == total:
+                return path
+            out_path = _trim_once(path, pages, os.path.join(out_dir, f"{file_sha256(path)[:16]}-{'+'.join(schemas)}-{digest}.pdf"))
+        print(f"Trimmed {os.path.basename(path)} to {len(pages)} of {total} pages for {', '.join(schemas)}")
+        return out_path
+
+    def prefilter(path: str, schema: str) -> str:
+        if schema not in schemas:
+            return prefilter_pdf(path, schema, out_dir)
+        return union_path(path, os.stat(path).st_mtime_ns)
+
+    return prefilter
@@ -0,0 +1,142 @@
+import glob
+import os
+from numbers import Number
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from extraction_engine import json_schema
+from tracing import span
+
+DEFAULT_PANEL_ROOT = "panel"
+PARTITION_FILE = "part-0.parquet"
+
+
+def partition_dir(root: str, statement: str, fiscal_year: int) -> str:
+    """Hive-style partition: <root>/statement=<statement>/fiscal_year=<year>."""
+    return os.path.join(root, f"statement={statement}", f"fiscal_year={fiscal_year}")
+
+
+def _coerce(column: pd.Series) -> pd.Series:
+    """Numbers become float64, anything else (text answers, lists) string, so Parquet gets one type per column."""
+    values = column.dropna()
+    if values.map(lambda v: isinstance(v, Number) and not isinstance(v, bool)).all():
+        return column.astype("float64")
+    return column.map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v)).astype("string")
+
+
+def schools_frame(schools: Dict[str, Optional[dict]], data_schema=None) -> pd.DataFrame:
+    """
+    {school: combined} as one typed row per school (schools without data are
+    left out). With the agent's data_schema the metric columns follow the
+    schema's property order, so every run and every output has the same
+    layout; keys the schema doesn't list go after it.
+    """
+    rows = {school: combined for school, combined in schools.items() if combined is not None}
+    df = pd.DataFrame.from_dict(rows, orient="index")
+    if data_schema is not None:
+        fields = list(json_schema(data_schema).get("properties", {}))
+        df = df.reindex(columns=fields + [c for c in df.columns if c not in fields])
+    df.index.name = "school"
+    return df.apply(_coerce)
+
+
+def frame_schools(table: pd.DataFrame, schools: Iterable[str] = ()) -> Dict[str, Optional[dict]]:
+    """
+    The inverse of schools_frame: each row as {metric: value} (missing values
+    as None), in the table's column order, so derived and retried values
+    reach the per-school outputs too. Schools in `schools` without a row map
+    to None.
+    """
+    rows: Dict[str, Optional[dict]] = {school: None for school in schools}
+    for school, row in table.astype(object).where(table.notna(), None).iterrows():
+        rows[school] = row.to_dict()
+    return rows
+
+
+def write_panel(
+    table: pd.DataFrame,
+    statement: str,
+    fiscal_year: int,
+    root: str = DEFAULT_PANEL_ROOT,
+) -> str:
+    """
+    Upserts the schools_frame `table` into the (statement, fiscal_year)
+    partition: rows of other schools already stored there are kept, the
+    table's schools are replaced. One wide row per school, one column per metric.
+    """
+    out_dir = partition_dir(root, statement, fiscal_year)
+    path = os.path.join(out_dir, PARTITION_FILE)
+    if os.path.exists(path):
+        old = pd.read_parquet(path)
+        # The new table's column order wins; metrics only the stored rows have go last
+        columns = list(table.columns) + [c for c in old.columns if c not in table.columns]
+        table = pd.concat([old.drop(index=old.index.intersection(table.index)), table]).reindex(columns=columns)
+    table = table.sort_index().apply(_coerce)
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    table.to_parquet(tmp, engine="pyarrow")
+    os.replace(tmp, path)
+    return path
+
+
+def panel_years(statement: str, root: str = DEFAULT_PANEL_ROOT) -> List[int]:
+    pattern = os.path.join(partition_dir(root, statement, "*"), PARTITION_FILE)
+    return sorted(int(os.path.basename(os.path.dirname(p)).split("=", 1)[1]) for p in glob.glob(pattern))
+
+
+def load_panel(
+    statement: str,
+    years: Optional[Iterable[int]] = None,
+    schools: Optional[Iterable[str]] = None,
+    metrics: Optional[Iterable[str]] = None,
+    root: str = DEFAULT_PANEL_ROOT,
+) -> pd.DataFrame:
+    """
+    Cross-school panel for one statement, indexed by (school, fiscal_year).
+
+    Only the requested years' partition files are opened, only the requested
+    metric columns are read, and the school filter is pushed down to the
+    Parquet reader.
+    """
+    years = panel_years(statement, root) if years is None else list(years)
+    columns = None if metrics is None else list(metrics)
+    filters = None if schools is None else [("school", "in", list(schools))]
+    frames = []
+    for year in years:
+        path = os.path.join(partition_dir(root, statement, year), PARTITION_FILE)
+        if not os.path.exists(path):
+            continue
+        df = pd.read_parquet(path, columns=columns, filters=filters)
+        df["fiscal_year"] = year
+        frames.append(df.set_index("fiscal_year", append=True))
+    if not frames:
+        return pd.DataFrame(columns=columns or [], index=pd.MultiIndex.from_arrays([[], []], names=["school", "fiscal_year"]))
+    return pd.concat(frames)
+
+
+def write_combined(table: pd.DataFrame, output_file: str, year_label: str) -> pd.DataFrame:
+    """
+    Excel export in the all_schools_combined.xlsx layout: one row per school,
+    a leading "Year" column, then the metrics in the table's column order.
+    """
+    df = table.copy()
+    df.index.name = "School"
+    df.insert(0, "Year", year_label)
+    with span("excel_write", file=output_file, rows=len(df)), \
+            pd.ExcelWriter(output_file, engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name="Combined")
+    print("Saved:", output_file)
+    return df
+
+
+def export_combined(
+    statement: str,
+    fiscal_year: int,
+    output_file: str,
+    year_label: str,
+    root: str = DEFAULT_PANEL_ROOT,
+) -> pd.DataFrame:
+    """write_combined for a year already in the panel, e.g. to re-export without re-running extraction."""
+    table = load_panel(statement, years=[fiscal_year], root=root).reset_index(level="fiscal_year", drop=True)
+    return write_combined(table, output_file, year_label)
@@ -0,0 +1,193 @@
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from pypdf import PdfReader
+
+from derived_fields import CHECKS
+from extraction_cache import file_sha256, schema_hash
+from extraction_engine import ExtractionJob, config_prompt, discover_jobs
+from page_locator import PAGE_KEYWORDS, schema_pages
+
+# Rough remote cost model; calibrate from a trace.jsonl of a real run
+SECONDS_PER_JOB = 15.0
+SECONDS_PER_PAGE = 1.0
+# Extraction credits per page sent; depends on the extraction mode of the agent's config
+CREDITS_PER_PAGE = 1.0
+# aretry_failures re-sends documents whose values fail a check at validation.HIGH_EFFORT (PREMIUM mode with
+# reasoning): the share of extracted documents expected to need it, and its credits per page
+RETRY_RATE = 0.1
+RETRY_CREDITS_PER_PAGE = 4.0
+# Documents above this size are listed as outliers in the report
+LARGE_DOCUMENT_BYTES = 2 * 1024 * 1024
+
+
+class BudgetExceeded(Exception):
+    """Raised by check_budget before a run that would go over one of its limits."""
+
+
+def page_count(path: str) -> Optional[int]:
+    try:
+        return len(PdfReader(path).pages)
+    except Exception:
+        return None
+
+
+def pages_sent(path: str, schema: str, total: Optional[int], prefilter: bool) -> Optional[int]:
+    """Pages that would actually be sent, applying the same rules as prefilter_pdf."""
+    if not prefilter or not PAGE_KEYWORDS.get(schema) or total is None:
+        return total
+    try:
+        pages = schema_pages(path, schema)
+    except Exception:
+        return total
+    return len(pages) if pages else total
+
+
+def answered_locally(job: ExtractionJob, sent: str, agent, cache=None, manifest=None, journal=None) -> Optional[str]:
+    """Where the engine would answer `job` without a remote call ("manifest", "journal" or "cache"), else None."""
+    prompt = config_prompt(getattr(agent, "config", None))
+    if manifest is not None and manifest.lookup(job, agent.data_schema, prompt) is not None:
+        return "manifest"
+    if journal is not None and journal.result((file_sha256(sent), schema_hash(agent.data_schema, prompt))) is not None:
+        return "journal"
+    if cache is not None and os.path.exists(cache.key_path(sent, agent.data_schema, prompt)):
+        return "cache"
+    return None
+
+
+def estimate_run(
+    pdf_root: str,
+    schemas: Iterable[str],
+    router: Optional[Callable[[str, List[str], str], List[str]]] = None,
+    select_files: Optional[Callable[[str, List[str]], List[str]]] = None,
+    prefilter: Union[bool, Callable[[str, str], str]] = True,
+    seconds_per_job: float = SECONDS_PER_JOB,
+    seconds_per_page: float = SECONDS_PER_PAGE,
+    credits_per_page: float = CREDITS_PER_PAGE,
+    sections: Optional[Dict[str, Optional[Dict[str, List[str]]]]] = None,
+    agents: Optional[Dict[str, object]] = None,
+    cache=None,
+    manifest=None,
+    journal=None,
+    retry_rate: float = RETRY_RATE,
+    retry_credits_per_page: float = RETRY_CREDITS_PER_PAGE,
+) -> pd.DataFrame:
+    """
+    Dry run: builds the same job list aextract_all would (routing included),
+    scans every PDF locally and returns one row per job with its bytes, page
+    count, pages sent after page prefiltering, remote calls, estimated
+    seconds and credits. Nothing is uploaded.
+
+    Pass the run's own settings to estimate what it will actually submit:
+    `prefilter` as the engine gets it (e.g. prefilter_pdf, which trims the
+    documents locally, the same copies the run then sends), the `agents`
+    with the run's `cache`, `manifest` and `journal` (jobs they answer cost
+    nothing; `source` says which one), and `sections`: a sectioned schema
+    makes one call per section, each billed for every page sent. Documents
+    sent for a schema with accounting checks also carry `retry_rate` of a
+    high-effort retry (est_retry_credits, included in est_credits).
+    """
+    rows = []
+    totals = {}
+    for job in discover_jobs(pdf_root, schemas, select_files, router):
+        sent_path = prefilter(job.path, job.schema) if callable(prefilter) else job.path
+        if sent_path not in totals:
+            totals[sent_path] = page_count(sent_path)
+        if job.path not in totals:
+            totals[job.path] = page_count(job.path)
+        total = totals[job.path]
+        sent = totals[sent_path] if callable(prefilter) else pages_sent(job.path, job.schema, total, prefilter)
+        agent = (agents or {}).get(job.schema)
+        source = answered_locally(job, sent_path, agent, cache, manifest, journal) if agent is not None else None
+        if source is not None:
+            sent, calls = 0, 0
+        else:
+            calls = len((sections or {}).get(job.schema) or {}) or 1
+        retry_credits = retry_rate * retry_credits_per_page * (sent or 0) if CHECKS.get(job.schema) else 0.0
+        rows.append({
+            "school": job.school,
+            "pdf": job.pdf,
+            "schema": job.schema,
+            "bytes": os.path.getsize(job.path),
+            "pages": total,
+            "source": source or "remote",
+            "pages_sent": sent,
+            "calls": calls,
+            "est_seconds": calls * (seconds_per_job + seconds_per_page * (sent or 0)),
+            "est_credits": calls * credits_per_page * (sent or 0) + retry_credits,
+            "est_retry_credits": retry_credits,
+        })
+    return pd.DataFrame(rows, columns=[
+        "school", "pdf", "schema", "bytes", "pages", "source", "pages_sent", "calls",
+        "est_seconds", "est_credits", "est_retry_credits",
+    ])
+
+
+def summarize(estimate: pd.DataFrame, concurrency: int = 8, rate: Optional[float] = None) -> pd.DataFrame:
+    """
+    Per-schema jobs, documents, bytes, pages, remote calls and credits (the
+    expected retries included, and also shown on their own), plus
+    the expected wall time with `concurrency` calls in flight (and at most
+    `rate` call starts per second, when the run uses an ExtractionLimiter).
+    """
+    def wall(group: pd.DataFrame) -> float:
+        seconds = group["est_seconds"]
+        bound = max(seconds.sum() / concurrency, seconds.max())
+        if rate:
+            bound = max(bound, group["calls"].sum() / rate)
+        return bound
+
+    summary = estimate.groupby("schema").agg(
+        jobs=("pdf", "size"),
+        documents=("pdf", "nunique"),
+        mb=("bytes", lambda b: round(b.sum() / 1e6, 1)),
+        pages=("pages", "sum"),
+        pages_sent=("pages_sent", "sum"),
+        calls=("calls", "sum"),
+        credits=("est_credits", "sum"),
+        retry_credits=("est_retry_credits", "sum"),
+    )
+    summary["est_wall_min"] = [round(wall(group) / 60, 1) for _, group in estimate.groupby("schema")]
+    if len(estimate):
+        total = summary.sum(numeric_only=True)
+        total["documents"] = len(estimate.drop_duplicates(["school", "pdf"]))
+        # The schemas share the same slots, so the run's wall time is for all jobs together
+        total["est_wall_min"] = round(wall(estimate) / 60, 1)
+        summary.loc["TOTAL"] = total
+    return summary.astype({"jobs": int, "documents": int, "pages": int, "pages_sent": int, "calls": int})
+
+
+def large_documents(estimate: pd.DataFrame, min_bytes: int = LARGE_DOCUMENT_BYTES) -> pd.DataFrame:
+    """Documents worth a second look before sending (e.g. multi-MB compliance certificates)."""
+    big = estimate[estimate["bytes"] >= min_bytes]
+    return big.drop_duplicates(["school", "pdf"])[["school", "pdf", "bytes", "pages"]]
+
+
+def check_budget(
+    estimate: pd.DataFrame,
+    concurrency: int = 8,
+    max_jobs: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    max_credits: Optional[float] = None,
+    max_minutes: Optional[float] = None,
+    rate: Optional[float] = None,
+) -> pd.DataFrame:
+    """Prints the summary and raises BudgetExceeded when any configured limit would be crossed."""
+    summary = summarize(estimate, concurrency, rate)
+    print(summary.to_string())
+    total = summary.loc["TOTAL"] if len(summary) else pd.Series(dtype=float)
+    limits = {
+        "jobs": max_jobs,
+        "pages_sent": max_pages,
+        "credits": max_credits,
+        "est_wall_min": max_minutes,
+    }
+    over = [
+        f"{name} {total.get(name, 0):g} > {limit:g}"
+        for name, limit in limits.items()
+        if limit is not None and total.get(name, 0) > limit
+    ]
+    if over:
+        raise BudgetExceeded("Run would exceed its budget: " + ", ".join(over))
+    return summary
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# Status codes that mean "slow down / try again", everything else is treated as permanent
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Responses that mean the server is overloaded: the concurrency limit backs off on these
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def error_status(err: BaseException) -> Optional[int]:
+    """HTTP status carried by an ApiError / httpx error (or a stand-in with `status_code`)."""
+    status = getattr(err, "status_code", None)
+    if status is None and isinstance(err, httpx.HTTPStatusError):
+        status = err.response.status_code
+    return status
+
+
+def is_retryable(err: BaseException) -> bool:
+    """Transient failures (throttling, 5xx, timeouts, dropped connections) worth retrying."""
+    status = error_status(err)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(err, (httpx.TransportError, TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Caps the request start rate at `rate` per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Each success grows the limit by about one slot per round trip; a 429/5xx
+    response, or a latency above `latency_factor` x the recent typical
+    latency, cuts it by `decrease`. The limit stays within [min_limit, max_limit].
+
+    The typical latency is an exponentially weighted moving average
+    (weight `smoothing` per call), so it follows the server as it gets
+    slower or faster instead of staying pinned to the fastest call ever seen.
+    """
+
+    def __init__(
+        self,
+        initial: float = 8,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        decrease: float = 0.5,
+        latency_factor: float = 3.0,
+        smoothing: float = 0.1,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.inflight = 0
+        self.typical_latency: Optional[float] = None
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    async def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        async with self._cond:
+            self.inflight -= 1
+            if throttled:
+                self._backoff()
+            elif latency is not None:
+                if self.typical_latency is not None and latency > self.latency_factor * self.typical_latency:
+                    self._backoff()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                if self.typical_latency is None:
+                    self.typical_latency = latency
+                else:
+                    self.typical_latency += self.smoothing * (latency - self.typical_latency)
+            self._cond.notify_all()
+
+    async def throttle(self) -> None:
+        """Backs off for a throttled call made outside acquire/release (e.g. a status poll)."""
+        async with self._cond:
+            self._backoff()
+
+    def _backoff(self) -> None:
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ExtractionLimiter:
+    """
+    Client-side limiter wrapped around every remote extraction call: a token
+    bucket for the start rate, AIMD for concurrency (starting at
+    `concurrency`, the engine's slot count), and jittered exponential
+    backoff for retryable errors. Permanent errors are raised immediately so
+    the engine records the document as failed instead of retrying it.
+
+    A call made while holding one of the caller's concurrency slots passes
+    it as `slot` (an asyncio.Semaphore): the slot is handed back for the
+    backoff sleep, so other documents use it instead of waiting on a retry.
+
+    With a batch_poller.BatchPoller the engine only wraps the submission in
+    run(), so the latency AIMD sees is the queueing call, not the job; pass
+    the limiter to the poller as well to pace its status calls through the
+    same bucket and back off on throttled polls.
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        aimd: Optional[AIMDLimiter] = None,
+        max_attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        concurrency: int = 8,
+    ):
+        self.bucket = TokenBucket(rate)
+        self.aimd = aimd or AIMDLimiter(initial=concurrency)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled = 0
+
+    async def run(self, call: Callable[[], Awaitable[T]], slot: Optional[asyncio.Semaphore] = None) -> T:
+        for attempt in range(self.max_attempts):
+            await self.bucket.acquire()
+            await self.aimd.acquire()
+            start = time.monotonic()
+            try:
+                result = await call()
+            except Exception as err:
+                throttled = error_status(err) in THROTTLE_STATUS
+                await self.aimd.release(throttled=throttled)
+                self.throttled += throttled
+                if not is_retryable(err) or attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                await self._sleep(backoff_delay(attempt, self.base_delay, self.max_delay), slot)
+                continue
+            await self.aimd.release(latency=time.monotonic() - start)
+            return result
+
+    @staticmethod
+    async def _sleep(delay: float, slot: Optional[asyncio.Semaphore]) -> None:
+        if slot is None:
+            await asyncio.sleep(delay)
+            return
+        slot.release()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # The caller's `async with slot` releases it again on the way out
+            await slot.acquire()
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.aimd.limit, 2),
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
@@ -0,0 +1,326 @@
+"""
+Record/replay stand-in for LlamaExtract. In process, ReplayExtract(ReplayStore(path))
+replaces LlamaExtract; across processes or machines, serve a store over HTTP
+
+    python replay_extract.py --store replay_store.json --port 8765 --latency 2
+
+and point ReplayExtract(RemoteStore("http://host:8765")) at it.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+from extraction_cache import file_sha256, schema_hash
+from extraction_engine import config_prompt, json_schema
+from fake_extract import FakeAgent, FakeRun, fake_value
+
+DEFAULT_STORE = "replay_store.json"
+
+
+class ReplayStore:
+    """
+    Recorded extraction results keyed on (PDF content hash, schema hash with
+    the agent's system prompt), plus the schema each agent id had, in one JSON file that can be shared or
+    checked in next to a test corpus.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE):
+        self.path = path
+        self.results: Dict[str, dict] = {}
+        self.agents: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            self.results = stored.get("results", {})
+            self.agents = stored.get("agents", {})
+
+    @staticmethod
+    def key(pdf_hash: str, data_schema, system_prompt: Optional[str] = None) -> str:
+        # A compiled schema moves its instructions into the prompt, so the prompt is part of the key
+        return f"{pdf_hash}:{schema_hash(data_schema, system_prompt)[:16]}"
+
+    def get(self, pdf_hash: str, data_schema, system_prompt: Optional[str] = None) -> Optional[dict]:
+        return self.results.get(self.key(pdf_hash, data_schema, system_prompt))
+
+    def record(self, pdf_hash: str, data_schema, data: Optional[dict], system_prompt: Optional[str] = None) -> None:
+        with self._lock:
+            self.results[self.key(pdf_hash, data_schema, system_prompt)] = data or {}
+            self._save()
+
+    def record_agent(self, agent_id: str, data_schema) -> None:
+        with self._lock:
+            self.agents[agent_id] = json_schema(data_schema)
+            self._save()
+
+    def _save(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"agents": self.agents, "results": self.results}, f)
+        os.replace(tmp, self.path)
+
+
+def _local_path(file_input) -> Optional[str]:
+    if isinstance(file_input, (str, Path)):
+        return str(file_input)
+    name = getattr(file_input, "name", None)
+    return name if isinstance(name, str) and os.path.exists(name) else None
+
+
+class RecordingAgent:
+    """
+    Wraps a live ExtractionAgent and stores every (PDF hash, schema, system
+    prompt) -> result it produces, through extract, aextract or the queue/poll calls. Anything
+    else (data_schema, config, save, ...) is passed straight through.
+    """
+
+    def __init__(self, agent, store: ReplayStore):
+        self._agent = agent
+        self._store = store
+        self._uploads: Dict[str, str] = {}  # file id -> pdf hash
+        self._jobs: Dict[str, str] = {}     # job id -> pdf hash
+
+    def __getattr__(self, name):
+        return getattr(self._agent, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._agent, name, value)
+
+    def _pdf_hash(self, file_input) -> Optional[str]:
+        path = _local_path(file_input)
+        if path is not None:
+            return file_sha256(path)
+        return self._uploads.get(getattr(file_input, "id", None))
+
+    def _record(self, file_input, run):
+        pdf_hash = self._pdf_hash(file_input)
+        if pdf_hash is not None:
+            self._store.record(pdf_hash, self._agent.data_schema, run.data, self._prompt())
+        return run
+
+    def _prompt(self) -> Optional[str]:
+        return config_prompt(getattr(self._agent, "config", None))
+
+    async def upload_file(self, file_input):
+        file = await self._agent.upload_file(file_input)
+        path = _local_path(file_input)
+        if path is not None:
+            self._uploads[file.id] = file_sha256(path)
+        return file
+
+    async def aextract(self, file_input):
+        return self._record(file_input, await self._agent.aextract(file_input))
+
+    def extract(self, file_input):
+        return self._record(file_input, self._agent.extract(file_input))
+
+    async def queue_extraction(self, file_input):
+        job = await self._agent.queue_extraction(file_input)
+        pdf_hash = self._pdf_hash(file_input)
+        if pdf_hash is not None:
+            self._jobs[job.id] = pdf_hash
+        return job
+
+    def get_extraction_run_for_job(self, job_id: str):
+        run = self._agent.get_extraction_run_for_job(job_id)
+        if job_id in self._jobs:
+            self._store.record(self._jobs[job_id], self._agent.data_schema, run.data, self._prompt())
+        return run
+
+
+class RecordingExtract:
+    """Wraps a live LlamaExtract so every agent it hands out records into `store`."""
+
+    def __init__(self, extractor, store: ReplayStore):
+        self.extractor = extractor
+        self.store = store
+
+    def get_agent(self, name: Optional[str] = None, id: Optional[str] = None) -> RecordingAgent:
+        agent = self.extractor.get_agent(name=name, id=id)
+        self.store.record_agent(id or name, agent.data_schema)
+        return RecordingAgent(agent, self.store)
+
+    def create_agent(self, name: str, data_schema, config=None) -> RecordingAgent:
+        agent = self.extractor.create_agent(name=name, data_schema=data_schema, config=config)
+        self.store.record_agent(name, agent.data_schema)
+        return RecordingAgent(agent, self.store)
+
+    async def aextract(self, data_schema, config, files):
+        run = await self.extractor.aextract(data_schema, config, files)
+        path = _local_path(files)
+        if path is not None:
+            self.store.record(file_sha256(path), data_schema, run.data, config_prompt(config))
+        return run
+
+
+class ReplayAgent(FakeAgent):
+    """
+    Serves recorded results through the ExtractionAgent surface (extract,
+    aextract, upload_file, queue_extraction and the job polling calls) with
+    FakeAgent's configurable latency, jitter and throttling.
+
+    A (PDF, schema) pair that was never recorded gets deterministic fake values
+    (`on_missing="fake"`) or raises KeyError (`on_missing="error"`).
+    """
+
+    def __init__(self, data_schema, store: ReplayStore, on_missing: str = "fake", **fake_kwargs):
+        self.store = store
+        self.on_missing = on_missing
+        self.replayed = 0
+        self.missing = 0
+        super().__init__(data_schema, **fake_kwargs)
+
+    @property
+    def data_schema(self) -> dict:
+        return self._data_schema
+
+    @data_schema.setter
+    def data_schema(self, schema) -> None:
+        # Mirrors `agent.data_schema = Model` in the notebooks
+        self._data_schema = json_schema(schema)
+
+    def save(self) -> None:
+        pass
+
+    def _run(self, file_input) -> FakeRun:
+        self.calls += 1
+        path = str(getattr(file_input, "name", file_input))
+        data = self.store.get(file_sha256(path), self.data_schema, config_prompt(self.config))
+        if data is not None:
+            self.replayed += 1
+            return FakeRun(dict(data))
+        self.missing += 1
+        if self.on_missing == "error":
+            raise KeyError(f"No recording for {os.path.basename(path)} under this schema and prompt")
+        fields = self.data_schema.get("properties", {})
+        return FakeRun({field: fake_value(path, field) for field in fields})
+
+
+class ReplayExtract:
+    """
+    Local stand-in for LlamaExtract: `get_agent(id=...)` returns a ReplayAgent
+    holding the schema recorded for that id (the notebooks then set their own
+    `agent.data_schema` anyway), and `aextract(data_schema, config, files)`
+    replays stateless extractions.
+    """
+
+    def __init__(self, store: ReplayStore, on_missing: str = "fake", **fake_kwargs):
+        self.store = store
+        self.on_missing = on_missing
+        self.fake_kwargs = fake_kwargs
+
+    def _agent(self, data_schema, config=None) -> ReplayAgent:
+        agent = ReplayAgent(data_schema, self.store, self.on_missing, **self.fake_kwargs)
+        agent.config = config
+        return agent
+
+    def get_agent(self, name: Optional[str] = None, id: Optional[str] = None) -> ReplayAgent:
+        return self._agent(self.store.agents.get(id or name, {"properties": {}}))
+
+    def create_agent(self, name: str, data_schema, config=None) -> ReplayAgent:
+        return self._agent(data_schema, config)
+
+    async def aextract(self, data_schema, config, files) -> FakeRun:
+        agent = self._agent(data_schema, config)
+        return await agent.aextract(files)
+
+
+class RemoteStore:
+    """
+    Client side of `serve`: the read half of a ReplayStore (agents, get)
+    answered by a replay server, so ReplayExtract(RemoteStore(url)) behaves
+    like ReplayExtract over the server's store.
+    """
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.agents: Dict[str, dict] = self._request("/agents")
+
+    def _request(self, route: str, payload: Optional[dict] = None):
+        body = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.url + route, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def get(self, pdf_hash: str, data_schema, system_prompt: Optional[str] = None) -> Optional[dict]:
+        payload = {"pdf_sha256": pdf_hash, "data_schema": json_schema(data_schema), "system_prompt": system_prompt}
+        try:
+            return self._request("/results", payload)
+        except urllib.error.HTTPError as err:
+            if err.code == 404:
+                return None
+            raise
+
+
+def serve(store: ReplayStore, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0) -> ThreadingHTTPServer:
+    """
+    An HTTP server answering RemoteStore from `store`: GET /agents and
+    POST /results ({"pdf_sha256", "data_schema", "system_prompt"} -> the recorded result, 404
+    if none). Every result waits `latency` seconds first, like a live call;
+    requests are served on their own threads. Call serve_forever() on it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/agents":
+                self._send(200, store.agents)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/results":
+                self._send(404, {"error": "not found"})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            time.sleep(latency)
+            data = store.get(request["pdf_sha256"], request["data_schema"], request.get("system_prompt"))
+            if data is None:
+                self._send(404, {"error": "no recording"})
+            else:
+                self._send(200, data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per served result")
+    args = parser.parse_args(argv)
+
+    server = serve(ReplayStore(args.store), args.host, args.port, args.latency)
+    print(f"Replaying {args.store} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Schema prompt compiler: moves instruction boilerplate repeated across field
+descriptions into one system prompt and reports the token counts.
+
+    python schema_compiler.py                      # token counts for every pipeline
+    python schema_compiler.py --pipeline cash_flow --show
+    python schema_compiler.py --golden golden.json --store replay_store.json --pdf-root university_pdfs_test
+
+The golden check extracts the golden PDFs with the original schema and with
+the compiled one (schema + system prompt) and compares both to the expected
+values, so a compiled schema is only adopted when accuracy doesn't drop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from extraction_engine import config_with, json_schema
+
+# A sentence shared by at least this many fields, and this share of them, is hoisted
+MIN_FIELDS = 3
+MIN_SHARE = 0.5
+
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_ABBREVIATIONS = ("e.g.", "i.e.", "etc.", "vs.", "approx.", "incl.")
+
+# Per-pipeline boilerplate the automatic pass can't see because the wording
+# differs per field: `drop` patterns are removed from every description and
+# `preamble` says it once instead
+PROMPT_RULES: Dict[str, dict] = {
+    "cash_flow": {
+        "drop": (
+            r" (?:in|for) the \d{4} fiscal year, in US dollars",
+            r"\s*(?:Only|Extract|Ignore|Use)\b[^.]*\bperiod(?:s|'s)?\b[^.]*\.",
+        ),
+        "preamble": "Every field is a figure in US dollars for the fiscal year named above; "
+                    "only take the value for that period, never one from another period.",
+    },
+    "enrollment": {
+        "drop": (
+            r"\s*Only extract data for the \d{4}-\d{4} (?:academic )?year or terms labeled Fall \d{4}, etc\.; "
+            r"ignore any data (?:from other years or terms \(e\.g\. [^)]*\)|outside this period)\.",
+            r"\s*Ignore other years/terms\.",
+            r"\s*ignore any data from other years or terms \(e\.g\. [^)]*\)\.",
+        ),
+        "preamble": "Only extract data for the 2024-2025 academic year (terms labeled Fall 2024, or the 2024-2025 "
+                    "admissions cycle); ignore any data from other years or terms (e.g. 2023, 2023–2024, Fall 2023, "
+                    "Fall 2022, 2022).",
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or its vocabulary can't be downloaded here
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """cl100k tokens when tiktoken is available, otherwise the usual ~4 characters per token."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def schema_tokens(schema) -> int:
+    return count_tokens(json.dumps(json_schema(schema), ensure_ascii=False))
+
+
+def sentences(text: str) -> List[str]:
+    """Splits a description into sentences, not after "e.g." and the like."""
+    parts, start = [], 0
+    for match in _BOUNDARY.finditer(text):
+        if text[start:match.start()].lower().endswith(_ABBREVIATIONS):
+            continue
+        parts.append(text[start:match.start()])
+        start = match.end()
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    """A schema with its shared instructions moved to `system_prompt` (set it on the agent's config)."""
+    json_schema: dict
+    system_prompt: str
+    hoisted: Tuple[str, ...]
+    tokens_before: int
+    tokens_after: int
+
+    def report(self) -> str:
+        saved = self.tokens_before - self.tokens_after
+        share = saved / self.tokens_before if self.tokens_before else 0.0
+        return (f"{self.json_schema.get('title', 'schema')}: {self.tokens_before} -> {self.tokens_after} tokens "
+                f"({saved} saved, {share:.0%}); {len(self.hoisted)} instruction(s) moved to the system prompt")
+
+    def config(self, config=None):
+        """`config` (e.g. the agent's) with this schema's system prompt."""
+        return config_with(config, system_prompt=self.system_prompt)
+
+
+def compile_schema(
+    schema,
+    pipeline: Optional[str] = None,
+    drop: Iterable[str] = (),
+    preamble: Optional[str] = None,
+    min_fields: int = MIN_FIELDS,
+    min_share: float = MIN_SHARE,
+) -> CompiledSchema:
+    """
+    Hoists every sentence that at least `min_fields` (and `min_share`) of the
+    field descriptions repeat verbatim into one system prompt, and removes
+    the `drop` patterns (plus the pipeline's PROMPT_RULES) from every field,
+    saying `preamble` once instead. Fields keep their names, types and order,
+    so results, caches of derived values and outputs are unaffected.
+    """
+    rules = PROMPT_RULES.get(pipeline, {})
+    drop = [re.compile(p) for p in (*rules.get("drop", ()), *drop)]
+    preamble = preamble if preamble is not None else rules.get("preamble")
+
+    original = json_schema(schema)
+    properties = original.get("properties", {})
+    split = {name: sentences(prop.get("description", "")) for name, prop in properties.items()}
+    counts: Dict[str, int] = {}
+    for parts in split.values():
+        for sentence in dict.fromkeys(parts):
+            counts[sentence] = counts.get(sentence, 0) + 1
+    threshold = max(min_fields, min_share * len(properties))
+    hoisted = tuple(s for s, n in counts.items() if n >= threshold)
+
+    compiled_properties = {}
+    for name, prop in properties.items():
+        prop = dict(prop)
+        if "description" in prop:
+            text = " ".join(s for s in split[name] if s not in hoisted)
+            for pattern in drop:
+                text = pattern.sub("", text)
+            prop["description"] = text.strip()
+        compiled_properties[name] = prop
+    compiled = {**original, "properties": compiled_properties}
+
+    lines = [preamble] if preamble else []
+    if hoisted:
+        lines.append("These instructions apply to every field:")
+        lines.extend(f"- {s}" for s in hoisted)
+    system_prompt = "\n".join(lines)
+    tokens_after = schema_tokens(compiled) + (count_tokens(system_prompt) if system_prompt else 0)
+    return CompiledSchema(compiled, system_prompt, hoisted, schema_tokens(original), tokens_after)
+
+
+def _places(value: float) -> int:
+    exponent = Decimal(repr(value)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+def _matches(expected, got) -> bool:
+    # A number matches up to rounding in the last digit the golden value is written
+    # with: 1234567 takes 1234567.4 (whole dollars) and 0.92 takes 0.9204, but 0.92
+    # doesn't take 0.91 and 1234567 doesn't take 1234568
+    numbers = (int, float)
+    if isinstance(expected, numbers) and isinstance(got, numbers) and not isinstance(expected, bool):
+        return abs(expected - got) <= 0.5 * 10 ** -_places(expected) + 1e-9
+    return expected == got
+
+
+async def agolden_accuracy(extractor, pipeline: str, schema, golden: Dict[str, dict], pdf_root: str, config=None) -> pd.Series:
+    """
+    Share of golden values ({"school/file.pdf": {field: value}}) the stateless
+    extractor gets right with `schema` (a JSON schema or CompiledSchema), per field.
+    """
+    if isinstance(schema, CompiledSchema):
+        config, schema = schema.config(config), schema.json_schema
+
+    async def one(key: str) -> Tuple[str, dict]:
+        run = await extractor.aextract(schema, config, os.path.join(pdf_root, key))
+        return key, run.data or {}
+
+    results = dict(await asyncio.gather(*(one(key) for key in golden)))
+    hits: Dict[str, List[bool]] = {}
+    for key, expected in golden.items():
+        for field, value in expected.items():
+            hits.setdefault(field, []).append(_matches(value, results[key].get(field)))
+    return pd.Series({field: sum(h) / len(h) for field, h in hits.items()}, name=pipeline, dtype="float64")
+
+
+def main(argv=None) -> pd.DataFrame:
+    from benchmark import PIPELINES, load_model
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", action="append", choices=list(PIPELINES), help="default: all")
+    parser.add_argument("--show", action="store_true", help="print the system prompt and compiled descriptions")
+    parser.add_argument("--golden", help='expected values: {pipeline: {"school/file.pdf": {field: value}}}')
+    parser.add_argument("--store", help="replay store to answer the golden check from instead of LlamaExtract")
+    parser.add_argument("--pdf-root", default="university_pdfs_test")
+    args = parser.parse_args(argv)
+
+    golden = {}
+    if args.golden:
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+        if args.store:
+            from replay_extract import ReplayExtract, ReplayStore
+            # A pair the store never saw must fail the check, not score fake values
+            extractor = ReplayExtract(ReplayStore(args.store), on_missing="error")
+        else:
+            from llama_cloud_services import LlamaExtract
+            extractor = LlamaExtract()
+
+    rows = []
+    for pipeline in args.pipeline or list(PIPELINES):
+        schema = load_model(pipeline)
+        compiled = compile_schema(schema, pipeline)
+        print(compiled.report())
+        if args.show:
+            print(compiled.system_prompt)
+            for name, prop in compiled.json_schema.get("properties", {}).items():
+                print(f"  {name}: {prop.get('description', '')}")
+        row = {"pipeline": pipeline, "tokens_before": compiled.tokens_before, "tokens_after": compiled.tokens_after}
+        if pipeline in golden:
+            before = asyncio.run(agolden_accuracy(extractor, pipeline, json_schema(schema), golden[pipeline], args.pdf_root))
+            after = asyncio.run(agolden_accuracy(extractor, pipeline, compiled, golden[pipeline], args.pdf_root))
+            row.update(accuracy_before=before.mean(), accuracy_after=after.mean())
+            worse = after[after < before]
+            if len(worse):
+                print(f"  fields less accurate after compiling: {', '.join(worse.index)}")
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+    return table
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import inspect
+import re
+from typing import Callable, Dict, List, Optional, Union
+
+from extraction_engine import json_schema
+
+# "# ─── OPERATING REVENUES ───", "# ───── ENDOWMENT SPENDING ─────", "# --- Mandatory fields ---"
+_SECTION = re.compile(r"^\s*#\s*[─—-]{3,}\s*(.*?)\s*[─—-]{3,}\s*$")
+# `name: Optional[int] = Field(` in a class body, `"name": (` in a fields dict
+_FIELD = re.compile(r"""^\s*["']?([A-Za-z_]\w*)["']?\s*:""")
+OTHER = "OTHER"
+ALL = "ALL"
+# Smaller schemas are extracted in one call: every section is its own call billed for every page sent
+MIN_SECTION_FIELDS = 40
+
+
+def schema_sections(factory: Union[Callable, type], *args) -> Dict[str, List[str]]:
+    """
+    {section: fields} along the section comment blocks of the source that
+    defines a schema (a factory such as generate_income_statement_schema,
+    called with `args`, or a model class). Fields above the first block go
+    to the first section; fields the source doesn't show go to OTHER. A
+    schema without blocks is a single section.
+    """
+    model = factory(*args) if args else factory
+    properties = list(json_schema(model).get("properties", {}))
+    sections: Dict[Optional[str], List[str]] = {}
+    current = None
+    placed = set()
+    for line in inspect.getsource(factory).splitlines():
+        header = _SECTION.match(line)
+        if header:
+            current = header.group(1).upper()
+            continue
+        field = _FIELD.match(line)
+        if field and field.group(1) in properties and field.group(1) not in placed:
+            sections.setdefault(current, []).append(field.group(1))
+            placed.add(field.group(1))
+    leading = sections.pop(None, [])
+    if sections:
+        # Fields above the first block belong with it
+        first = next(iter(sections))
+        sections[first] = leading + sections[first]
+    elif leading:
+        sections[ALL] = leading
+    rest = [f for f in properties if f not in placed]
+    if rest:
+        sections[OTHER if sections else ALL] = rest
+    return sections
+
+
+def section_plan(sections: Dict[str, List[str]], min_fields: int = MIN_SECTION_FIELDS) -> Optional[Dict[str, List[str]]]:
+    """
+    `sections` when the schema is worth splitting (more than one section and
+    at least `min_fields` fields), otherwise None: one call per document.
+    A split sends each document once per section, so it costs len(sections)
+    times the pages (and credits) of a single call.
+    """
+    if len(sections) < 2 or sum(len(fields) for fields in sections.values()) < min_fields:
+        return None
+    return sections
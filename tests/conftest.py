@@ -0,0 +1,28 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root, next to the notebooks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extraction_engine import EngineOptions, aextract_all  # noqa: E402
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """A PDF_ROOT with three schools and five small "PDFs" (plus a file the walk must skip)."""
+    root = tmp_path / "pdfs"
+    for school, files in {"ALPHA": ["a.pdf", "b.pdf", "notes.txt"], "BETA": ["c.pdf"], "GAMMA": ["d.pdf", "e.pdf"]}.items():
+        (root / school).mkdir(parents=True)
+        for name in files:
+            (root / school / name).write_text(f"{school}/{name}")
+    return root
+
+
+def extract_corpus(corpus, agent, concurrency=8, on_school_done=None, **options):
+    """{school: combined} of one schema ("bs") extracted from `corpus` with EngineOptions(**options)."""
+    results = asyncio.run(aextract_all(str(corpus), {"bs": agent}, concurrency, EngineOptions(**options), on_school_done))
+    return results["bs"]
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from batch_poller import BatchPoller
+from conftest import extract_corpus
+from fake_extract import FakeAgent, FakeApiError, FakeJob
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+class ScriptedAgent(FakeAgent):
+    """A FakeAgent whose status calls answer from `statuses` (one entry per poll, the last one repeats)."""
+
+    def __init__(self, statuses):
+        super().__init__(SCHEMA)
+        self.statuses = list(statuses)
+
+    def get_extraction_job(self, job_id):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        if isinstance(status, Exception):
+            raise status
+        return FakeJob(job_id, status, error="bad scan" if status == "ERROR" else None)
+
+
+def poll(agent, **poller_kwargs):
+    async def submit_and_wait():
+        poller = BatchPoller(interval=0.01, **poller_kwargs)
+        return await (await poller.submit(agent, "ALPHA/a.pdf")), poller
+
+    return asyncio.run(submit_and_wait())
+
+
+def test_batch_run_matches_the_direct_run(corpus):
+    poller = BatchPoller(interval=0.01)
+    assert extract_corpus(corpus, FakeAgent(SCHEMA, latency=0.02), poller=poller) == extract_corpus(corpus, FakeAgent(SCHEMA))
+    assert poller.submitted == 5 and poller.stats()["pending"] == 0
+
+
+def test_a_job_still_pending_after_max_timeout_fails():
+    with pytest.raises(TimeoutError):
+        poll(ScriptedAgent(["PENDING"]), max_timeout=0.05)
+
+
+def test_an_error_status_fails_the_job():
+    with pytest.raises(RuntimeError, match="ERROR: bad scan"):
+        poll(ScriptedAgent(["PENDING", "ERROR"]))
+
+
+def test_transient_poll_errors_are_retried_then_given_up():
+    data, poller = poll(ScriptedAgent([FakeApiError(503), FakeApiError(429), "SUCCESS"]))
+    assert set(data) == set(SCHEMA["properties"]) and poller.polls == 3
+    with pytest.raises(FakeApiError):
+        poll(ScriptedAgent([FakeApiError(503)]), max_poll_errors=3)
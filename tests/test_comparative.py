@@ -0,0 +1,32 @@
+from comparative import PRIOR_SUFFIX, comparative_schema, write_comparative
+from panel_store import load_panel, schools_frame, write_panel
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def both_years(current, prior):
+    return {**current, **{k + PRIOR_SUFFIX: v for k, v in prior.items()}}
+
+
+def test_comparative_schema_asks_for_both_columns():
+    schema = comparative_schema(lambda year: {"title": f"BS_{year}", "properties": {"cash": {"description": f"Cash at June 30, {year}"}}}, 2024)
+    assert schema["properties"]["cash"]["description"] == "Cash at June 30, 2024"
+    assert schema["properties"]["cash" + PRIOR_SUFFIX]["description"].endswith("Cash at June 30, 2023")
+
+
+def test_restated_prior_year_is_reported_and_the_stored_value_kept(tmp_path):
+    root = str(tmp_path / "panel")
+    # Last year's run stored FY2023 for ALPHA only
+    write_panel(schools_frame({"ALPHA": {"total_assets": 100, "total_liabilities": 40}}, SCHEMA), "bs", 2023, root)
+    schools = {
+        "ALPHA": both_years({"total_assets": 120, "total_liabilities": 45}, {"total_assets": 110, "total_liabilities": 40}),
+        "BETA": both_years({"total_assets": 9, "total_liabilities": 3}, {"total_assets": 8, "total_liabilities": 2}),
+        "GAMMA": None,
+    }
+    current, restated = write_comparative(schools, "bs", 2024, SCHEMA, root)
+
+    assert current["ALPHA"] == {"total_assets": 120, "total_liabilities": 45} and current["GAMMA"] is None
+    assert restated.to_dict("records") == [{"school": "ALPHA", "metric": "total_assets", "stored": 100, "restated": 110}]
+    prior = load_panel("bs", years=[2023], root=root)["total_assets"].to_dict()
+    # The value extracted as FY2023's current year wins; the prior column only fills BETA
+    assert prior == {("ALPHA", 2023): 100.0, ("BETA", 2023): 8.0}
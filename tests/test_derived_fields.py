@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import derived_fields
+from derived_fields import ALL, ANY, ZERO, Bound, Fill, Identity, Residual, apply_derived, check_failures, failing_rows
+
+NAN = np.nan
+
+
+def frame(rows):
+    return pd.DataFrame(rows).set_index("school")
+
+
+def test_residual_modes():
+    df = frame([
+        {"school": "A", "total": 100.0, "x": 30.0, "y": 20.0},
+        {"school": "B", "total": 100.0, "x": 30.0, "y": NAN},
+        {"school": "C", "total": 100.0, "x": NAN, "y": NAN},
+        {"school": "D", "total": NAN, "x": 30.0, "y": 20.0},
+    ])
+    for missing, expected in [(ANY, [50.0, 70.0, NAN, NAN]), (ZERO, [50.0, 70.0, 100.0, NAN]), (ALL, [50.0, NAN, NAN, NAN])]:
+        out = apply_derived(df, "s", {"s": [Residual("other", "total", ("x", "y"), missing=missing)]})
+        np.testing.assert_array_equal(out["other"].to_numpy(), expected)
+
+
+def test_fill_leaves_reported_values_alone():
+    df = frame([
+        {"school": "A", "net": 5.0, "capital": 1.0, "noncapital": 2.0},
+        {"school": "B", "net": 0.0, "capital": 1.0, "noncapital": NAN},
+        {"school": "C", "net": NAN, "capital": NAN, "noncapital": NAN},
+    ])
+    out = apply_derived(df, "cf", {"cf": [Fill("net", ("capital", "noncapital"))]})
+    np.testing.assert_array_equal(out["net"].to_numpy(), [5.0, 1.0, NAN])
+    assert df["net"].tolist()[1] == 0.0  # the input table is not modified
+
+
+def test_rules_apply_in_order_and_accept_text_answers():
+    df = frame([{"school": "A", "total": "100", "x": 40, "y": "n/a"}])
+    rules = {"s": [Residual("rest", "total", ("x",)), Residual("rest_share", "rest", ("y",), missing=ZERO)]}
+    out = apply_derived(df, "s", rules)
+    assert out.loc["A", "rest"] == 60.0 and out.loc["A", "rest_share"] == 60.0
+
+
+def test_cash_flow_financing_is_filled_from_its_parts():
+    df = frame([{
+        "school": "A",
+        "net_cash_from_financing_activities": 0,
+        "cash_flows_from_capital_and_related_financing_activities": -10,
+        "cash_flows_from_noncapital_financing_activities": 4,
+    }])
+    assert apply_derived(df, "cash_flow").loc["A", "net_cash_from_financing_activities"] == -6
+
+
+def test_identity_checks_respect_tolerance_and_missing():
+    checks = {"s": [Identity("total", ("x", "y"), missing=ALL, tolerance=0.01)]}
+    df = frame([
+        {"school": "ok", "total": 100.0, "x": 60.0, "y": 40.5},
+        {"school": "off", "total": 100.0, "x": 60.0, "y": 30.0},
+        {"school": "partial", "total": 100.0, "x": 60.0, "y": NAN},
+    ])
+    failures = check_failures(df, "s", checks)
+    assert list(failures.index) == ["off"]
+    assert failures.loc["off", "fields"] == ("total", "x", "y")
+    assert list(failing_rows(df, "s", checks)) == ["off"]
+
+
+def test_bound_flags_negative_or_oversized_plugs(monkeypatch):
+    rules = {"s": [Residual("plug", "total", ("x",))]}
+    monkeypatch.setattr(derived_fields, "DERIVED", rules)  # Bound looks its residual up in DERIVED
+    checks = {"s": [Bound("plug", low=0.0, high=0.5)]}
+    df = apply_derived(frame([
+        {"school": "ok", "total": 100.0, "x": 80.0},
+        {"school": "negative", "total": 100.0, "x": 120.0},
+        {"school": "oversized", "total": 100.0, "x": 10.0},
+    ]), "s", rules)
+    failures = check_failures(df, "s", checks)
+    assert sorted(failures.index) == ["negative", "oversized"]
+    assert failures.loc["negative", "fields"] == ("total", "x")
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import ROOT
+from document_classifier import filename_scores, is_excluded_filing, make_router
+
+PDF_ROOT = os.path.join(ROOT, "scrapping", "university_pdfs")
+CSV = os.path.join(ROOT, "scrapping", "disclosure_document_list_filtered.csv")
+SCHOOLS = ["BRADLEY_UNIVERSITY", "CORNELL_UNIVERSITY", "ST_LOUIS_UNIVERSITY_US", "UNIVERSITY_OF_COLORADO", "UNIVERSITY_OF_MINNESOTA"]
+
+
+def corpus_files():
+    for school in sorted(os.listdir(PDF_ROOT)):
+        for fname in sorted(os.listdir(os.path.join(PDF_ROOT, school))):
+            if fname.lower().endswith(".pdf"):
+                yield school, fname
+
+
+def test_operating_data_filings_are_not_excluded():
+    # "rating" must not match inside "operating"
+    operating = [f for _, f in corpus_files() if "operating" in f.lower()]
+    assert operating
+    assert not [f for f in operating if is_excluded_filing(f)]
+
+
+@pytest.mark.parametrize("fname", [
+    "2024_Annual_Compliance_Certificate_for_the_year_ended_06_30_2024__2.8_MB_.pdf",
+    "2024_Certificate_of_Compliance_for_the_year_ended_06_30_2024__323_KB_.pdf",
+    "Amendment_to_Continuing_Disclosure_Undertaking_dated_01_05_2024__392_KB_.pdf",
+    "The_Ohio_State_University_Quarterly_Update_to_Bondholders_for_the_quarter_ended_09_30_2024__574_KB_.pdf",
+    "Rating_Agency_Notice_2024.pdf",
+])
+def test_negative_filings_are_excluded(fname):
+    assert is_excluded_filing(fname)
+
+
+def test_operating_data_scores_for_enrollment():
+    for _, fname in corpus_files():
+        if "operating_data" in fname.lower():
+            assert filename_scores(fname)["enrollment"] >= 0.8, fname
+
+
+@pytest.fixture(scope="module")
+def router(tmp_path_factory):
+    # Only the schools the routing regressions were seen on, so the text pass stays quick
+    root = tmp_path_factory.mktemp("pdfs")
+    for school in SCHOOLS:
+        shutil.copytree(os.path.join(PDF_ROOT, school), root / school)
+    return str(root), make_router(str(root), CSV)
+
+
+def routed(router, school, schema):
+    root, route = router
+    return route(school, sorted(os.listdir(os.path.join(root, school))), schema)
+
+
+def test_cornell_enrollment_reads_operating_data(router):
+    assert "2024_Operating_Data_for_the_year_ended_06_30_2024__109_KB_.pdf" in routed(router, "CORNELL_UNIVERSITY", "enrollment")
+
+
+@pytest.mark.parametrize("school", ["BRADLEY_UNIVERSITY", "UNIVERSITY_OF_COLORADO", "UNIVERSITY_OF_MINNESOTA"])
+def test_annual_operating_data_reaches_enrollment(router, school):
+    assert [f for f in routed(router, school, "enrollment") if "Operating_Data" in f]
+
+
+def test_st_louis_audited_financials_reach_balance_sheet(router):
+    assert len(routed(router, "ST_LOUIS_UNIVERSITY_US", "balance_sheet")) == 2
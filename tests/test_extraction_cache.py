@@ -0,0 +1,61 @@
+import os
+
+import extraction_cache
+from conftest import extract_corpus
+from extraction_cache import ExtractionCache
+from fake_extract import FakeAgent, FakeExtractor
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_cache_answers_a_rerun(corpus, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    first = extract_corpus(corpus, FakeAgent(SCHEMA), cache=cache)
+    agent = FakeAgent(SCHEMA)
+    assert extract_corpus(corpus, agent, cache=cache) == first
+    assert agent.calls == 0
+
+
+def test_puts_evict_least_recently_used_without_walking_the_cache(corpus, tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    pdfs = sorted(str(p) for p in corpus.rglob("*.pdf"))
+    cache.put(pdfs[0], SCHEMA, {"total_assets": 1})  # the first write reads the directory once
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(extraction_cache.os, "walk", lambda *a, **k: walks.append(a) or real_walk(*a, **k))
+    for pdf in pdfs[1:]:
+        cache.put(pdf, SCHEMA, {"total_assets": 1})
+    size = cache.stats()["bytes"]
+    assert walks == []
+    on_disk = sum(os.path.getsize(e) for e in cache._entries())
+    assert size == on_disk
+    walks.clear()
+
+    # Shrink to about two documents' entries; a.pdf was just read, so it outlives b.pdf
+    cache.get(pdfs[0], SCHEMA)
+    cache.max_bytes = on_disk * 2 // len(pdfs)
+    cache.put(pdfs[-1], SCHEMA, {"total_assets": 2})
+    assert walks == [] and cache.evictions > 0
+    assert cache.get(pdfs[0], SCHEMA) == {"total_assets": 1}
+    assert cache.get(pdfs[1], SCHEMA) is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_cache_reextracts_only_changed_fields(corpus, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    extract_corpus(corpus, FakeAgent(SCHEMA), cache=cache)
+    edited = {"properties": {**SCHEMA["properties"], "total_net_assets": {"type": "integer"}}}
+    agent, extractor = FakeAgent(edited), FakeExtractor()
+    extract_corpus(corpus, agent, cache=cache, extractor=extractor)
+    assert agent.calls == 0
+    assert extractor.calls == 5 and extractor.fields_extracted == 5
+
+
+def test_fully_field_cached_documents_are_hits(corpus, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    extract_corpus(corpus, FakeAgent(SCHEMA), cache=cache)
+    # Dropping a field leaves every remaining field cached under its own hash
+    narrowed = {"properties": {"total_assets": {"type": "integer"}}}
+    agent, extractor = FakeAgent(narrowed), FakeExtractor()
+    extract_corpus(corpus, agent, cache=cache, extractor=extractor)
+    assert agent.calls == 0 and extractor.calls == 0
@@ -0,0 +1,45 @@
+import time
+
+from conftest import extract_corpus
+from extraction_engine import discover_jobs, merge_results
+from fake_extract import FakeAgent
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_jobs_follow_the_notebook_walk(corpus):
+    jobs = discover_jobs(str(corpus), ["bs"])
+    assert [(j.school, j.pdf) for j in jobs] == [
+        ("ALPHA", "a.pdf"), ("ALPHA", "b.pdf"), ("BETA", "c.pdf"), ("GAMMA", "d.pdf"), ("GAMMA", "e.pdf"),
+    ]
+
+
+def test_merge_keeps_the_first_value_unless_a_later_pdf_fills_it():
+    assert merge_results([{"x": 1, "y": None}, {"x": 2, "y": 3}, {"x": None, "y": ""}]) == {"x": 2, "y": 3}
+    assert merge_results([None, None]) is None
+
+
+def test_wall_time_scales_with_concurrency(corpus):
+    # Five 0.2s jobs: sequential takes ~1s, five slots ~0.2s; max_inflight turns any overshoot into a 429
+    agent = FakeAgent(SCHEMA, latency=0.2, max_inflight=5)
+    start = time.perf_counter()
+    schools = extract_corpus(corpus, agent, concurrency=5)
+    assert time.perf_counter() - start < 0.6
+    assert agent.calls == 5 and agent.rejected == 0
+    assert set(schools) == {"ALPHA", "BETA", "GAMMA"}
+
+
+def test_results_do_not_depend_on_concurrency(corpus):
+    assert extract_corpus(corpus, FakeAgent(SCHEMA), concurrency=1) == extract_corpus(corpus, FakeAgent(SCHEMA), concurrency=8)
+
+
+def test_on_school_done_fires_once_per_school(corpus):
+    done = []
+    extract_corpus(corpus, FakeAgent(SCHEMA), 2, on_school_done=lambda schema, school, combined: done.append(school))
+    assert sorted(done) == ["ALPHA", "BETA", "GAMMA"]
+
+
+def test_failures_are_skipped(corpus):
+    # Every call is refused, so every school comes back empty instead of raising
+    schools = extract_corpus(corpus, FakeAgent(SCHEMA, max_inflight=0))
+    assert schools == {"ALPHA": None, "BETA": None, "GAMMA": None}
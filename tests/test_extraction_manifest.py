@@ -0,0 +1,32 @@
+from conftest import extract_corpus
+from extraction_manifest import ExtractionManifest
+from fake_extract import FakeAgent
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_manifest_only_extracts_new_or_changed_pdfs(corpus, tmp_path):
+    path = str(tmp_path / "manifest.json")
+    extract_corpus(corpus, FakeAgent(SCHEMA), manifest=ExtractionManifest(path))
+
+    manifest = ExtractionManifest(path)
+    agent = FakeAgent(SCHEMA)
+    extract_corpus(corpus, agent, manifest=manifest)
+    assert agent.calls == 0 and not manifest.changed
+
+    (corpus / "BETA" / "c.pdf").write_text("restated")
+    manifest = ExtractionManifest(path)
+    agent = FakeAgent(SCHEMA)
+    schools = extract_corpus(corpus, agent, manifest=manifest)
+    assert agent.calls == 1 and manifest.changed == {"bs": {"BETA"}}
+    assert set(schools) == {"ALPHA", "BETA", "GAMMA"}
+
+
+def test_manifest_drops_removed_pdfs(corpus, tmp_path):
+    path = str(tmp_path / "manifest.json")
+    extract_corpus(corpus, FakeAgent(SCHEMA), manifest=ExtractionManifest(path))
+    (corpus / "GAMMA" / "e.pdf").unlink()
+    manifest = ExtractionManifest(path)
+    extract_corpus(corpus, FakeAgent(SCHEMA), manifest=manifest)
+    assert "GAMMA/e.pdf" not in manifest.entries["bs"]
+    assert manifest.changed == {"bs": {"GAMMA"}}
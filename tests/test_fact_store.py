@@ -0,0 +1,53 @@
+import fact_store
+from conftest import extract_corpus
+from derived_fields import Residual, apply_derived
+from extraction_cache import file_sha256
+from extraction_manifest import ExtractionManifest
+from fact_store import FactStore
+from fake_extract import FakeAgent
+from panel_store import schools_frame
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+RULES = {"bs": [Residual("net_assets", "total_assets", ("total_liabilities",))]}
+
+
+def value(path, field):
+    # ALPHA: a.pdf reports total assets only, b.pdf total liabilities only
+    if path.endswith("a.pdf"):
+        return 100 if field == "total_assets" else None
+    if path.endswith("b.pdf"):
+        return 40 if field == "total_liabilities" else None
+    return 7
+
+
+def test_every_fact_keeps_its_source(corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(fact_store, "DERIVED", RULES)
+    manifest = ExtractionManifest(str(tmp_path / "manifest.json"))
+    schools = extract_corpus(corpus, FakeAgent(SCHEMA, value_fn=value), manifest=manifest)
+    table = apply_derived(schools_frame(schools, SCHEMA), "bs", RULES)
+    table.loc["BETA", "total_assets"] = 8.0  # e.g. corrected by a validation retry: no longer the extracted value
+
+    facts = FactStore(str(tmp_path / "facts.db"))
+    assert facts.load_table(table, "bs", 2024, manifest=manifest, run_id="run-1", identities={"ALPHA": ("Alpha College", "123")}) == 9
+
+    def source(school, metric):
+        row = facts.provenance(school, metric, 2024).iloc[0]
+        return row["value"], row["source_pdf"], row["source_sha256"]
+
+    assert source("ALPHA", "total_assets") == (100, "a.pdf", file_sha256(str(corpus / "ALPHA" / "a.pdf")))
+    assert source("ALPHA", "total_liabilities") == (40, "b.pdf", file_sha256(str(corpus / "ALPHA" / "b.pdf")))
+    assert source("ALPHA", "net_assets") == (60, "derived", None)
+    assert source("BETA", "total_assets") == (8, None, None)
+    assert source("BETA", "total_liabilities")[1] == "c.pdf"
+    alpha = facts.metric("total_assets", 2024).set_index("school").loc["ALPHA"]
+    assert (alpha["credit"], alpha["cusip"]) == ("Alpha College", "123")
+    assert set(facts.provenance("GAMMA", "net_assets")["run_id"]) == {"run-1"}
+
+
+def test_a_reload_replaces_a_schools_rows(corpus, tmp_path):
+    facts = FactStore(str(tmp_path / "facts.db"))
+    schools = extract_corpus(corpus, FakeAgent(SCHEMA, value_fn=value))
+    table = schools_frame(schools, SCHEMA)
+    facts.load_table(table, "bs", 2024, identities={})
+    facts.load_table(table.drop(index="GAMMA"), "bs", 2024, schools=["GAMMA"], identities={})
+    assert list(facts.metric("total_assets", 2024)["school"]) == ["ALPHA", "BETA"]
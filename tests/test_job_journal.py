@@ -0,0 +1,22 @@
+from conftest import extract_corpus
+from fake_extract import FakeAgent
+from job_journal import JobJournal
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_journal_resumes_without_extracting(corpus, tmp_path):
+    journal = JobJournal(str(tmp_path / "journal.db"))
+    first = extract_corpus(corpus, FakeAgent(SCHEMA), journal=journal)
+    agent = FakeAgent(SCHEMA)
+    assert extract_corpus(corpus, agent, journal=journal) == first
+    assert agent.calls == 0
+
+
+def test_journal_reextracts_a_replaced_pdf(corpus, tmp_path):
+    journal = JobJournal(str(tmp_path / "journal.db"))
+    extract_corpus(corpus, FakeAgent(SCHEMA), journal=journal)
+    (corpus / "BETA" / "c.pdf").write_text("restated")
+    agent = FakeAgent(SCHEMA)
+    extract_corpus(corpus, agent, journal=journal)
+    assert agent.calls == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+import page_locator
+from extraction_engine import EngineOptions, aextract_all, aextract_document
+from fake_extract import FakeAgent
+from page_locator import prefilter_pdf, shared_prefilter
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+# Six pages: the balance sheet starts on page 0, the cash flow statement on page 3
+PAGES = ("statement of financial position", "", "", "statement of cash flows", "", "")
+
+
+@pytest.fixture
+def blank_pdfs(corpus, monkeypatch):
+    """The corpus PDFs as six blank pages each, with PAGES as their text layer."""
+    for pdf in corpus.rglob("*.pdf"):
+        writer = PdfWriter()
+        for _ in PAGES:
+            writer.add_blank_page(width=72, height=72)
+        writer.add_metadata({"/Title": pdf.name})  # distinct bytes, so distinct trimmed copies
+        with open(pdf, "wb") as f:
+            writer.write(f)
+    monkeypatch.setattr(page_locator, "page_texts", lambda path: PAGES)
+    return corpus
+
+
+def test_shared_prefilter_trims_once_to_the_union(blank_pdfs, tmp_path):
+    pdf = str(blank_pdfs / "ALPHA" / "a.pdf")
+    prefilter = shared_prefilter(["balance_sheet", "cash_flow"], out_dir=str(tmp_path / "trimmed"))
+    trimmed = prefilter(pdf, "balance_sheet")
+    assert prefilter(pdf, "cash_flow") == trimmed != pdf
+    assert len(PdfReader(trimmed).pages) == 4  # pages 0-1 and 3-4
+    # Alone, each schema gets its own two-page copy
+    assert len(PdfReader(prefilter_pdf(pdf, "cash_flow", str(tmp_path / "trimmed"))).pages) == 2
+
+
+def test_shared_prefilter_sends_the_full_pdf_when_a_schema_needs_it(blank_pdfs, tmp_path, monkeypatch):
+    pdf = str(blank_pdfs / "ALPHA" / "a.pdf")
+    out_dir = str(tmp_path / "trimmed")
+    # No endowment keyword on any page, so endowment reads the whole document and so does everyone else
+    assert shared_prefilter(["balance_sheet", "endowment"], out_dir)(pdf, "balance_sheet") == pdf
+    monkeypatch.setitem(page_locator.PAGE_KEYWORDS, "unlisted", [])
+    assert shared_prefilter(["balance_sheet", "unlisted"], out_dir)(pdf, "balance_sheet") == pdf
+
+
+def test_every_pdf_is_uploaded_once_across_schemas(blank_pdfs, tmp_path):
+    agents = {"balance_sheet": FakeAgent(SCHEMA), "cash_flow": FakeAgent(SCHEMA)}
+    prefilter = shared_prefilter(agents, out_dir=str(tmp_path / "trimmed"))
+    results = asyncio.run(aextract_all(str(blank_pdfs), agents, options=EngineOptions(prefilter=prefilter)))
+    assert set(results) == set(agents)
+    assert sum(agent.uploads for agent in agents.values()) == 5
+    assert sum(agent.calls for agent in agents.values()) == 10
+
+
+def test_aextract_document_fans_one_upload_out(blank_pdfs, tmp_path):
+    agents = {"balance_sheet": FakeAgent(SCHEMA), "cash_flow": FakeAgent(SCHEMA)}
+    pdf = str(blank_pdfs / "BETA" / "c.pdf")
+    data = asyncio.run(aextract_document(pdf, agents, prefilter=shared_prefilter(agents, str(tmp_path / "trimmed"))))
+    assert set(data) == set(agents) and all(data.values())
+    assert sum(agent.uploads for agent in agents.values()) == 1
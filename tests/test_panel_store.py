@@ -0,0 +1,41 @@
+import pandas as pd
+
+from panel_store import frame_schools, load_panel, panel_years, schools_frame, write_panel
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_schools_frame_follows_the_schema_and_round_trips():
+    schools = {"BETA": {"total_liabilities": 2, "total_assets": 1, "note": "restated"}, "ALPHA": {"total_assets": 3}, "GAMMA": None}
+    table = schools_frame(schools, SCHEMA)
+    assert list(table.columns) == ["total_assets", "total_liabilities", "note"]
+    assert frame_schools(table, schools) == {
+        "BETA": {"total_assets": 1, "total_liabilities": 2, "note": "restated"},
+        "ALPHA": {"total_assets": 3, "total_liabilities": None, "note": None},
+        "GAMMA": None,
+    }
+
+
+def test_write_panel_upserts_the_given_schools(tmp_path):
+    root = str(tmp_path / "panel")
+    write_panel(schools_frame({"ALPHA": {"total_assets": 1, "total_liabilities": 2}, "BETA": {"total_assets": 3}}, SCHEMA), "bs", 2024, root)
+    # A re-run for BETA alone replaces BETA's row, keeps ALPHA's and adds the new metric
+    write_panel(schools_frame({"BETA": {"total_assets": 30, "cash": 5}}, SCHEMA), "bs", 2024, root)
+    panel = load_panel("bs", root=root)
+    assert list(panel.index) == [("ALPHA", 2024), ("BETA", 2024)]
+    assert panel.loc[("BETA", 2024), "total_assets"] == 30 and panel.loc[("ALPHA", 2024), "total_liabilities"] == 2
+    assert panel.loc[("BETA", 2024), "cash"] == 5 and pd.isna(panel.loc[("ALPHA", 2024), "cash"])
+
+
+def test_load_panel_reads_only_the_requested_slice(tmp_path):
+    root = str(tmp_path / "panel")
+    for year in (2022, 2023, 2024):
+        rows = {school: {"total_assets": year + i, "total_liabilities": i} for i, school in enumerate(["ALPHA", "BETA", "GAMMA"])}
+        write_panel(schools_frame(rows, SCHEMA), "bs", year, root)
+    write_panel(schools_frame({"ALPHA": {"total_assets": 1}}, SCHEMA), "is", 2024, root)
+    assert panel_years("bs", root) == [2022, 2023, 2024]
+
+    panel = load_panel("bs", years=[2023, 2024, 2030], schools=["BETA"], metrics=["total_assets"], root=root)
+    assert list(panel.columns) == ["total_assets"]
+    assert panel["total_assets"].to_dict() == {("BETA", 2023): 2024.0, ("BETA", 2024): 2025.0}
+    assert load_panel("bs", years=[2030], root=root).empty
@@ -0,0 +1,72 @@
+import asyncio
+
+from extraction_engine import EngineOptions, ExtractionJob, arun_jobs
+from fake_extract import FakeAgent, FakeApiError
+from rate_limiter import AIMDLimiter, ExtractionLimiter
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+class RecordingAIMD(AIMDLimiter):
+    """Keeps the limit after every back-off."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lows = []
+
+    def _backoff(self) -> None:
+        super()._backoff()
+        self.lows.append(self.limit)
+
+
+def make_jobs(count):
+    return [ExtractionJob(f"S{i:03d}", f"{i}.pdf", "bs", f"S{i:03d}/{i}.pdf") for i in range(count)]
+
+
+def run(jobs, agent, limiter, concurrency=8):
+    return asyncio.run(arun_jobs(jobs, {"bs": agent}, concurrency, EngineOptions(limiter=limiter)))
+
+
+def test_concurrency_backs_off_on_429s_and_recovers():
+    aimd = RecordingAIMD(initial=8, max_limit=8)
+    limiter = ExtractionLimiter(rate=10_000, aimd=aimd, base_delay=0.01, max_attempts=10)
+    options = EngineOptions(limiter=limiter)
+
+    async def both_phases():
+        # The service takes at most two calls at a time; the engine offers eight
+        busy = await arun_jobs(make_jobs(20), {"bs": FakeAgent(SCHEMA, latency=0.02, max_inflight=2)}, 8, options)
+        low = min(aimd.lows)
+        # Once the service takes everything again, each success adds a slot back
+        free = await arun_jobs(make_jobs(100), {"bs": FakeAgent(SCHEMA, latency=0.001)}, 8, options)
+        return busy, low, free
+
+    busy, low, free = asyncio.run(both_phases())
+    assert all(data is not None for data in busy.values()) and limiter.throttled > 0 and low <= 2
+    assert all(data is not None for data in free.values()) and aimd.limit == 8
+
+
+def test_503s_are_retried():
+    limiter = ExtractionLimiter(rate=10_000, base_delay=0.01, max_attempts=10)
+    agent = FakeAgent(SCHEMA, latency=0.001, error_rate=0.3, seed=7)
+    results = run(make_jobs(30), agent, limiter)
+    assert all(data is not None for data in results.values())
+    assert agent.rejected > 0 and limiter.retries == agent.rejected == limiter.throttled
+
+
+def test_a_backoff_hands_the_engine_slot_to_the_next_job():
+    class FirstCallThrottled(FakeAgent):
+        def _admit(self):
+            if not self.rejected:
+                self.rejected += 1
+                raise FakeApiError(429, "Too Many Requests")
+            super()._admit()
+
+        def _run(self, file_input):
+            order.append(file_input.name)
+            return super()._run(file_input)
+
+    order = []
+    limiter = ExtractionLimiter(rate=10_000, base_delay=0.2)
+    run(make_jobs(2), FirstCallThrottled(SCHEMA, latency=0.05), limiter, concurrency=1)
+    # The second document ran while the first one waited out its backoff
+    assert order == ["S001/1.pdf", "S000/0.pdf"]
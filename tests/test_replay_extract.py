@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from extraction_engine import aextract_all
+from fake_extract import FakeAgent, FakeExtractor, fake_value
+from replay_extract import RecordingExtract, RemoteStore, ReplayExtract, ReplayStore, serve
+
+SCHEMA = {"properties": {"net_tuition_revenue": {"type": "integer"}, "total_operating_expense": {"type": "integer"}}}
+
+
+class FakeLlamaExtract:
+    """The LlamaExtract calls RecordingExtract makes, answered by FakeAgent/FakeExtractor."""
+
+    def __init__(self, value_fn):
+        self.value_fn = value_fn
+        self.stateless = FakeExtractor(value_fn=value_fn)
+
+    def get_agent(self, name=None, id=None):
+        return FakeAgent(SCHEMA, value_fn=self.value_fn)
+
+    async def aextract(self, data_schema, config, files):
+        return await self.stateless.aextract(data_schema, config, files)
+
+
+def live_value(path, field):
+    return len(path) * 1000 + len(field)
+
+
+@pytest.fixture
+def recorded(corpus, tmp_path):
+    """A store recorded from a run of the 'live' extractor, and that run's result."""
+    store = ReplayStore(str(tmp_path / "replay.json"))
+    agent = RecordingExtract(FakeLlamaExtract(live_value), store).get_agent(id="agent-1")
+    live = asyncio.run(aextract_all(str(corpus), {"is": agent}))
+    return store.path, live
+
+
+def test_replay_matches_the_recorded_run(corpus, recorded):
+    path, live = recorded
+    agent = ReplayExtract(ReplayStore(path)).get_agent(id="agent-1")
+    assert agent.data_schema == SCHEMA
+    assert asyncio.run(aextract_all(str(corpus), {"is": agent})) == live
+    assert agent.replayed == 5 and agent.missing == 0
+
+
+def test_unrecorded_pairs_are_faked_or_refused(corpus, recorded):
+    path, _ = recorded
+    other = {"properties": {"endowment_total": {"type": "integer"}}}
+    faked = ReplayExtract(ReplayStore(path)).create_agent("other", other)
+    pdf = str(corpus / "BETA" / "c.pdf")
+    assert faked.extract(pdf).data == {"endowment_total": fake_value(pdf, "endowment_total")}
+    assert faked.missing == 1
+
+    strict = ReplayExtract(ReplayStore(path), on_missing="error").create_agent("other", other)
+    with pytest.raises(KeyError):
+        strict.extract(pdf)
+
+
+def test_stateless_calls_are_recorded_and_replayed(corpus, tmp_path):
+    store = ReplayStore(str(tmp_path / "replay.json"))
+    pdf = str(corpus / "ALPHA" / "a.pdf")
+    live = asyncio.run(RecordingExtract(FakeLlamaExtract(live_value), store).aextract(SCHEMA, None, pdf))
+    replayed = asyncio.run(ReplayExtract(ReplayStore(store.path), on_missing="error").aextract(SCHEMA, None, pdf))
+    assert replayed.data == live.data
+
+
+def test_replay_latency_bounds_wall_time_by_concurrency(corpus, recorded):
+    path, _ = recorded
+    agent = ReplayExtract(ReplayStore(path), latency=0.2).get_agent(id="agent-1")
+    start = time.perf_counter()
+    asyncio.run(aextract_all(str(corpus), {"is": agent}, concurrency=5))
+    assert time.perf_counter() - start < 0.5
+    assert agent.calls == 5
+
+
+def test_remote_store_serves_the_recording(corpus, recorded):
+    path, live = recorded
+    server = serve(ReplayStore(path), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        extractor = ReplayExtract(RemoteStore(f"http://127.0.0.1:{server.server_port}"), on_missing="error")
+        agent = extractor.get_agent(id="agent-1")
+        assert asyncio.run(aextract_all(str(corpus), {"is": agent})) == live
+        with pytest.raises(KeyError):
+            extractor.create_agent("other", {"properties": {"x": {"type": "integer"}}}).extract(str(corpus / "BETA" / "c.pdf"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_the_system_prompt_is_part_of_the_key(corpus, tmp_path):
+    store = ReplayStore(str(tmp_path / "replay.json"))
+    pdf = str(corpus / "ALPHA" / "a.pdf")
+    config = {"system_prompt": "Report values in whole dollars."}
+    asyncio.run(RecordingExtract(FakeLlamaExtract(live_value), store).aextract(SCHEMA, config, pdf))
+    replay = ReplayExtract(ReplayStore(store.path), on_missing="error")
+    assert asyncio.run(replay.aextract(SCHEMA, config, pdf)).data["net_tuition_revenue"] == live_value(pdf, "net_tuition_revenue")
+    with pytest.raises(KeyError):
+        asyncio.run(replay.aextract(SCHEMA, None, pdf))
+    with pytest.raises(KeyError):
+        asyncio.run(replay.aextract(SCHEMA, {"system_prompt": "Report values in thousands."}, pdf))
@@ -0,0 +1,26 @@
+import pytest
+
+from conftest import extract_corpus
+from fake_extract import FakeAgent, FakeExtractor
+from schema_sections import ALL, section_plan
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+SECTIONS = {"bs": {"ASSETS": ["total_assets"], "LIABILITIES": ["total_liabilities"]}}
+
+
+def test_sections_are_merged_per_document(corpus):
+    extractor = FakeExtractor()
+    whole = extract_corpus(corpus, FakeAgent(SCHEMA))
+    assert extract_corpus(corpus, FakeAgent(SCHEMA), extractor=extractor, sections=SECTIONS) == whole
+    assert extractor.calls == 10
+
+
+def test_sections_need_the_extractor(corpus):
+    with pytest.raises(ValueError):
+        extract_corpus(corpus, FakeAgent(SCHEMA), sections=SECTIONS)
+
+
+def test_section_plan_only_splits_large_schemas():
+    assert section_plan({ALL: ["a", "b"]}, min_fields=1) is None
+    assert section_plan(SECTIONS["bs"], min_fields=3) is None
+    assert section_plan(SECTIONS["bs"], min_fields=2) == SECTIONS["bs"]
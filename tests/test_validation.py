@@ -0,0 +1,48 @@
+import asyncio
+
+import derived_fields
+from conftest import extract_corpus
+from derived_fields import Identity
+from extraction_engine import ExtractionJob
+from extraction_manifest import ExtractionManifest
+from fake_extract import FakeAgent, FakeExtractor
+from validation import RetryLedger, aretry_failures, implicated_jobs
+
+SCHEMA = {"properties": {
+    "total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}, "net_assets": {"type": "integer"},
+}}
+FIRST = {"total_assets": 100, "total_liabilities": 40, "net_assets": 50}  # 40 + 50 != 100
+RETRIED = {**FIRST, "net_assets": 60}
+
+
+def test_implicated_jobs_are_the_pdfs_the_values_came_from():
+    jobs = [ExtractionJob("A", f"{i}.pdf", "bs", f"A/{i}.pdf") for i in range(3)]
+    per_pdf = [{"x": 1, "y": 2, "z": None}, {"x": 3, "y": None, "z": None}, {"x": None, "y": None, "z": None}]
+    assert implicated_jobs(jobs, per_pdf, ["x"]) == [jobs[1]]
+    assert implicated_jobs(jobs, per_pdf, ["y"]) == [jobs[0]]
+    # Nobody filled z: the PDF with the most values holds the statement
+    assert implicated_jobs(jobs, per_pdf, ["x", "z"]) == [jobs[0], jobs[1]]
+    assert implicated_jobs(jobs, [per_pdf[0], None, per_pdf[2]], ["x"]) == jobs
+
+
+def test_failed_checks_are_retried_once_and_then_reused(corpus, tmp_path, monkeypatch):
+    monkeypatch.setitem(derived_fields.CHECKS, "bs", [Identity("total_assets", ("total_liabilities", "net_assets"))])
+    manifest = ExtractionManifest(str(tmp_path / "manifest.json"))
+    agent = FakeAgent(SCHEMA, value_fn=lambda path, field: FIRST[field])
+    schools = extract_corpus(corpus, agent, manifest=manifest)
+    manifest.save()
+
+    def retry(extractor):
+        return asyncio.run(aretry_failures(schools, "bs", agent, extractor, str(corpus), manifest=manifest))
+
+    extractor = FakeExtractor(value_fn=lambda path, field: RETRIED[field])
+    fixed, left = retry(extractor)
+    assert left.empty and all(combined["net_assets"] == 60 for combined in fixed.values())
+    # Only the last PDF of each school supplied the implicated values, so only those are sent
+    assert extractor.calls == 3
+
+    ledger = RetryLedger(str(tmp_path / "manifest.retries.json"))
+    assert len(ledger.entries) == 3 and {e["pdf"] for e in ledger.entries.values()} == {"b.pdf", "c.pdf", "e.pdf"}
+    # The same attempts again (e.g. a notebook re-run) are answered from the ledger, not billed
+    again = FakeExtractor(value_fn=lambda path, field: RETRIED[field])
+    assert retry(again)[0] == fixed and again.calls == 0
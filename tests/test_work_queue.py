@@ -0,0 +1,57 @@
+import asyncio
+
+import openpyxl
+
+from extraction_engine import discover_jobs
+from extraction_worker import _data_schema, collect, run_worker
+from fake_extract import FakeAgent
+from panel_store import load_panel
+from work_queue import DONE, FAILED, PENDING, WorkQueue
+
+SCHEMA = {"properties": {"total_assets": {"type": "integer"}, "total_liabilities": {"type": "integer"}}}
+
+
+def test_lease_only_hands_out_the_workers_schemas(corpus, tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(discover_jobs(str(corpus), ["bs", "is"]))
+    leased = queue.lease("w1", limit=10, schemas=["bs"])
+    assert len(leased) == 5 and {job.schema for job in leased} == {"bs"}
+    assert queue.outstanding(["bs"]) == 5 and queue.outstanding(["is"]) == 5
+    for job in leased:
+        queue.fail(job, "handed back")
+    # A worker without an "is" agent finishes its share and exits instead of polling forever
+    processed = asyncio.run(run_worker(queue, {"bs": FakeAgent(SCHEMA)}, "w2", idle_poll=0.01))
+    assert processed == 5
+    assert queue.summary() == {DONE: 5, PENDING: 5}
+
+
+def test_a_job_that_raises_is_failed_not_left_leased(corpus, tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=1)
+    queue.enqueue(discover_jobs(str(corpus), ["bs"]))
+    (corpus / "BETA" / "c.pdf").unlink()  # hashing the PDF for the journal key now raises
+    processed = asyncio.run(run_worker(queue, {"bs": FakeAgent(SCHEMA)}, "w1", idle_poll=0.01))
+    assert processed == 5
+    assert queue.summary() == {DONE: 4, FAILED: 1}
+    failed = queue._query("SELECT pdf, error FROM tasks WHERE status = ?", (FAILED,))
+    assert failed[0][0] == "c.pdf" and "FileNotFoundError" in failed[0][1]
+
+
+def test_collect_adds_derived_fields_to_every_output(corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the panel goes to ./panel
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(discover_jobs(str(corpus), ["cash_flow"]))
+
+    def value(path, field):
+        # net financing is reported as 0, so derived_fields fills it from its capital and noncapital parts
+        return 0 if field == "net_cash_from_financing_activities" else 5
+
+    agent = FakeAgent(_data_schema("cash_flow", 2024), value_fn=value)
+    asyncio.run(run_worker(queue, {"cash_flow": agent}, "w1", idle_poll=0.01))
+    schools = collect(queue, "cash_flow", str(tmp_path / "out"), "2023-24", 2024)
+
+    assert schools["BETA"]["net_cash_from_financing_activities"] == 10
+    panel = load_panel("cash_flow", metrics=["net_cash_from_financing_activities"])
+    assert panel["net_cash_from_financing_activities"].tolist() == [10, 10, 10]
+    sheet = openpyxl.load_workbook(tmp_path / "out" / "all_schools.xlsx")["BETA"]
+    assert ["net_cash_from_financing_activities", 10] in [[c.value for c in row] for row in sheet.iter_rows()]
+    assert (tmp_path / "out" / "ALPHA.xlsx").exists()
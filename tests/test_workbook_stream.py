@@ -0,0 +1,49 @@
+import os
+
+import openpyxl
+
+from extraction_engine import patch_all_schools, stage_all_schools, write_all_schools
+
+SCHOOLS = {
+    "ALPHA": {"total_assets": 100, "total_liabilities": 40.5},
+    "BETA": {"total_assets": 7, "total_liabilities": None},
+    "GAMMA": None,
+}
+
+
+def sheets(path):
+    book = openpyxl.load_workbook(path)
+    return {ws.title: [tuple(c.value for c in row) for row in ws.iter_rows()] for ws in book.worksheets}
+
+
+def test_streamed_workbook_has_a_sheet_per_school(tmp_path):
+    out = str(tmp_path / "all_schools.xlsx")
+    write_all_schools(SCHOOLS, out, "2023-24")
+    assert sheets(out) == {
+        "ALPHA": [("Metric", "2023-24"), ("total_assets", 100), ("total_liabilities", 40.5)],
+        "BETA": [("Metric", "2023-24"), ("total_assets", 7), ("total_liabilities", None)],
+    }
+    assert not os.path.exists(out + ".parts.jsonl")
+
+
+def test_unchanged_patch_leaves_the_file_alone(tmp_path, capsys):
+    out = str(tmp_path / "all_schools.xlsx")
+    write_all_schools(SCHOOLS, out, "2023-24")
+    mtime = os.stat(out).st_mtime_ns
+    patch_all_schools(SCHOOLS, out, "2023-24")
+    assert capsys.readouterr().out.endswith(f"{out} already up to date\n")
+    assert os.stat(out).st_mtime_ns == mtime
+
+    patch_all_schools({"BETA": {"total_assets": 8, "total_liabilities": None}, "GAMMA": {"total_assets": 1}}, out, "2023-24")
+    assert "2 sheet(s) changed" in capsys.readouterr().out
+    book = sheets(out)
+    assert list(book) == ["ALPHA", "BETA", "GAMMA"] and book["BETA"][1] == ("total_assets", 8)
+
+
+def test_staged_schools_survive_a_crash(tmp_path):
+    out = str(tmp_path / "all_schools.xlsx")
+    write_all_schools(SCHOOLS, out, "2023-24")
+    stage = stage_all_schools(out, "2023-24")
+    stage("bs", "DELTA", {"total_assets": 3})  # the run dies before it patches
+    patch_all_schools({"ALPHA": None}, out, "2023-24")
+    assert list(sheets(out)) == ["BETA", "DELTA"]
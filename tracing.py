@@ -0,0 +1,160 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+import pandas as pd
+
+DEFAULT_TRACE_FILE = "trace.jsonl"
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage (emma_search, pdf_download, upload, extract, merge, excel_write, ...)."""
+
+    def __init__(self, stage: str, trace_id: str, parent_id: Optional[str], attrs: dict):
+        self.stage = stage
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.status = "ok"
+        self.error = None
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "stage": self.stage,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class Tracer:
+    """
+    Collects finished spans and appends each one as a JSON line to `path`
+    (when given). Spans opened inside another span, including across
+    asyncio tasks and to_thread calls, record it as their parent.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        parent = _current_span.get()
+        current = Span(stage, self.trace_id, parent.span_id if parent else None, attrs)
+        token = _current_span.set(current)
+        started = time.perf_counter()
+        try:
+            yield current
+        except BaseException as err:
+            current.status = "error"
+            current.error = str(err)
+            raise
+        finally:
+            current.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._export(current.to_dict())
+
+    def _export(self, record: dict) -> None:
+        with self._lock:
+            self.spans.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def histograms(self) -> pd.DataFrame:
+        """Per-stage count, error count and p50/p95/p99/max/total duration in seconds."""
+        return stage_histograms(pd.DataFrame(self.spans))
+
+    def print_summary(self) -> None:
+        print(self.histograms().to_string(float_format=lambda v: f"{v:.3f}"))
+
+
+def stage_histograms(spans: pd.DataFrame) -> pd.DataFrame:
+    if spans.empty:
+        return pd.DataFrame(columns=["count", "errors", "p50", "p95", "p99", "max", "total"])
+    grouped = spans.groupby("stage")
+    durations = grouped["duration"]
+    return pd.DataFrame({
+        "count": durations.count(),
+        "errors": grouped["status"].apply(lambda s: int((s != "ok").sum())),
+        "p50": durations.quantile(0.50),
+        "p95": durations.quantile(0.95),
+        "p99": durations.quantile(0.99),
+        "max": durations.max(),
+        "total": durations.sum(),
+    }).sort_values("total", ascending=False)
+
+
+def load_trace(path: str = DEFAULT_TRACE_FILE) -> pd.DataFrame:
+    """Reads a JSONL trace back, e.g. to compare runs or merge several workers' traces."""
+    return pd.read_json(path, lines=True)
+
+
+# Spans are no-ops until start_tracing is called
+_tracer = Tracer()
+_enabled = False
+
+
+def start_tracing(path: Optional[str] = DEFAULT_TRACE_FILE) -> Tracer:
+    """Installs a fresh tracer for the run; every span() afterwards is exported to `path`."""
+    global _tracer, _enabled
+    _tracer = Tracer(path)
+    _enabled = True
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Times a stage on the active tracer (yields a Span whose `.set()` adds attributes)."""
+    if not _enabled:
+        yield Span(stage, "", None, attrs)
+        return
+    with _tracer.span(stage, **attrs) as current:
+        yield current
+
+
+def record_span(stage: str, started: float, status: str = "ok", **attrs) -> None:
+    """
+    Exports a stage timed by hand from `started` (a time.perf_counter() value)
+    until now, for long notebook loops that are not wrapped in span().
+    """
+    if not _enabled:
+        return
+    parent = _current_span.get()
+    current = Span(stage, _tracer.trace_id, parent.span_id if parent else None, attrs)
+    current.duration = time.perf_counter() - started
+    current.start = time.time() - current.duration
+    current.status = status
+    _tracer._export(current.to_dict())
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from derived_fields import apply_derived, check_failures
+from extraction_cache import file_sha256, schema_hash, sub_schema
+from extraction_engine import (
+    EMPTY_VALUES,
+    ExtractionJob,
+    UploadRegistry,
+    config_prompt,
+    config_with,
+    discover_jobs,
+    merge_results,
+)
+from panel_store import DEFAULT_PANEL_ROOT, load_panel, panel_years, schools_frame
+from tracing import span
+
+# Settings layered over the agent's config for the retry: the strongest mode,
+# reasoning on, and no server-side cached answer from the first attempt
+HIGH_EFFORT = {"extraction_mode": "PREMIUM", "use_reasoning": True, "invalidate_cache": True}
+
+
+def higher_effort(config, **overrides):
+    """The agent's ExtractConfig with HIGH_EFFORT (and `overrides`) on top."""
+    return config_with(config, **{**HIGH_EFFORT, **overrides})
+
+
+def validate_panel(
+    statements: Iterable[str],
+    years: Optional[Iterable[int]] = None,
+    root: str = DEFAULT_PANEL_ROOT,
+) -> pd.DataFrame:
+    """
+    Every statement's checks over the whole school x year panel: one row per
+    (statement, school, fiscal_year, failed check) with the fields implicated.
+    """
+    failed = []
+    for statement in statements:
+        if not panel_years(statement, root):
+            continue
+        panel = apply_derived(load_panel(statement, years=years, root=root), statement)
+        failed.append(check_failures(panel, statement).reset_index().assign(statement=statement))
+    if not failed:
+        return pd.DataFrame(columns=["statement", "school", "fiscal_year", "check", "fields"])
+    return pd.concat(failed, ignore_index=True)[["statement", "school", "fiscal_year", "check", "fields"]]
+
+
+def retry_plan(failures: pd.DataFrame) -> Dict[str, List[str]]:
+    """{school: fields to extract again} from check_failures, every field once."""
+    plan: Dict[str, List[str]] = {}
+    for school, fields in zip(failures.index, failures["fields"]):
+        wanted = plan.setdefault(school, [])
+        wanted.extend(f for f in fields if f not in wanted)
+    return plan
+
+
+class RetryLedger:
+    """
+    Every retry attempt already paid for, keyed on (sha256 of the PDF, schema
+    hash with the system prompt, retry config, fields asked for), with the
+    values it returned. An attempt in the ledger is never sent again: its
+    recorded values are reused, so re-running a notebook doesn't bill the
+    high-effort retries a second time. A changed PDF, schema, config or set
+    of failing fields is a new attempt. Failed calls are not recorded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self.reused = 0
+
+    @staticmethod
+    def key(job: ExtractionJob, schema, system_prompt: Optional[str], config, fields: List[str]) -> str:
+        settings = config if isinstance(config, dict) or config is None else config.dict()
+        attempt = json.dumps({"config": settings, "fields": sorted(fields)}, sort_keys=True, default=str)
+        return "-".join([
+            file_sha256(job.path),
+            schema_hash(schema, system_prompt)[:16],
+            hashlib.sha256(attempt.encode("utf-8")).hexdigest()[:16],
+        ])
+
+    def get(self, key: str) -> Optional[dict]:
+        """The recorded attempt ({"data": ...}) or None when it was never made."""
+        entry = self.entries.get(key)
+        self.reused += entry is not None
+        return entry
+
+    def record(self, key: str, job: ExtractionJob, fields: List[str], data: dict) -> None:
+        self.entries[key] = {"school": job.school, "pdf": job.pdf, "fields": fields, "data": data}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def implicated_jobs(school_jobs: List[ExtractionJob], per_pdf: List[Optional[dict]], fields: Iterable[str]) -> List[ExtractionJob]:
+    """
+    The PDFs of one school that a retry of `fields` should re-extract: for
+    each field, the PDF its merged value came from (the last one with a
+    non-empty value, as merge_results keeps it), and for a field no PDF
+    filled, the PDF that supplied the most values (the statement itself).
+    Every PDF when the per-PDF results are unknown.
+    """
+    if not per_pdf or any(data is None for data in per_pdf):
+        return list(school_jobs)
+    filled = [{k for k, v in data.items() if v not in EMPTY_VALUES} for data in per_pdf]
+    main = max(range(len(school_jobs)), key=lambda i: len(filled[i]))
+    picked = set()
+    for field in fields:
+        sources = [i for i, keys in enumerate(filled) if field in keys]
+        picked.add(sources[-1] if sources else main)
+    return [job for i, job in enumerate(school_jobs) if i in picked]
+
+
+def _overlay(data: Optional[dict], fresh: Optional[dict]) -> Optional[dict]:
+    if data is None or not fresh:
+        return data
+    return {**data, **{k: v for k, v in fresh.items() if k in data and v not in EMPTY_VALUES}}
+
+
+async def aretry_failures(
+    schools: Dict[str, Optional[dict]],
+    statement: str,
+    agent,
+    extractor,
+    pdf_root: str,
+    concurrency: int = 8,
+    config=None,
+    router: Optional[Callable[[str, List[str], str], List[str]]] = None,
+    prefilter: Optional[Callable[[str, str], str]] = None,
+    limiter=None,
+    manifest=None,
+    on_school_done: Optional[Callable[[str, str, Optional[dict]], None]] = None,
+    ledger: Optional[RetryLedger] = None,
+) -> Tuple[Dict[str, Optional[dict]], pd.DataFrame]:
+    """
+    Checks the statement's identities and plug bounds over all schools at
+    once, then extracts again only the fields a failed check implicates, for
+    only the failing schools, with a higher-effort config (default: the
+    agent's config plus HIGH_EFFORT) through the stateless extractor.
+
+    With an ExtractionManifest only the PDFs the implicated values came from
+    are sent (see implicated_jobs), and attempts go to a RetryLedger
+    (default: <manifest>.retries.json next to it), so an attempt already
+    made is answered from the ledger instead of being billed again.
+
+    A school's new values are kept when they fail fewer checks than before;
+    with an ExtractionManifest they are recorded per PDF (so facts and later
+    runs see them) and `on_school_done(statement, school, combined)` fires.
+    Returns ({school: combined}, the failures that are left for review).
+    """
+    schema = agent.data_schema
+    prompt = config_prompt(getattr(agent, "config", None))
+    before = check_failures(apply_derived(schools_frame(schools, schema), statement), statement)
+    plan = retry_plan(before)
+    if not plan:
+        return schools, before
+    config = higher_effort(getattr(agent, "config", None)) if config is None else config
+    if ledger is None and manifest is not None:
+        ledger = RetryLedger(f"{os.path.splitext(manifest.path)[0]}.retries.json")
+    jobs = [j for j in discover_jobs(pdf_root, [statement], router=router) if j.school in plan]
+    recorded: Dict[ExtractionJob, Optional[dict]] = {}
+    targets: List[ExtractionJob] = []
+    for school in plan:
+        school_jobs = [j for j in jobs if j.school == school]
+        old = [manifest.lookup(j, schema, prompt) for j in school_jobs] if manifest is not None else []
+        recorded.update(zip(school_jobs, old))
+        targets += implicated_jobs(school_jobs, old, plan[school])
+    semaphore = asyncio.Semaphore(concurrency)
+    uploads = UploadRegistry()
+
+    async def retry(job) -> Optional[dict]:
+        wanted = [f for f in plan[job.school] if f in schema.get("properties", {})]
+        if not wanted:
+            return None
+        fields = sub_schema(schema, wanted)
+        key = ledger.key(job, schema, prompt, config, wanted) if ledger is not None else None
+        attempt = ledger.get(key) if ledger is not None else None
+        if attempt is not None:
+            return attempt["data"]
+        with span("retry", school=job.school, pdf=job.pdf, schema=statement, fields=len(fields["properties"])) as stage:
+            path = await asyncio.to_thread(prefilter, job.path, statement) if prefilter is not None else job.path
+
+            async def call():
+                file_ref = await uploads.get(path, agent)
+                run = await extractor.aextract(fields, config, file_ref)
+                return run.data or {}
+
+            try:
+                async with semaphore:
+                    print(f"Re-extracting {len(fields['properties'])} field(s) from {job.school}/{job.pdf}")
+                    data = await (limiter.run(call) if limiter is not None else call())
+            except Exception as err:
+                print(f"Retry skipped {job.pdf}: {err}")
+                stage.status, stage.error = "error", str(err)
+                return None
+            if ledger is not None:
+                ledger.record(key, job, wanted, data)
+            return data
+
+    fresh = dict(zip(targets, await asyncio.gather(*(retry(job) for job in targets))))
+
+    candidates: Dict[str, Optional[dict]] = {}
+    per_pdf: Dict[str, list] = {}
+    for school in plan:
+        school_jobs = [j for j in jobs if j.school == school]
+        old = [recorded[j] for j in school_jobs]
+        if school_jobs and manifest is not None and all(data is not None for data in old):
+            # Rebuild from the recorded per-PDF results, so the manifest reproduces the same row
+            per_pdf[school] = [(j, _overlay(data, fresh.get(j))) for j, data in zip(school_jobs, old)]
+            candidates[school] = merge_results(data for _, data in per_pdf[school])
+        else:
+            candidates[school] = _overlay(schools.get(school), merge_results(fresh.get(j) for j in school_jobs))
+
+    after = check_failures(apply_derived(schools_frame(candidates, schema), statement), statement)
+    schools = dict(schools)
+    fixed = 0
+    for school, combined in candidates.items():
+        if (after.index == school).sum() >= (before.index == school).sum():
+            continue
+        schools[school] = combined
+        fixed += 1
+        if manifest is not None:
+            for job, data in per_pdf.get(school, []):
+                manifest.record(job, schema, data, prompt)
+            manifest.save()
+        if on_school_done is not None:
+            on_school_done(statement, school, combined)
+
+    left = check_failures(apply_derived(schools_frame(schools, schema), statement), statement)
+    reused = f", {ledger.reused} attempt(s) reused from {ledger.path}" if ledger is not None and ledger.reused else ""
+    print(f"{statement}: {len(before)} failed check(s) in {len(plan)} school(s); "
+          f"{fixed} school(s) improved by re-extraction{reused}, {len(left)} check(s) left for review")
+    return schools, left
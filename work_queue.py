@@ -0,0 +1,230 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from extraction_engine import ExtractionJob
+
+DEFAULT_QUEUE = "extraction_queue.db"
+DEFAULT_LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    """
+    Shared (school, pdf, schema) task queue in SQLite that any number of
+    worker processes can drain together.
+
+    `lease` hands a worker tasks for `lease_seconds`; the worker extends them
+    with `heartbeat` while it works. A task whose lease runs out (worker
+    crashed or lost) goes back to the pool, and a task that failed
+    `max_attempts` times is parked as failed.
+
+    Every operation is its own short IMMEDIATE transaction, so workers on one
+    machine can share the file directly; for several machines put it on a
+    filesystem with working POSIX locks (SQLite over NFS is not safe).
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                school      TEXT NOT NULL,
+                pdf         TEXT NOT NULL,
+                schema      TEXT NOT NULL,
+                path        TEXT NOT NULL,
+                sha256      TEXT,
+                status      TEXT NOT NULL,
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                worker      TEXT,
+                lease_until REAL,
+                result      TEXT,
+                error       TEXT,
+                updated_at  REAL NOT NULL,
+                PRIMARY KEY (school, pdf, schema)
+            )
+            """
+        )
+        if "sha256" not in [row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")]:
+            # Queues from before content hashes: their tasks are re-queued on the next enqueue
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN sha256 TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until)")
+
+    def _transaction(self, statements):
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cur)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            return result
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, jobs: Iterable[ExtractionJob]) -> int:
+        """
+        Adds jobs not queued yet and re-queues those whose PDF changed since
+        (finished tasks of unchanged files are kept); returns how many were
+        added or re-queued.
+        """
+        from extraction_cache import file_sha256
+
+        now = time.time()
+        rows = [(j.school, j.pdf, j.schema, j.path, file_sha256(j.path), PENDING, now) for j in jobs]
+
+        def upsert(cur):
+            before = self._conn.total_changes
+            cur.executemany(
+                """
+                INSERT INTO tasks (school, pdf, schema, path, sha256, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (school, pdf, schema) DO UPDATE SET
+                    path = excluded.path, sha256 = excluded.sha256, status = excluded.status, attempts = 0,
+                    worker = NULL, lease_until = NULL, result = NULL, error = NULL, updated_at = excluded.updated_at
+                WHERE tasks.sha256 IS NOT excluded.sha256
+                """,
+                rows,
+            )
+            return self._conn.total_changes - before
+
+        return self._transaction(upsert)
+
+    def lease(
+        self,
+        worker: str,
+        limit: int = 1,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        schemas: Optional[Iterable[str]] = None,
+    ) -> List[ExtractionJob]:
+        """
+        Claims up to `limit` pending (or lease-expired) tasks for `worker`,
+        only for `schemas` when given (the ones the worker has agents for).
+        """
+        now = time.time()
+        only = sorted(set(schemas)) if schemas is not None else None
+        schema_filter = f"AND schema IN ({', '.join('?' * len(only))})" if only else ""
+
+        def claim(cur):
+            # Tasks that keep losing their worker are given up on like failed ones
+            cur.execute(
+                "UPDATE tasks SET status = ?, error = ?, updated_at = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "lease expired", now, LEASED, now, self.max_attempts),
+            )
+            rows = cur.execute(
+                f"""
+                SELECT school, pdf, schema, path FROM tasks
+                WHERE (status = ? OR (status = ? AND lease_until < ?)) {schema_filter}
+                ORDER BY school, pdf, schema LIMIT ?
+                """,
+                (PENDING, LEASED, now, *(only or ()), limit),
+            ).fetchall()
+            cur.executemany(
+                """
+                UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+                WHERE school = ? AND pdf = ? AND schema = ?
+                """,
+                [(LEASED, worker, now + lease_seconds, now, school, pdf, schema) for school, pdf, schema, _ in rows],
+            )
+            return [ExtractionJob(*row) for row in rows]
+
+        return self._transaction(claim)
+
+    def heartbeat(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+        """Extends every lease `worker` holds."""
+        now = time.time()
+        self._transaction(lambda cur: cur.execute(
+            "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE status = ? AND worker = ?",
+            (now + lease_seconds, now, LEASED, worker),
+        ))
+
+    def complete(self, job: ExtractionJob, data: dict) -> None:
+        """Stores the result of a leased task (one re-queued meanwhile, because its PDF changed, stays pending)."""
+        self._transaction(lambda cur: cur.execute(
+            """
+            UPDATE tasks SET status = ?, result = ?, error = NULL, lease_until = NULL, updated_at = ?
+            WHERE school = ? AND pdf = ? AND schema = ? AND status = ?
+            """,
+            (DONE, json.dumps(data), time.time(), job.school, job.pdf, job.schema, LEASED),
+        ))
+
+    def fail(self, job: ExtractionJob, error: str) -> None:
+        """Returns the task to the pool, or parks it as failed after max_attempts."""
+        self._transaction(lambda cur: cur.execute(
+            """
+            UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                             error = ?, lease_until = NULL, updated_at = ?
+            WHERE school = ? AND pdf = ? AND schema = ? AND status != ?
+            """,
+            (self.max_attempts, FAILED, PENDING, error, time.time(), job.school, job.pdf, job.schema, DONE),
+        ))
+
+    def outstanding(self, schemas: Optional[Iterable[str]] = None) -> int:
+        """Tasks still pending or leased, only for `schemas` when given."""
+        if schemas is None:
+            return self._query("SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)", (PENDING, LEASED))[0][0]
+        only = sorted(set(schemas))
+        return self._query(
+            f"SELECT COUNT(*) FROM tasks WHERE status IN (?, ?) AND schema IN ({', '.join('?' * len(only))})",
+            (PENDING, LEASED, *only),
+        )[0][0] if only else 0
+
+    def jobs(self, schema: Optional[str] = None) -> List[ExtractionJob]:
+        """All queued tasks in the engine's school -> pdf -> schema order."""
+        query = "SELECT school, pdf, schema, path FROM tasks"
+        params = ()
+        if schema is not None:
+            query += " WHERE schema = ?"
+            params = (schema,)
+        return [ExtractionJob(*row) for row in self._query(query + " ORDER BY school, pdf, schema", params)]
+
+    def results(self) -> Dict[ExtractionJob, dict]:
+        rows = self._query("SELECT school, pdf, schema, path, result FROM tasks WHERE status = ?", (DONE,))
+        return {ExtractionJob(*row[:4]): json.loads(row[4]) for row in rows}
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self._query("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class QueueJournal:
+    """
+    Adapts a WorkQueue to the journal interface arun_jobs uses, so each
+    finished job is reported straight back to the shared queue.
+    """
+
+    def __init__(self, queue: WorkQueue):
+        self.queue = queue
+
+    def result(self, key) -> Optional[dict]:
+        # A leased task is unfinished by definition
+        return None
+
+    def record(self, job: ExtractionJob, key, data: Optional[dict], error: Optional[str] = None) -> None:
+        if data is not None:
+            self.queue.complete(job, data)
+        else:
+            self.queue.fail(job, error or "extraction failed")
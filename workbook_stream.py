@@ -0,0 +1,263 @@
+import json
+import math
+import os
+import re
+import zipfile
+from numbers import Number
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from tracing import span
+
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_COLUMNS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+{sheets}</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+# Style 1 is the bold header, as pandas writes it
+_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+_SHEET_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _cell(ref: str, value, style: int = 0) -> str:
+    s = f' s="{style}"' if style else ""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{s}><v>{int(value)}</v></c>'
+    if isinstance(value, Number):
+        return f'<c r="{ref}"{s}><v>{value!r}</v></c>'
+    # Multi-valued answers are written as their JSON text
+    text = value if isinstance(value, str) else json.dumps(value)
+    text = escape(_INVALID_XML.sub("", text))
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(number: int, values: Iterable, style: int = 0) -> str:
+    cells = "".join(_cell(f"{_COLUMNS[i]}{number}", v, style) for i, v in enumerate(values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def _plain(value):
+    # A value the way it reads back from a written sheet, for comparing rows
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (bool, Number)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value)
+    return _INVALID_XML.sub("", text)
+
+
+def same_rows(old: Iterable[Tuple], new: Iterable[Tuple]) -> bool:
+    """Whether a sheet's (metric, value) rows already hold `new` as it would be written."""
+    return [tuple(_plain(v) for v in row) for row in old] == [tuple(_plain(v) for v in row) for row in new]
+
+
+class StreamingSchoolsWriter:
+    """
+    all_schools.xlsx written one school at a time in constant memory.
+
+    add() appends the school's rows to a staging file next to the workbook
+    (<output>.parts.jsonl, flushed and fsynced per school) and keeps nothing
+    in memory. close() streams the staged schools sheet by sheet straight
+    into the .xlsx zip under a temporary name and renames it over the output,
+    then removes the staging file. Only sheet names and zip directory entries
+    are held, so memory stays flat however many schools there are (openpyxl
+    keeps every sheet's objects until the workbook is saved, even in
+    write-only mode).
+
+    With `patch`, an existing output keeps its other sheets: close() streams
+    them over from the old workbook (read-only, one sheet at a time),
+    replaces the staged schools' sheets in place, drops the sheets of
+    schools added with None and appends new schools. When no staged school
+    differs from its sheet the file is left untouched.
+
+    If a run dies before close(), the staging file survives: the next writer
+    on the same output picks the staged schools up again, so they are not
+    lost and don't need to be extracted again. A school added twice keeps its
+    latest rows.
+    """
+
+    def __init__(self, output_file: str, column: str, patch: bool = False):
+        self.output_file = output_file
+        self.column = column
+        self.patch = patch
+        self.parts_file = f"{output_file}.parts.jsonl"
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    def add(self, school: str, combined: Optional[dict]) -> None:
+        if combined is None:
+            print(f"No data for {school}.")
+            if not self.patch:
+                return
+        rows = list(combined.items()) if combined is not None else None
+        # Opened per school, so any number of writers can stage into the same output
+        with open(self.parts_file, "a", encoding="utf-8") as parts:
+            parts.write(json.dumps({"school": school, "rows": rows}, default=str) + "\n")
+            parts.flush()
+            os.fsync(parts.fileno())
+
+    def _staged(self) -> Iterator[Tuple[int, str, Optional[list]]]:
+        if not os.path.exists(self.parts_file):
+            return
+        with open(self.parts_file, "rb") as f:
+            while True:
+                offset, line = f.tell(), f.readline()
+                if not line:
+                    break
+                try:
+                    part = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash; that school is simply not staged
+                    continue
+                yield offset, part["school"], part["rows"]
+
+    def _latest(self) -> Dict[str, int]:
+        """{school: offset of its latest staged rows}, in staging order; only offsets are held, never the rows."""
+        latest: Dict[str, int] = {}
+        for offset, school, _ in self._staged():
+            latest.pop(school, None)
+            latest[school] = offset
+        return latest
+
+    def _rows_at(self, offset: int) -> Optional[list]:
+        with open(self.parts_file, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["rows"]
+
+    @staticmethod
+    def _title(school: str, used: set) -> str:
+        # Sheet names are limited to 31 characters and must be unique
+        title, n = school[:31], 1
+        while title.lower() in used:
+            suffix = str(n)
+            title, n = school[:31 - len(suffix)] + suffix, n + 1
+        used.add(title.lower())
+        return title
+
+    def _sheet(self, book: zipfile.ZipFile, titles: List[str], used: set, name: str, rows: Iterable) -> None:
+        titles.append(self._title(name, used))
+        with book.open(f"xl/worksheets/sheet{len(titles)}.xml", "w") as sheet:
+            sheet.write(_SHEET_HEAD.encode())
+            sheet.write(_row(1, ("Metric", self.column), style=1).encode())
+            for number, (metric, value) in enumerate(rows, start=2):
+                sheet.write(_row(number, (metric, value)).encode())
+            sheet.write(_SHEET_TAIL.encode())
+
+    def _copy_existing(self, book: zipfile.ZipFile, titles: List[str], used: set, latest: Dict[str, int]) -> int:
+        """Streams the old workbook's sheets into `book`, swapping in staged schools; returns how many changed."""
+        from openpyxl import load_workbook
+
+        staged = {school[:31]: school for school in latest}
+        changed = 0
+        old = load_workbook(self.output_file, read_only=True)
+        try:
+            for ws in old.worksheets:
+                rows = ws.iter_rows(values_only=True)
+                header = next(rows, None)
+                if tuple(header or ())[:2] != ("Metric", self.column):
+                    changed += 1
+                kept = [(row + (None,))[:2] for row in rows]
+                school = staged.pop(ws.title, None)
+                if school is None:
+                    self._sheet(book, titles, used, ws.title, kept)
+                    continue
+                new = self._rows_at(latest.pop(school))
+                if new is None:
+                    changed += 1
+                    continue
+                changed += not same_rows(kept, new)
+                self._sheet(book, titles, used, school, new)
+        finally:
+            old.close()
+        return changed
+
+    def close(self) -> None:
+        latest = self._latest()
+        patching = self.patch and os.path.exists(self.output_file)
+        titles: List[str] = []
+        used: set = set()
+        changed = 0
+        tmp = f"{self.output_file}.{os.getpid()}.tmp.xlsx"
+        with span("excel_write", file=self.output_file, sheets=len(latest), streaming=True, patch=patching), \
+                zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as book:
+            if patching:
+                changed = self._copy_existing(book, titles, used, latest)
+            for school, offset in latest.items():
+                rows = self._rows_at(offset)
+                if rows is not None:
+                    changed += 1
+                    self._sheet(book, titles, used, school, rows)
+            if not titles:
+                titles.append("Sheet1")
+                book.writestr("xl/worksheets/sheet1.xml", _SHEET_HEAD + _SHEET_TAIL)
+            self._write_parts(book, titles)
+        if os.path.exists(self.parts_file):
+            os.remove(self.parts_file)
+        if patching and not changed:
+            os.remove(tmp)
+            print(f"{self.output_file} already up to date")
+            return
+        os.replace(tmp, self.output_file)
+        print(f"{changed} sheet(s) changed in {self.output_file}" if patching else f"All schools written to {self.output_file}")
+
+    @staticmethod
+    def _write_parts(book: zipfile.ZipFile, titles: List[str]) -> None:
+        ids = range(1, len(titles) + 1)
+        book.writestr("[Content_Types].xml", _CONTENT_TYPES.format(sheets="".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\n'
+            for i in ids
+        )))
+        book.writestr("_rels/.rels", _ROOT_RELS)
+        book.writestr("xl/styles.xml", _STYLES)
+        book.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name={quoteattr(t)} sheetId="{i}" r:id="rId{i}"/>' for i, t in zip(ids, titles))
+            + "</sheets></workbook>"
+        ))
+        book.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+                for i in ids
+            )
+            + f'<Relationship Id="rId{len(titles) + 1}" Target="styles.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+            "</Relationships>"
+        ))
+
+    def __enter__(self) -> "StreamingSchoolsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # On an error the staged schools are kept for the next run instead of a half-built workbook
+        if exc_type is None:
+            self.close()